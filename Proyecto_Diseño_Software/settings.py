@@ -142,6 +142,14 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST Framework
+# Todas las listas se paginan por cursor (ver api/paginacion.py)
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'api.paginacion.PaginacionCursor',
+    'PAGE_SIZE': 50,
+}
+
 # Emailing settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -0,0 +1,129 @@
+"""
+Filtros por parámetros GET para los ViewSets de la API.
+
+Cada ViewSet declara en `filtros` los parámetros que acepta (la lista
+blanca): solo esos llegan al ORM, cada valor se valida con un campo de DRF
+antes de usarse y cada filtro recae sobre una columna con índice (ver los
+índices de Paquete y Notificacion en api/models.py). Un valor inválido
+responde 400 con el error por parámetro.
+
+Ejemplo:
+    /api/paquetes/?estado=en_bodega,en_ruta&fecha_registro_desde=2025-06-01
+    /api/paquetes/?fecha_entrega_hasta=2025-06-30  (incluye todo el 30 de junio)
+    /api/paquetes/?destino_bbox=-36.9,-73.1,-36.7,-72.9
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+
+class Filtro:
+    """
+    Parámetro ?nombre=valor que se traduce a un lookup del ORM.
+
+    Args:
+        lookup: Lookup de Django a aplicar ('estado', 'fecha_registro__gte')
+        campo: Campo de DRF que valida y convierte el valor
+        multiple: Si acepta varios valores separados por coma (lookup __in)
+    """
+
+    def __init__(self, lookup, campo, multiple=False):
+        self.lookup = lookup
+        self.campo = campo
+        self.multiple = multiple
+
+    @property
+    def columnas(self):
+        """Columnas del modelo sobre las que filtra (deben tener índice)."""
+        return (self.lookup.split('__', 1)[0],)
+
+    def aplicar(self, queryset, valor):
+        if not self.multiple:
+            return queryset.filter(**{self.lookup: self.campo.run_validation(valor)})
+        valores = [self.campo.run_validation(parte.strip()) for parte in valor.split(',')]
+        return queryset.filter(**{f'{self.lookup}__in': valores})
+
+
+class FiltroFecha(Filtro):
+    """
+    Límite ?nombre=fecha sobre una columna DateTimeField.
+
+    Acepta una fecha ('2025-06-01') o una fecha y hora ISO 8601. Como límite
+    superior una fecha sola incluye el día completo: se filtra con __lt el
+    inicio del día siguiente, que sigue siendo un rango sobre el índice.
+
+    Args:
+        columna: Columna con la fecha y hora
+        hasta: Si es el límite superior (por defecto es el inferior)
+    """
+
+    def __init__(self, columna, hasta=False):
+        super().__init__(f"{columna}__{'lte' if hasta else 'gte'}", serializers.DateTimeField())
+        self.columna = columna
+        self.hasta = hasta
+        self.campo_dia = serializers.DateField()
+
+    def aplicar(self, queryset, valor):
+        try:
+            dia = self.campo_dia.run_validation(valor)
+        except serializers.ValidationError:
+            return super().aplicar(queryset, valor)
+        if self.hasta:
+            lookup, dia = f'{self.columna}__lt', dia + timedelta(days=1)
+        else:
+            lookup = f'{self.columna}__gte'
+        return queryset.filter(**{lookup: timezone.make_aware(datetime.combine(dia, time.min))})
+
+
+class FiltroCaja(Filtro):
+    """
+    Rectángulo ?nombre=lat_min,lng_min,lat_max,lng_max sobre dos columnas.
+
+    Args:
+        columna_lat: Columna con la latitud
+        columna_lng: Columna con la longitud
+    """
+
+    def __init__(self, columna_lat, columna_lng):
+        self.columna_lat = columna_lat
+        self.columna_lng = columna_lng
+        self.campo_lat = serializers.FloatField(min_value=-90, max_value=90)
+        self.campo_lng = serializers.FloatField(min_value=-180, max_value=180)
+
+    @property
+    def columnas(self):
+        return (self.columna_lat, self.columna_lng)
+
+    def aplicar(self, queryset, valor):
+        partes = valor.split(',')
+        if len(partes) != 4:
+            raise serializers.ValidationError('Se esperan 4 valores: lat_min,lng_min,lat_max,lng_max.')
+        lat_min, lat_max = (self.campo_lat.run_validation(partes[i].strip()) for i in (0, 2))
+        lng_min, lng_max = (self.campo_lng.run_validation(partes[i].strip()) for i in (1, 3))
+        if lat_min > lat_max or lng_min > lng_max:
+            raise serializers.ValidationError('El mínimo de cada coordenada no puede superar al máximo.')
+        return queryset.filter(**{
+            f'{self.columna_lat}__range': (lat_min, lat_max),
+            f'{self.columna_lng}__range': (lng_min, lng_max),
+        })
+
+
+class FiltrosIndexados(BaseFilterBackend):
+    """Aplica los filtros del atributo `filtros` del ViewSet presentes en la consulta."""
+
+    def filter_queryset(self, request, queryset, view):
+        errores = {}
+        for nombre, filtro in getattr(view, 'filtros', {}).items():
+            valor = request.query_params.get(nombre)
+            if not valor:
+                continue
+            try:
+                queryset = filtro.aplicar(queryset, valor)
+            except serializers.ValidationError as e:
+                errores[nombre] = e.detail
+        if errores:
+            raise serializers.ValidationError(errores)
+        return queryset
@@ -0,0 +1,122 @@
+"""
+Deja el polyline como única copia de la geometría de cada Ruta.
+
+Las coordenadas decodificadas (ruta_ida_coordenadas, ruta_regreso_coordenadas)
+duplicaban el contenido de los polylines con un JSON varias veces más grande.
+Antes de eliminar las columnas se codifican las filas que solo tenían
+coordenadas, y se informa el tamaño de la geometría y de la tabla antes y
+después. En SQLite el espacio liberado queda como páginas libres hasta
+ejecutar VACUUM.
+"""
+
+import json
+
+from django.db import migrations, models
+
+from maps import polilineas
+
+# Tamaños medidos antes de eliminar las columnas, para el informe final
+_tamanos_previos = {}
+
+
+def _tamano_tabla(schema_editor, tabla):
+    """Bytes ocupados por la tabla (o la BD completa en SQLite), o None si no se puede medir."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA page_count')
+            paginas = cursor.fetchone()[0]
+            cursor.execute('PRAGMA freelist_count')
+            paginas -= cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_size')
+            return paginas * cursor.fetchone()[0]
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [tabla])
+            return cursor.fetchone()[0]
+    return None
+
+
+def _formatear(bytes_):
+    return 'desconocido' if bytes_ is None else f'{bytes_ / 1024:.1f} KiB'
+
+
+def compactar_rutas(apps, schema_editor):
+    Ruta = apps.get_model('api', 'Ruta')
+    _tamanos_previos.clear()
+
+    filas = geometria = 0
+    for ruta in Ruta.objects.only(
+        'ruta_ida_coordenadas', 'ruta_ida_polyline', 'ruta_regreso_coordenadas', 'ruta_regreso_polyline'
+    ).iterator():
+        filas += 1
+        cambios = []
+        for tramo in ('ida', 'regreso'):
+            coordenadas = getattr(ruta, f'ruta_{tramo}_coordenadas') or []
+            codificado = getattr(ruta, f'ruta_{tramo}_polyline')
+            geometria += len(json.dumps(coordenadas)) + len(codificado)
+            if coordenadas and not codificado:
+                setattr(ruta, f'ruta_{tramo}_polyline', polilineas.codificar(coordenadas))
+                cambios.append(f'ruta_{tramo}_polyline')
+        if cambios:
+            ruta.save(update_fields=cambios)
+
+    if filas:
+        _tamanos_previos.update(
+            filas=filas, geometria=geometria, tabla=_tamano_tabla(schema_editor, Ruta._meta.db_table)
+        )
+
+
+def informar_tamano(apps, schema_editor):
+    if not _tamanos_previos:
+        return
+    Ruta = apps.get_model('api', 'Ruta')
+
+    geometria = sum(
+        len(ida) + len(regreso)
+        for ida, regreso in Ruta.objects.values_list('ruta_ida_polyline', 'ruta_regreso_polyline').iterator()
+    )
+    tabla = _tamano_tabla(schema_editor, Ruta._meta.db_table)
+    print(
+        f"\n  Rutas compactadas: {_tamanos_previos['filas']}"
+        f"\n  Geometría: {_formatear(_tamanos_previos['geometria'])} -> {_formatear(geometria)}"
+        f"\n  Base de datos: {_formatear(_tamanos_previos['tabla'])} -> {_formatear(tabla)}"
+    )
+
+
+def restaurar_coordenadas(apps, schema_editor):
+    Ruta = apps.get_model('api', 'Ruta')
+    for ruta in Ruta.objects.iterator():
+        ruta.ruta_ida_coordenadas = polilineas.decodificar_lista(ruta.ruta_ida_polyline)
+        ruta.ruta_regreso_coordenadas = polilineas.decodificar_lista(ruta.ruta_regreso_polyline)
+        ruta.save(update_fields=['ruta_ida_coordenadas', 'ruta_regreso_coordenadas'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        # Con valor por defecto, la migración inversa puede volver a crear las columnas
+        migrations.AlterField(
+            model_name='ruta',
+            name='ruta_ida_coordenadas',
+            field=models.JSONField(default=list, help_text='Coordenadas de la ruta de ida como lista de [lat, lng]'),
+        ),
+        migrations.AlterField(
+            model_name='ruta',
+            name='ruta_regreso_coordenadas',
+            field=models.JSONField(default=list, help_text='Coordenadas de la ruta de regreso como lista de [lat, lng]'),
+        ),
+        migrations.RunPython(compactar_rutas, restaurar_coordenadas),
+        migrations.RemoveField(
+            model_name='ruta',
+            name='ruta_ida_coordenadas',
+        ),
+        migrations.RemoveField(
+            model_name='ruta',
+            name='ruta_regreso_coordenadas',
+        ),
+        migrations.RunPython(informar_tamano, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+from maps import polilineas
+from maps.constants import MAPA_CONFIG
+
+
+def simplificar_rutas(apps, schema_editor):
+    Ruta = apps.get_model('api', 'Ruta')
+    niveles = MAPA_CONFIG["niveles_simplificacion_rutas"]
+    for ruta in Ruta.objects.only('ruta_ida_polyline', 'ruta_regreso_polyline').iterator():
+        try:
+            ruta.geometria_simplificada = {
+                tramo: polilineas.niveles_simplificados(getattr(ruta, f'ruta_{tramo}_polyline'), niveles)
+                for tramo in ('ida', 'regreso')
+            }
+        except ValueError:
+            continue
+        ruta.save(update_fields=['geometria_simplificada'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_ruta_compactar_coordenadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ruta',
+            name='geometria_simplificada',
+            field=models.JSONField(blank=True, default=dict, help_text='Polylines simplificados (Douglas-Peucker) de ida y regreso por nivel de zoom máximo'),
+        ),
+        migrations.RunPython(simplificar_rutas, migrations.RunPython.noop),
+    ]
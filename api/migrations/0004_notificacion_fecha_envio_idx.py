@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_ruta_geometria_simplificada'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['-fecha_envio', '-id'], name='notificacion_fecha_envio_idx'),
+        ),
+    ]
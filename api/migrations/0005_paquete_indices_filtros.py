@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_notificacion_fecha_envio_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paquete',
+            index=models.Index(fields=['estado', '-id'], name='paquete_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paquete',
+            index=models.Index(fields=['fecha_registro'], name='paquete_fecha_registro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paquete',
+            index=models.Index(fields=['fecha_entrega'], name='paquete_fecha_entrega_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paquete',
+            index=models.Index(fields=['direccion_envio_lat', 'direccion_envio_lng'], name='paquete_destino_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:34
+
+"""
+Permite coordenadas de envío nulas mientras la dirección no se geocodifica.
+
+Hasta ahora los paquetes creados por la API guardaban las coordenadas de
+la Universidad como destino provisorio. Los que todavía no tienen ruta y
+conservan exactamente esas coordenadas quedan con el destino nulo.
+"""
+
+from django.db import migrations, models
+
+from maps.constants import UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+
+
+def anular_destinos_provisorios(apps, schema_editor):
+    Paquete = apps.get_model('api', 'Paquete')
+    Paquete.objects.filter(
+        ruta__isnull=True,
+        direccion_envio_lat=UNIVERSIDAD_CONCEPCION_COORDS_TUPLE[0],
+        direccion_envio_lng=UNIVERSIDAD_CONCEPCION_COORDS_TUPLE[1],
+    ).update(direccion_envio_lat=None, direccion_envio_lng=None)
+
+
+def restaurar_destinos_provisorios(apps, schema_editor):
+    Paquete = apps.get_model('api', 'Paquete')
+    Paquete.objects.filter(direccion_envio_lat__isnull=True).update(
+        direccion_envio_lat=UNIVERSIDAD_CONCEPCION_COORDS_TUPLE[0],
+        direccion_envio_lng=UNIVERSIDAD_CONCEPCION_COORDS_TUPLE[1],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_paquete_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paquete',
+            name='direccion_envio_lat',
+            field=models.FloatField(blank=True, help_text='Latitud de la dirección de envío (nula mientras no se geocodifica)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='paquete',
+            name='direccion_envio_lng',
+            field=models.FloatField(blank=True, help_text='Longitud de la dirección de envío (nula mientras no se geocodifica)', null=True),
+        ),
+        migrations.RunPython(anular_destinos_provisorios, restaurar_destinos_provisorios),
+    ]
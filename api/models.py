@@ -6,11 +6,18 @@ del sistema de gestión de envío de paquetes.
 """
 
 # Create your models here.
+import logging
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
-from maps.constants import UNIVERSIDAD_CONCEPCION, UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+from maps import polilineas
+from maps.cache import AUSENTE, CacheLRU
+from maps.constants import MAPA_CONFIG, UNIVERSIDAD_CONCEPCION, UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+
+logger = logging.getLogger(__name__)
 
 ### MODELO RELACIONAL (MR) ###
 #
@@ -41,8 +48,8 @@ from maps.constants import UNIVERSIDAD_CONCEPCION, UNIVERSIDAD_CONCEPCION_COORDS
 #   - FK: id_conductor -> conductor(id)
 #   - FK: id_despachador -> despachador(id)
 #
-# ruta(@id, tipo_ruta, ruta_ida_coordenadas, ruta_ida_polyline, distancia_ida_km,
-#      duracion_ida_minutos, ruta_regreso_coordenadas, ruta_regreso_polyline,
+# ruta(@id, tipo_ruta, ruta_ida_polyline, distancia_ida_km,
+#      duracion_ida_minutos, ruta_regreso_polyline,
 #      distancia_regreso_km, duracion_regreso_minutos, distancia_total_km,
 #      duracion_total_minutos, fecha_calculo, fecha_en_que_se_ejecuto,
 #      origen_direccion, destino_direccion, origen_lat, origen_lng,
@@ -303,11 +310,16 @@ class Paquete(models.Model):
     )
 
     # Dirección de envío (destino)
+    # Nulas hasta que el worker de rutas geocodifica la dirección
     direccion_envio_lat = models.FloatField(
-        help_text="Latitud de la dirección de envío"
+        null=True,
+        blank=True,
+        help_text="Latitud de la dirección de envío (nula mientras no se geocodifica)"
     )
     direccion_envio_lng = models.FloatField(
-        help_text="Longitud de la dirección de envío"
+        null=True,
+        blank=True,
+        help_text="Longitud de la dirección de envío (nula mientras no se geocodifica)"
     )
     direccion_envio_texto = models.CharField(
         max_length=200,
@@ -362,27 +374,75 @@ class Paquete(models.Model):
     class Meta:
         verbose_name = "Paquete"
         verbose_name_plural = "Paquetes"
+        indexes = [
+            # Filtros de PaqueteViewSet; conductor, cliente y despachador usan el índice de su clave foránea
+            models.Index(fields=['estado', '-id'], name='paquete_estado_idx'),
+            models.Index(fields=['fecha_registro'], name='paquete_fecha_registro_idx'),
+            models.Index(fields=['fecha_entrega'], name='paquete_fecha_entrega_idx'),
+            models.Index(fields=['direccion_envio_lat', 'direccion_envio_lng'], name='paquete_destino_idx'),
+        ]
+
+# Coordenadas decodificadas compartidas entre solicitudes, por polyline
+_cache_coordenadas_rutas = (
+    CacheLRU(MAPA_CONFIG["cache_coordenadas_rutas"]) if MAPA_CONFIG["cache_coordenadas_rutas"] else None
+)
+
+
+def _decodificar_coordenadas(codificado: str) -> list:
+    """
+    Decodifica el polyline de una ruta usando la caché compartida.
+
+    La lista retornada puede estar compartida con otras instancias, por lo
+    que no debe modificarse.
+    """
+    if not codificado:
+        return []
+    if _cache_coordenadas_rutas is not None:
+        coordenadas = _cache_coordenadas_rutas.obtener(codificado)
+        if coordenadas is not AUSENTE:
+            return coordenadas
+
+    try:
+        coordenadas = polilineas.decodificar_lista(codificado)
+    except ValueError as e:
+        logger.warning("Polyline de ruta inválido (%s): %.40s", e, codificado)
+        return []
+
+    if _cache_coordenadas_rutas is not None:
+        _cache_coordenadas_rutas.guardar(codificado, coordenadas)
+    return coordenadas
+
 
 class Ruta(models.Model):
     """
     Modelo que almacena rutas de ida y regreso calculadas para paquetes.
-    Optimizado para almacenar tanto coordenadas como polylines comprimidos.
+
+    La geometría se guarda solo como polyline; las coordenadas
+    (ruta_ida_coordenadas, ruta_regreso_coordenadas) se decodifican al
+    accederlas y se memorizan por instancia. Al guardar se precalculan
+    versiones simplificadas de cada polyline para los niveles de zoom de
+    MAPA_CONFIG["niveles_simplificacion_rutas"] (ver `polyline_para_zoom`).
     """
     id = models.AutoField(primary_key=True)
     tipo_ruta = models.CharField(max_length=10, choices=TipoRuta.choices, default=TipoRuta.COMPLETA)
     
     # Datos de la ruta de ida
-    ruta_ida_coordenadas = models.JSONField(help_text="Coordenadas de la ruta de ida como lista de [lat, lng]")
     ruta_ida_polyline = models.TextField(help_text="Polyline codificado de la ruta de ida")
     distancia_ida_km = models.FloatField(help_text="Distancia de la ruta de ida en kilómetros")
     duracion_ida_minutos = models.PositiveIntegerField(help_text="Duración estimada de la ruta de ida en minutos")
     
     # Datos de la ruta de regreso
-    ruta_regreso_coordenadas = models.JSONField(help_text="Coordenadas de la ruta de regreso como lista de [lat, lng]")
     ruta_regreso_polyline = models.TextField(help_text="Polyline codificado de la ruta de regreso")
     distancia_regreso_km = models.FloatField(help_text="Distancia de la ruta de regreso en kilómetros")
     duracion_regreso_minutos = models.PositiveIntegerField(help_text="Duración estimada de la ruta de regreso en minutos")
     
+    # Polylines simplificados por nivel de zoom: {"ida": {zoom: polyline}, "regreso": {...}}
+    geometria_simplificada = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Polylines simplificados (Douglas-Peucker) de ida y regreso por nivel de zoom máximo"
+    )
+    
     # Totales calculados automáticamente
     distancia_total_km = models.FloatField(help_text="Distancia total (ida + regreso) en kilómetros")
     duracion_total_minutos = models.PositiveIntegerField(help_text="Duración total estimada (ida + regreso) en minutos")
@@ -423,6 +483,73 @@ class Ruta(models.Model):
             delta = self.fecha_fin_ruta - self.fecha_inicio_ruta
             return int(delta.total_seconds() / 60)
         return None
+
+    def _coordenadas(self, campo_polyline: str) -> list:
+        """Decodifica el polyline indicado, memorizando el resultado mientras no cambie."""
+        codificado = getattr(self, campo_polyline)
+        memo = self.__dict__.setdefault('_coordenadas_decodificadas', {})
+        anterior = memo.get(campo_polyline)
+        if anterior is None or anterior[0] != codificado:
+            anterior = (codificado, _decodificar_coordenadas(codificado))
+            memo[campo_polyline] = anterior
+        return anterior[1]
+
+    @property
+    def ruta_ida_coordenadas(self):
+        """Coordenadas de la ruta de ida como lista de [lat, lng]."""
+        return self._coordenadas('ruta_ida_polyline')
+
+    @ruta_ida_coordenadas.setter
+    def ruta_ida_coordenadas(self, coordenadas):
+        self.ruta_ida_polyline = polilineas.codificar(coordenadas) if len(coordenadas) else ''
+
+    @property
+    def ruta_regreso_coordenadas(self):
+        """Coordenadas de la ruta de regreso como lista de [lat, lng]."""
+        return self._coordenadas('ruta_regreso_polyline')
+
+    @ruta_regreso_coordenadas.setter
+    def ruta_regreso_coordenadas(self, coordenadas):
+        self.ruta_regreso_polyline = polilineas.codificar(coordenadas) if len(coordenadas) else ''
+
+    def polyline_para_zoom(self, tramo: str, zoom=None) -> str:
+        """
+        Retorna el polyline de la ruta adecuado para un nivel de zoom.
+
+        Args:
+            tramo: 'ida' o 'regreso'
+            zoom: Zoom de Leaflet con que se mostrará; None para la geometría completa
+
+        Returns:
+            str: El polyline simplificado del menor nivel que cubre `zoom`, o
+            el completo si el zoom supera todos los niveles precalculados
+        """
+        completo = getattr(self, f'ruta_{tramo}_polyline')
+        if zoom is None:
+            return completo
+        niveles = (self.geometria_simplificada or {}).get(tramo, {})
+        for zoom_maximo in sorted(niveles, key=int):
+            if zoom <= int(zoom_maximo):
+                return niveles[zoom_maximo]
+        return completo
+
+    def coordenadas_para_zoom(self, tramo: str, zoom=None) -> list:
+        """Igual que `polyline_para_zoom`, retornando las coordenadas como [[lat, lng], ...]."""
+        if zoom is None:
+            return getattr(self, f'ruta_{tramo}_coordenadas')
+        return _decodificar_coordenadas(self.polyline_para_zoom(tramo, zoom))
+
+    def calcular_geometria_simplificada(self):
+        """Precalcula los polylines simplificados de ida y regreso en `geometria_simplificada`."""
+        niveles = MAPA_CONFIG["niveles_simplificacion_rutas"]
+        try:
+            self.geometria_simplificada = {
+                tramo: polilineas.niveles_simplificados(getattr(self, f'ruta_{tramo}_polyline'), niveles)
+                for tramo in ('ida', 'regreso')
+            }
+        except ValueError as e:
+            logger.warning("No se pudo simplificar la geometría de la ruta %s: %s", self.pk, e)
+            self.geometria_simplificada = {}
     
     class Meta:
         verbose_name = "Ruta"
@@ -431,12 +558,59 @@ class Ruta(models.Model):
     def __str__(self):
         return f"Ruta {self.paquete.id}: {self.origen_direccion} → {self.destino_direccion}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Recordar los polylines leídos para detectar al guardar si la geometría cambió
+        instancia = super().from_db(db, field_names, values)
+        instancia._polylines_guardados = {
+            campo: valor for campo, valor in zip(field_names, values) if campo in CAMPOS_POLYLINE_RUTA
+        }
+        return instancia
+
+    def _geometria_modificada(self) -> bool:
+        """Indica si algún polyline difiere del guardado en la BD."""
+        guardados = getattr(self, '_polylines_guardados', None)
+        if self._state.adding or guardados is None:
+            return True
+        diferidos = self.get_deferred_fields()
+        return any(
+            campo not in diferidos and getattr(self, campo) != guardados.get(campo)
+            for campo in CAMPOS_POLYLINE_RUTA
+        )
+
     def save(self, *args, **kwargs):
-        """Calcula automáticamente los totales antes de guardar"""
+        """
+        Calcula automáticamente los totales antes de guardar y, si la
+        geometría cambió, los polylines simplificados y la fecha de cálculo
+        (de la que depende el ETag de maps.views.api_ruta_paquete).
+        """
         self.distancia_total_km = self.distancia_ida_km + self.distancia_regreso_km
         self.duracion_total_minutos = self.duracion_ida_minutos + self.duracion_regreso_minutos
+        derivados = {'distancia_total_km', 'duracion_total_minutos'}
+
+        update_fields = kwargs.get('update_fields')
+        if self._geometria_modificada() and (update_fields is None or set(CAMPOS_POLYLINE_RUTA) & set(update_fields)):
+            self.calcular_geometria_simplificada()
+            derivados.add('geometria_simplificada')
+            if not self._state.adding:
+                self.fecha_calculo = timezone.now()
+                derivados.add('fecha_calculo')
+        if update_fields is not None:
+            # update_or_create guarda solo los campos recibidos: incluir los derivados
+            kwargs['update_fields'] = set(update_fields) | derivados
         super().save(*args, **kwargs)
 
+        diferidos = self.get_deferred_fields()
+        self._polylines_guardados = {
+            campo: getattr(self, campo) for campo in CAMPOS_POLYLINE_RUTA if campo not in diferidos
+        }
+
+
+CAMPOS_POLYLINE_RUTA = ('ruta_ida_polyline', 'ruta_regreso_polyline')
+
+# Columnas pesadas de Ruta, que se difieren cuando no se entrega la geometría
+CAMPOS_GEOMETRIA_RUTA = CAMPOS_POLYLINE_RUTA + ('geometria_simplificada',)
+
 # ========== MODELOS DE INFORMACION PARA USUARIOS ==========
 class Notificacion(models.Model):
     """
@@ -488,3 +662,7 @@ class Notificacion(models.Model):
         verbose_name = "Notificación"
         verbose_name_plural = "Notificaciones"
         ordering = ['-fecha_envio']
+        indexes = [
+            # Orden de la paginación por cursor de NotificacionViewSet
+            models.Index(fields=['-fecha_envio', '-id'], name='notificacion_fecha_envio_idx'),
+        ]
@@ -0,0 +1,39 @@
+"""
+Paginación por cursor (keyset) para los ViewSets de la API.
+
+En vez de OFFSET, cada página se pide con un cursor opaco que codifica la
+posición de la última fila entregada, por lo que la consulta de cualquier
+página es un `WHERE columna < posición ORDER BY columna LIMIT n` que
+recorre el índice de la columna: cuesta lo mismo en la primera página que
+en la milésima, y las filas insertadas mientras el cliente pagina no
+desplazan ni duplican resultados.
+
+El orden debe usar columnas indexadas que no cambian después de crear la
+fila (la clave primaria o una fecha auto_now_add).
+
+Parámetros GET:
+- cursor: Cursor recibido en `next` / `previous` de la página anterior
+- page_size: Filas por página (por defecto REST_FRAMEWORK["PAGE_SIZE"],
+  como máximo TAMANO_MAXIMO_PAGINA)
+"""
+
+from rest_framework.pagination import CursorPagination
+
+# Límite de filas por página que un cliente puede pedir con ?page_size=
+TAMANO_MAXIMO_PAGINA = 200
+
+
+class PaginacionCursor(CursorPagination):
+    """Paginación por cursor sobre la clave primaria, de la fila más nueva a la más antigua."""
+    ordering = '-pk'
+    page_size_query_param = 'page_size'
+    max_page_size = TAMANO_MAXIMO_PAGINA
+
+
+class PaginacionCursorFechaEnvio(PaginacionCursor):
+    """
+    Paginación por cursor sobre fecha_envio (índice notificacion_fecha_envio_idx).
+
+    El id desempata las filas con la misma fecha para que el orden sea total.
+    """
+    ordering = ('-fecha_envio', '-id')
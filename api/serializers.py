@@ -6,18 +6,226 @@ manejan la serialización/deserialización de los modelos para la API REST.
 Incluye validaciones personalizadas y lógica de creación para cada entidad.
 """
 
+from typing import NamedTuple, Optional
+
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import FieldDoesNotExist
 from django.db import transaction
 from .models import (
     Usuario, Cliente, Conductor, Despachador, Admin,
     Vehiculo, Ruta, Paquete, Notificacion,
-    TiposRoles
+    TiposRoles, CAMPOS_GEOMETRIA_RUTA
 )
 from django.contrib.auth.models import Group
 from .exceptions import GroupNotConfiguredError
 
-class UsuarioSerializer(serializers.ModelSerializer):
+
+def _parametro_lista(parametros, nombre):
+    """Valores separados por coma del parámetro `nombre`, como conjunto."""
+    return {valor.strip() for valor in parametros.get(nombre, '').split(',') if valor.strip()}
+
+
+def _subrutas(rutas, nombre):
+    """Rutas 'nombre.resto' de `rutas` sin el prefijo del campo `nombre`."""
+    prefijo = nombre + '.'
+    return {ruta[len(prefijo):] for ruta in rutas if ruta.startswith(prefijo)}
+
+
+class SeleccionCampos(NamedTuple):
+    """
+    Campos pedidos con ?fields=, ?exclude= y ?expand= para un nivel del serializer.
+    
+    Los nombres con punto ('cliente.usuario') se refieren a campos de un
+    serializer anidado y se traspasan a ese nivel con `hija`; `prefijo` es
+    la ruta de ese nivel ('cliente.'), para informar los nombres completos.
+    """
+    campos: Optional[set]
+    excluir: set
+    expandir: set
+    prefijo: str = ''
+    
+    @classmethod
+    def desde_parametros(cls, parametros):
+        return cls(
+            _parametro_lista(parametros, 'fields') or None,
+            _parametro_lista(parametros, 'exclude'),
+            _parametro_lista(parametros, 'expand'),
+        )
+    
+    def filtrar(self, campos):
+        """Quita de `campos` (dict nombre -> campo) los que no se pidieron o se excluyeron."""
+        if self.campos is not None:
+            pedidos = {ruta.split('.', 1)[0] for ruta in self.campos}
+            campos = {nombre: campo for nombre, campo in campos.items() if nombre in pedidos}
+        for nombre in self.excluir:
+            campos.pop(nombre, None)
+        return campos
+    
+    def invalidos(self, todos, campos):
+        """
+        Nombres pedidos que no corresponden a un campo de este nivel.
+        
+        Args:
+            todos: Campos del serializer antes de filtrar
+            campos: Campos resultantes, ya expandidos
+            
+        Returns:
+            dict: {parámetro: [nombres completos no válidos]}
+        """
+        invalidos = {}
+        for parametro, rutas in (('fields', self.campos or ()), ('exclude', self.excluir), ('expand', self.expandir)):
+            for ruta in sorted(rutas):
+                nombre, _, resto = ruta.partition('.')
+                campo = campos.get(nombre)
+                anidado = campo is None or isinstance(campo, CamposDinamicosMixin)
+                if nombre not in todos or ((resto or parametro == 'expand') and not anidado):
+                    invalidos.setdefault(parametro, []).append(self.prefijo + ruta)
+        return invalidos
+    
+    def hija(self, nombre):
+        """Selección para el serializer anidado en el campo `nombre`."""
+        campos = None
+        if self.campos is not None and nombre not in self.campos:
+            campos = _subrutas(self.campos, nombre) or None
+        return SeleccionCampos(campos, _subrutas(self.excluir, nombre), _subrutas(self.expandir, nombre),
+                               f'{self.prefijo}{nombre}.')
+
+
+class CamposDinamicosMixin:
+    """
+    Campos a pedido para los ModelSerializer de la API.
+    
+    En las consultas de lectura (GET) el serializer raíz toma de la URL:
+    - ?fields=id,estado: entrega solo esos campos
+    - ?exclude=ubicacion_actual_texto: quita esos campos
+    - ?expand=cliente.usuario: reemplaza la clave foránea por el objeto
+      serializado (con el serializer de SERIALIZERS_EXPANDIBLES)
+    
+    Los nombres con punto se aplican a los serializers anidados, por
+    ejemplo ?expand=cliente&fields=id,cliente.usuario.email. Un nombre que
+    no es un campo (o que no se puede expandir) responde 400.
+    
+    `columnas_lectura` traduce los campos resultantes a las columnas y
+    relaciones que hay que leer (ver ConsultaSegunCamposMixin en api/views.py).
+    Los campos calculados declaran en COLUMNAS_CAMPOS las columnas que usan;
+    si un campo no corresponde a una columna ni está declarado, se leen
+    todas las columnas del modelo.
+    """
+    
+    # Columnas (con '__' para relaciones) que lee cada campo calculado
+    COLUMNAS_CAMPOS = {}
+    
+    def _seleccion(self):
+        """Selección de campos de este nivel, o None si no hay que filtrar."""
+        seleccion = getattr(self, '_seleccion_campos', None)
+        if seleccion is not None:
+            return seleccion
+        raiz = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        request = self.context.get('request')
+        if not raiz or request is None or request.method not in SAFE_METHODS:
+            return None
+        return SeleccionCampos.desde_parametros(getattr(request, 'query_params', request.GET))
+    
+    def get_fields(self):
+        todos = super().get_fields()
+        seleccion = self._seleccion()
+        if seleccion is None:
+            return todos
+        
+        campos = seleccion.filtrar(dict(todos))
+        expandidos = {ruta.split('.', 1)[0] for ruta in seleccion.expandir}
+        for nombre, campo in campos.items():
+            if nombre in expandidos:
+                campo = campos[nombre] = self._expandir(nombre, campo)
+            if isinstance(campo, CamposDinamicosMixin):
+                campo._seleccion_campos = seleccion.hija(nombre)
+        
+        # Los niveles anidados acumulan sus nombres inválidos y el raíz los informa todos juntos
+        invalidos = seleccion.invalidos(todos, campos)
+        for campo in campos.values():
+            if isinstance(campo, CamposDinamicosMixin):
+                for parametro, nombres in campo.campos_invalidos().items():
+                    invalidos.setdefault(parametro, []).extend(nombres)
+        if getattr(self, '_seleccion_campos', None) is not None:
+            self._invalidos = invalidos
+        elif invalidos:
+            raise serializers.ValidationError({
+                parametro: [f"Campos desconocidos o no expandibles: {', '.join(nombres)}."]
+                for parametro, nombres in invalidos.items()
+            })
+        return campos
+    
+    def campos_invalidos(self):
+        """Nombres no válidos de este nivel y los anidados ({parámetro: [nombres]})."""
+        self.fields  # get_fields calcula _invalidos
+        return getattr(self, '_invalidos', {})
+    
+    def _expandir(self, nombre, campo):
+        """Serializer anidado para la clave foránea `nombre`, o el mismo campo si no se puede expandir."""
+        if isinstance(campo, serializers.BaseSerializer):
+            return campo
+        origen = campo.source or nombre
+        try:
+            campo_modelo = self.Meta.model._meta.get_field(origen)
+        except FieldDoesNotExist:
+            return campo
+        if not (campo_modelo.concrete and (campo_modelo.many_to_one or campo_modelo.one_to_one)):
+            return campo
+        clase = SERIALIZERS_EXPANDIBLES.get(campo_modelo.related_model)
+        if clase is None:
+            return campo
+        return clase(read_only=True, **({} if origen == nombre else {'source': origen}))
+    
+    def columnas_lectura(self, prefijo=''):
+        """
+        Columnas y relaciones que lee la representación de este serializer.
+        
+        Args:
+            prefijo: Ruta de la relación desde el modelo raíz ('cliente__')
+            
+        Returns:
+            tuple: (columnas para .only(), relaciones para select_related)
+        """
+        modelo = self.Meta.model
+        columnas, relaciones = [], []
+        todas = False
+        
+        for nombre, campo in self.fields.items():
+            if campo.write_only:
+                continue
+            if nombre in self.COLUMNAS_CAMPOS:
+                for columna in self.COLUMNAS_CAMPOS[nombre]:
+                    columnas.append(prefijo + columna)
+                    partes = columna.split('__')[:-1]
+                    relaciones += [prefijo + '__'.join(partes[:i]) for i in range(1, len(partes) + 1)]
+                continue
+            try:
+                campo_modelo = modelo._meta.get_field(campo.source) if len(campo.source_attrs) == 1 else None
+            except FieldDoesNotExist:
+                campo_modelo = None
+            if campo_modelo is None or not campo_modelo.concrete:
+                todas = True
+                continue
+            
+            columnas.append(prefijo + campo_modelo.name)
+            if isinstance(campo, CamposDinamicosMixin):
+                relacion = prefijo + campo_modelo.name
+                columnas_anidadas, relaciones_anidadas = campo.columnas_lectura(relacion + '__')
+                columnas += columnas_anidadas
+                relaciones += [relacion, *relaciones_anidadas]
+            elif isinstance(campo, serializers.BaseSerializer):
+                todas = True
+        
+        if todas:
+            columnas += [prefijo + campo.name for campo in modelo._meta.concrete_fields]
+        return columnas, relaciones
+
+
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer base para el modelo Usuario.
     
@@ -28,7 +236,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
     Campos especiales:
     - password: Solo escritura, validado con validadores de Django
     - rol: Solo lectura, se asigna automáticamente según el contexto
-    - is_superuser: Campo calculado para indicar permisos administrativos
+    - is_superuser: Solo lectura, indica permisos administrativos
     """
     
     # Solo escritura para mayor seguridad
@@ -45,8 +253,9 @@ class UsuarioSerializer(serializers.ModelSerializer):
         help_text="Rol del usuario en el sistema"
     )
     
-    # Campo calculado dinámicamente
-    is_superuser = serializers.SerializerMethodField(
+    # Solo lectura, se lee directamente de la columna (sin método por fila)
+    is_superuser = serializers.BooleanField(
+        read_only=True,
         help_text="Indica si el usuario tiene permisos de superusuario"
     )
 
@@ -54,10 +263,6 @@ class UsuarioSerializer(serializers.ModelSerializer):
         model = Usuario
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'telefono', 'password', 'rol', 'is_superuser']
 
-    def get_is_superuser(self, obj):
-        """Determina si el usuario tiene permisos de superusuario."""
-        return obj.is_superuser
-
     def validate(self, attrs):
         """
         Validaciones a nivel de serializer para unicidad de username y email.
@@ -129,7 +334,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
         
         return usuario
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Cliente.
     
@@ -182,7 +387,7 @@ class ClienteSerializer(serializers.ModelSerializer):
             # Crear cliente asociado al usuario
             return Cliente.objects.create(usuario=usuario, **validated_data)
 
-class ConductorSerializer(serializers.ModelSerializer):
+class ConductorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Conductor.
     
@@ -246,7 +451,7 @@ class ConductorSerializer(serializers.ModelSerializer):
             # Crear conductor con estado inicial 'disponible'
             return Conductor.objects.create(usuario=usuario, estado='disponible', **validated_data)
 
-class DespachadorSerializer(serializers.ModelSerializer):
+class DespachadorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Despachador.
     
@@ -299,7 +504,7 @@ class DespachadorSerializer(serializers.ModelSerializer):
             # Crear despachador asociado al usuario
             return Despachador.objects.create(usuario=usuario, **validated_data)
 
-class AdminSerializer(serializers.ModelSerializer):
+class AdminSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Admin.
     
@@ -373,7 +578,7 @@ class AdminSerializer(serializers.ModelSerializer):
             # Crear administrador asociado al usuario
             return Admin.objects.create(usuario=usuario, **validated_data)
 
-class VehiculoSerializer(serializers.ModelSerializer):
+class VehiculoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Vehiculo.
     
@@ -407,7 +612,32 @@ class VehiculoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("La matrícula ya está registrada.")
         return value
 
-class RutaSerializer(serializers.ModelSerializer):
+# Formatos de la geometría de Ruta para ?format=; el primero es el por defecto
+FORMATOS_GEOMETRIA_RUTA = ('coordenadas', 'polyline')
+
+
+def geometria_solicitada(request):
+    """
+    Formato de geometría de Ruta pedido en la consulta.
+    
+    Args:
+        request: Request de DRF o HttpRequest de Django, o None
+        
+    Returns:
+        str: 'coordenadas' o 'polyline' si se indicó ?include=geometry
+             (según ?format=), o None si no se pidió la geometría
+    """
+    if request is None:
+        return None
+    parametros = getattr(request, 'query_params', request.GET)
+    incluidos = {valor.strip() for valor in parametros.get('include', '').split(',')}
+    if 'geometry' not in incluidos:
+        return None
+    formato = parametros.get('format')
+    return formato if formato in FORMATOS_GEOMETRIA_RUTA else FORMATOS_GEOMETRIA_RUTA[0]
+
+
+class RutaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Ruta con métodos optimizados para el frontend.
     
@@ -421,6 +651,13 @@ class RutaSerializer(serializers.ModelSerializer):
     - rutas_data_polyline: Datos de rutas usando polylines comprimidos
     - duracion_real_minutos: Duración calculada entre fecha_inicio y fecha_fin
     
+    La geometría es opcional: solo se incluye con ?include=geometry, como
+    rutas_data (&format=coordenadas, por defecto) o como rutas_data_polyline
+    (&format=polyline). Los polylines crudos son de solo escritura.
+    
+    Con el parámetro ?zoom=<nivel de Leaflet> ambos campos usan la geometría
+    simplificada que corresponde a ese zoom en vez de la completa.
+    
     Campos de solo lectura:
     - fecha_calculo: Se asigna automáticamente al calcular la ruta
     - distancia_total_km: Calculada automáticamente por el sistema de mapas
@@ -443,20 +680,57 @@ class RutaSerializer(serializers.ModelSerializer):
         help_text="Duración real de la ruta calculada entre fecha_inicio y fecha_fin"
     )
     
+    COLUMNAS_CAMPOS = {
+        'rutas_data': CAMPOS_GEOMETRIA_RUTA + (
+            'distancia_ida_km', 'duracion_ida_minutos', 'distancia_regreso_km', 'duracion_regreso_minutos'
+        ),
+        'rutas_data_polyline': CAMPOS_GEOMETRIA_RUTA + (
+            'distancia_ida_km', 'duracion_ida_minutos', 'distancia_regreso_km', 'duracion_regreso_minutos'
+        ),
+        'duracion_real_minutos': ('fecha_inicio_ruta', 'fecha_fin_ruta'),
+    }
+    
     class Meta:
         model = Ruta
-        fields = '__all__'
+        # Los niveles simplificados se entregan dentro de rutas_data_polyline
+        exclude = ['geometria_simplificada']
         read_only_fields = [
             'fecha_calculo', 'distancia_total_km', 'duracion_total_minutos', 'duracion_real_minutos'
         ]
+        # La geometría se entrega en rutas_data / rutas_data_polyline, solo si se pide
+        extra_kwargs = {
+            'ruta_ida_polyline': {'write_only': True},
+            'ruta_regreso_polyline': {'write_only': True},
+        }
+    
+    def get_fields(self):
+        """Quita los campos de geometría que no se pidieron con ?include=geometry."""
+        campos = super().get_fields()
+        formato = geometria_solicitada(self.context.get('request'))
+        if formato != 'coordenadas':
+            campos.pop('rutas_data', None)
+        if formato != 'polyline':
+            campos.pop('rutas_data_polyline', None)
+        return campos
+    
+    def _zoom(self):
+        """Nivel de zoom pedido con ?zoom=, o None para la geometría completa."""
+        request = self.context.get('request')
+        if request is None:
+            return None
+        try:
+            # También acepta un HttpRequest de Django (ver maps.views.api_ruta_paquete)
+            return int(getattr(request, 'query_params', request.GET).get('zoom'))
+        except (TypeError, ValueError):
+            return None
     
     def get_rutas_data(self, obj):
         """
         Devuelve los datos de rutas con coordenadas directas para el frontend.
         
         Genera pasos básicos de navegación basados en las coordenadas
-        almacenadas, proporcionando una estructura completa para
-        renderizado en mapas interactivos.
+        decodificadas de los polylines de la ruta, proporcionando una
+        estructura completa para renderizado en mapas interactivos.
         
         Args:
             obj: Instancia del modelo Ruta
@@ -518,22 +792,26 @@ class RutaSerializer(serializers.ModelSerializer):
             
             return pasos
         
+        zoom = self._zoom()
+        coordenadas_ida = obj.coordenadas_para_zoom('ida', zoom)
+        coordenadas_regreso = obj.coordenadas_para_zoom('regreso', zoom)
+        
         return [
             {
-                'coordenadas': obj.ruta_ida_coordenadas,
+                'coordenadas': coordenadas_ida,
                 'distancia_km': obj.distancia_ida_km,
                 'duracion_minutos': obj.duracion_ida_minutos,
                 'color': '#3388ff',
                 'nombre': 'Ruta de Ida',
-                'pasos': generar_pasos_basicos(obj.ruta_ida_coordenadas, es_ida=True)
+                'pasos': generar_pasos_basicos(coordenadas_ida, es_ida=True)
             },
             {
-                'coordenadas': obj.ruta_regreso_coordenadas,
+                'coordenadas': coordenadas_regreso,
                 'distancia_km': obj.distancia_regreso_km,
                 'duracion_minutos': obj.duracion_regreso_minutos,
                 'color': '#ff8833',
                 'nombre': 'Ruta de Regreso',
-                'pasos': generar_pasos_basicos(obj.ruta_regreso_coordenadas, es_ida=False)
+                'pasos': generar_pasos_basicos(coordenadas_regreso, es_ida=False)
             }
         ]
     
@@ -550,30 +828,59 @@ class RutaSerializer(serializers.ModelSerializer):
             
         Returns:
             list: Lista con datos de ruta usando polylines, incluyendo:
-                - polyline: Polyline codificado de la ruta
+                - polyline: Polyline codificado de la ruta (el del zoom pedido, si se indicó)
+                - niveles: {zoom máximo: polyline simplificado}, solo sin ?zoom=,
+                  para que el mapa cambie de nivel al hacer zoom
                 - distancia_km: Distancia en kilómetros
                 - duracion_minutos: Duración estimada en minutos
                 - color: Color para renderización en mapa
                 - nombre: Nombre descriptivo de la ruta
         """
-        return [
+        zoom = self._zoom()
+        rutas = [
             {
-                'polyline': obj.ruta_ida_polyline,
+                'polyline': obj.polyline_para_zoom('ida', zoom),
                 'distancia_km': obj.distancia_ida_km,
                 'duracion_minutos': obj.duracion_ida_minutos,
                 'color': '#3388ff',
                 'nombre': 'Ruta de Ida'
             },
             {
-                'polyline': obj.ruta_regreso_polyline,
+                'polyline': obj.polyline_para_zoom('regreso', zoom),
                 'distancia_km': obj.distancia_regreso_km,
                 'duracion_minutos': obj.duracion_regreso_minutos,
                 'color': '#ff8833',
                 'nombre': 'Ruta de Regreso'
             }
         ]
+        if zoom is None:
+            niveles = obj.geometria_simplificada or {}
+            rutas[0]['niveles'] = niveles.get('ida', {})
+            rutas[1]['niveles'] = niveles.get('regreso', {})
+        return rutas
 
-class PaqueteSerializer(serializers.ModelSerializer):
+class RutaListaSerializer(RutaSerializer):
+    """
+    Representación liviana de Ruta para el listado.
+    
+    Solo entrega identificadores, distancias, duraciones y fechas; las
+    direcciones, coordenadas de origen/destino y la geometría quedan para el
+    detalle. La geometría se puede pedir igual que en RutaSerializer, con
+    ?include=geometry&format=coordenadas|polyline.
+    """
+    
+    class Meta:
+        model = Ruta
+        fields = [
+            'id', 'paquete', 'tipo_ruta',
+            'distancia_ida_km', 'duracion_ida_minutos',
+            'distancia_regreso_km', 'duracion_regreso_minutos',
+            'distancia_total_km', 'duracion_total_minutos', 'duracion_real_minutos',
+            'fecha_calculo', 'fecha_inicio_ruta', 'fecha_fin_ruta',
+            'rutas_data', 'rutas_data_polyline',
+        ]
+
+class PaqueteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Paquete.
     
@@ -595,8 +902,9 @@ class PaqueteSerializer(serializers.ModelSerializer):
     - Fechas: La fecha de entrega debe ser posterior a la de registro
     
     Funcionalidades automáticas:
-    - Cálculo de ruta al crear el paquete
-    - Recálculo de ruta al cambiar la dirección de envío
+    - Cálculo de ruta en segundo plano al crear el paquete
+    - Recálculo de ruta en segundo plano al cambiar la dirección de envío
+    - estado_ruta: 'calculada', 'pendiente', 'fallida' o 'sin_calcular'
     """
     
     # Campos de ubicación de solo lectura (calculados automáticamente)
@@ -614,17 +922,38 @@ class PaqueteSerializer(serializers.ModelSerializer):
     )
     direccion_envio_lat = serializers.FloatField(
         read_only=True,
-        help_text="Latitud de la dirección de envío"
+        help_text="Latitud de la dirección de envío (nula mientras la ruta está pendiente)"
     )
     direccion_envio_lng = serializers.FloatField(
         read_only=True,
-        help_text="Longitud de la dirección de envío"
+        help_text="Longitud de la dirección de envío (nula mientras la ruta está pendiente)"
     )
+    estado_ruta = serializers.SerializerMethodField(
+        help_text="Estado del cálculo de la ruta: calculada, pendiente, fallida o sin_calcular"
+    )
+    
+    # estado_ruta consulta el trabajo en cola y si existe la ruta (sin su geometría)
+    COLUMNAS_CAMPOS = {
+        'estado_ruta': ('trabajo_ruta__estado', 'ruta__id'),
+    }
 
     class Meta:
         model = Paquete
         fields = '__all__'
 
+    def get_estado_ruta(self, obj):
+        """
+        Retorna el estado del cálculo de la ruta del paquete.
+        
+        Args:
+            obj: Instancia del paquete
+            
+        Returns:
+            str: 'calculada', 'pendiente', 'fallida' o 'sin_calcular'
+        """
+        from maps.cola_rutas import estado_ruta_paquete
+        return estado_ruta_paquete(obj)
+
     def validate_peso(self, value):
         """
         Valida que el peso esté dentro del rango permitido.
@@ -782,10 +1111,12 @@ class PaqueteSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Crea un paquete y calcula automáticamente su ruta.
+        Crea un paquete y encola el cálculo de su ruta.
         
-        Primero intenta geocodificar la dirección, luego crea el paquete
-        y finalmente calcula la ruta completa.
+        El paquete se guarda sin coordenadas de envío; el worker de rutas
+        geocodifica la dirección, calcula la ruta completa y las completa.
+        Mientras tanto `estado_ruta` es 'pendiente' y direccion_envio_lat /
+        direccion_envio_lng son nulas (el filtro destino_bbox no lo incluye).
         
         Args:
             validated_data: Datos validados del paquete
@@ -793,54 +1124,26 @@ class PaqueteSerializer(serializers.ModelSerializer):
         Returns:
             Paquete: Instancia del paquete creado
         """
-        from maps.constants import UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
-        
-        # Primero intentar geocodificar la dirección de envío
-        direccion_texto = validated_data.get('direccion_envio_texto', '')
-        coordenadas_calculadas = None
-        
-        if direccion_texto:
-            try:
-                from maps.utilities import obtener_coordenadas
-                coordenadas_calculadas = obtener_coordenadas(direccion_texto)
-            except Exception:
-                pass
-        
-        # Establecer coordenadas (geocodificadas o por defecto)
-        if coordenadas_calculadas:
-            validated_data['direccion_envio_lat'] = coordenadas_calculadas[0]
-            validated_data['direccion_envio_lng'] = coordenadas_calculadas[1]
-        else:
-            validated_data['direccion_envio_lat'] = UNIVERSIDAD_CONCEPCION_COORDS_TUPLE[0]
-            validated_data['direccion_envio_lng'] = UNIVERSIDAD_CONCEPCION_COORDS_TUPLE[1]
-        
         # Crear y guardar el paquete
         paquete = Paquete(**validated_data)
         paquete.save()
         
-        # Intentar calcular la ruta completa después de guardar el paquete
-        try:
-            from maps.utilities import calcular_y_guardar_ruta_paquete
-            ruta, error = calcular_y_guardar_ruta_paquete(paquete)
-            
-            if ruta and not error:
-                # Actualizar coordenadas si la ruta se calculó exitosamente
-                paquete.direccion_envio_lat = ruta.destino_lat
-                paquete.direccion_envio_lng = ruta.destino_lng
-                paquete.save()
-        except Exception as e:
-            # Si falla el cálculo de ruta, mantener las coordenadas geocodificadas
-            pass
+        # Encolar el cálculo de la ruta; el worker (manage.py procesar_rutas)
+        # la calcula y actualiza las coordenadas de envío
+        from maps.cola_rutas import encolar_calculo_ruta
+        encolar_calculo_ruta(paquete)
         
         return paquete
     
     def update(self, instance, validated_data):
         """
-        Actualiza un paquete y recalcula la ruta si la dirección cambió.
+        Actualiza un paquete y encola el recálculo de la ruta si la dirección cambió.
         
-        Si la dirección de envío ha cambiado, recalcula automáticamente
-        la ruta. Si ocurre un error en el recálculo, intenta geocodificar
-        la nueva dirección.
+        Al cambiar la dirección, las coordenadas de envío vuelven a ser nulas
+        hasta que el worker geocodifica la nueva dirección.
+        
+        Si solo cambió el conductor asignado, se sube la prioridad del
+        cálculo pendiente (los paquetes asignados se procesan primero).
         
         Args:
             instance: Instancia actual del paquete
@@ -849,36 +1152,23 @@ class PaqueteSerializer(serializers.ModelSerializer):
         Returns:
             Paquete: Instancia del paquete actualizado
         """
+        from maps.cola_rutas import encolar_calculo_ruta, actualizar_prioridad
+        
         direccion_anterior = instance.direccion_envio_texto
+        conductor_anterior = instance.conductor_id
+        if validated_data.get('direccion_envio_texto', direccion_anterior) != direccion_anterior:
+            validated_data['direccion_envio_lat'] = validated_data['direccion_envio_lng'] = None
         paquete = super().update(instance, validated_data)
         
-        # Si cambió la dirección de envío, recalcular la ruta
+        # Si cambió la dirección de envío, recalcular la ruta en segundo plano
         if paquete.direccion_envio_texto != direccion_anterior:
-            try:
-                from maps.utilities import calcular_y_guardar_ruta_paquete
-                ruta, error = calcular_y_guardar_ruta_paquete(paquete)
-                
-                if ruta and not error:
-                    # Actualizar coordenadas si la ruta se calculó exitosamente
-                    paquete.direccion_envio_lat = ruta.destino_lat
-                    paquete.direccion_envio_lng = ruta.destino_lng
-                    paquete.save()
-            except Exception:
-                # Si falla el cálculo de ruta, intentar geocodificar la nueva dirección
-                try:
-                    from maps.utilities import obtener_coordenadas
-                    coordenadas = obtener_coordenadas(paquete.direccion_envio_texto)
-                    if coordenadas:
-                        paquete.direccion_envio_lat = coordenadas[0]
-                        paquete.direccion_envio_lng = coordenadas[1]
-                        paquete.save()
-                except Exception:
-                    # Si todo falla, mantener las coordenadas actuales
-                    pass
+            encolar_calculo_ruta(paquete)
+        elif paquete.conductor_id != conductor_anterior:
+            actualizar_prioridad(paquete)
         
         return paquete
 
-class NotificacionSerializer(serializers.ModelSerializer):
+class NotificacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializer para el modelo Notificacion.
     
@@ -899,3 +1189,15 @@ class NotificacionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notificacion
         fields = '__all__'
+
+
+# Serializer con que ?expand= anida cada modelo referenciado por una clave foránea
+SERIALIZERS_EXPANDIBLES = {
+    Usuario: UsuarioSerializer,
+    Cliente: ClienteSerializer,
+    Conductor: ConductorSerializer,
+    Despachador: DespachadorSerializer,
+    Admin: AdminSerializer,
+    Vehiculo: VehiculoSerializer,
+    Paquete: PaqueteSerializer,
+}
@@ -1,3 +1,200 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    Usuario, Cliente, Conductor, Despachador, Admin, Vehiculo, Paquete, Notificacion,
+    TiposRoles, EstadoPaquete
+)
+from .views import PaqueteViewSet, NotificacionViewSet
+
+
+class ConsultasUsuarioAnidadoTests(TestCase):
+    """
+    Los ViewSets con UsuarioSerializer anidado deben listar con un número de
+    consultas que no dependa de la cantidad de filas (sin N+1).
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create(username='consultor'))
+
+    def _crear(self, modelo, rol, cantidad, **extra):
+        for _ in range(cantidad):
+            numero = Usuario.objects.count()
+            usuario = Usuario.objects.create(username=f'{rol}{numero}', email=f'{rol}{numero}@example.com', rol=rol)
+            modelo.objects.create(usuario=usuario, **extra)
+
+    def _consultas_al_listar(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(contexto.captured_queries), len(response.json()['results'])
+
+    def _verificar_constante(self, url, modelo, rol, **extra):
+        self._crear(modelo, rol, 2, **extra)
+        consultas_pocas, filas_pocas = self._consultas_al_listar(url)
+        self._crear(modelo, rol, 8, **extra)
+        consultas_muchas, filas_muchas = self._consultas_al_listar(url)
+
+        self.assertEqual((filas_pocas, filas_muchas), (2, 10))
+        self.assertEqual(consultas_pocas, consultas_muchas)
+
+    def test_clientes(self):
+        self._verificar_constante('/api/clientes/', Cliente, TiposRoles.CLIENTE)
+
+    def test_conductores(self):
+        vehiculo = Vehiculo.objects.create(matricula='AB1234', marca='Marca', año_de_fabricacion=2020)
+        self._verificar_constante('/api/conductores/', Conductor, TiposRoles.CONDUCTOR, vehiculo=vehiculo)
+
+    def test_despachadores(self):
+        self._verificar_constante('/api/despachador/', Despachador, TiposRoles.DESPACHADOR)
+
+    def test_admins(self):
+        self._verificar_constante('/api/admins/', Admin, TiposRoles.ADMIN)
+
+    def test_usuario_anidado_completo(self):
+        self._crear(Cliente, TiposRoles.CLIENTE, 1)
+        usuario = self.client.get('/api/clientes/').json()['results'][0]['usuario']
+
+        self.assertEqual(
+            set(usuario), {'id', 'username', 'email', 'first_name', 'last_name', 'telefono', 'rol', 'is_superuser'}
+        )
+        self.assertFalse(usuario['is_superuser'])
+
+
+class CamposDinamicosTests(TestCase):
+    """?fields=, ?exclude= y ?expand= solo aceptan nombres de campos existentes."""
+
+    def setUp(self):
+        usuario = Usuario.objects.create(username='cliente', email='cliente@example.com', rol=TiposRoles.CLIENTE)
+        Cliente.objects.create(usuario=usuario)
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+
+    def test_campos_anidados(self):
+        response = self.client.get('/api/clientes/?fields=id,usuario.email&exclude=usuario.rol')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'usuario'})
+        self.assertEqual(response.json()['results'][0]['usuario'], {'email': 'cliente@example.com'})
+
+    def test_nombres_invalidos(self):
+        response = self.client.get('/api/clientes/?fields=id,direccion,usuario.clave&expand=id')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+        self.assertIn('direccion, usuario.clave', response.json()['fields'][0])
+
+
+class FiltrosIndexadosTests(TestCase):
+    """
+    Cada filtro de PaqueteViewSet y NotificacionViewSet debe recaer sobre una
+    columna indexada y resolverse con el índice, sin recorrer la tabla.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(username='integrador', rol=TiposRoles.CLIENTE)
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario)
+        cls.inicio = timezone.now() - timedelta(days=200)
+        estados = [EstadoPaquete.EN_BODEGA, EstadoPaquete.EN_RUTA, EstadoPaquete.ENTREGADO]
+
+        paquetes = Paquete.objects.bulk_create([
+            Paquete(
+                largo=10, ancho=10, alto=10, peso=1, estado=estados[i % 3],
+                nombre_destinatario='Destinatario', rut_destinatario='1-9',
+                telefono_destinatario='+56 9 8765 4321', cliente=cls.cliente,
+                direccion_envio_lat=-36.8 + i * 0.001, direccion_envio_lng=-73.0 + i * 0.001,
+                direccion_envio_texto=f'Calle {i}', fecha_entrega=cls.inicio + timedelta(days=i + 2),
+            )
+            for i in range(200)
+        ])
+        notificaciones = Notificacion.objects.bulk_create([
+            Notificacion(cliente=cls.cliente, paquete=paquete, mensaje='Cambio de estado') for paquete in paquetes
+        ])
+        # Las fechas auto_now_add se reparten después de crear las filas
+        for i, (paquete, notificacion) in enumerate(zip(paquetes, notificaciones)):
+            paquete.fecha_registro = notificacion.fecha_envio = cls.inicio + timedelta(days=i)
+        Paquete.objects.bulk_update(paquetes, ['fecha_registro'])
+        Notificacion.objects.bulk_update(notificaciones, ['fecha_envio'])
+
+        # Estadísticas para que el planificador conozca la selectividad de cada índice
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _fecha(self, dias):
+        return (self.inicio + timedelta(days=dias)).date().isoformat()
+
+    def test_filtros_sobre_columnas_indexadas(self):
+        for vista in (PaqueteViewSet, NotificacionViewSet):
+            modelo = vista.queryset.model
+            indexadas = {indice.fields[0].lstrip('-') for indice in modelo._meta.indexes}
+            indexadas |= {
+                campo.name for campo in modelo._meta.concrete_fields
+                if campo.db_index or campo.unique or campo.primary_key
+            }
+            for nombre, filtro in vista.filtros.items():
+                with self.subTest(vista=vista.__name__, filtro=nombre):
+                    self.assertIn(filtro.columnas[0], indexadas)
+
+    @skipUnless(connection.vendor == 'sqlite', 'El plan se verifica con EXPLAIN QUERY PLAN de SQLite')
+    def test_filtros_usan_indice(self):
+        consultas = {
+            'api_paquete': [
+                '/api/paquetes/?estado=en_ruta',
+                f'/api/paquetes/?cliente={self.cliente.id}',
+                '/api/paquetes/?conductor=1',
+                '/api/paquetes/?despachador=1',
+                f'/api/paquetes/?fecha_registro_desde={self._fecha(50)}&fecha_registro_hasta={self._fecha(55)}',
+                f'/api/paquetes/?fecha_entrega_desde={self._fecha(50)}&fecha_entrega_hasta={self._fecha(55)}',
+                '/api/paquetes/?destino_bbox=-36.75,-73.0,-36.7,-72.9',
+                '/api/paquetes/?ordering=fecha_registro',
+            ],
+            'api_notificacion': [
+                f'/api/notificaciones/?cliente={self.cliente.id}',
+                '/api/notificaciones/?paquete=1',
+                f'/api/notificaciones/?fecha_envio_desde={self._fecha(50)}&fecha_envio_hasta={self._fecha(55)}',
+            ],
+        }
+        for tabla, urls in consultas.items():
+            for url in urls:
+                with self.subTest(url=url):
+                    with CaptureQueriesContext(connection) as contexto:
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+                    sql = next(q['sql'] for q in contexto.captured_queries if f'FROM "{tabla}"' in q['sql'])
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                        plan = [fila[-1] for fila in cursor.fetchall()]
+                    self.assertNotIn(f'SCAN {tabla}', plan)
+
+    def test_fecha_hasta_incluye_el_dia(self):
+        for url in (
+            f'/api/paquetes/?fecha_registro_desde={self._fecha(50)}&fecha_registro_hasta={self._fecha(55)}',
+            f'/api/notificaciones/?fecha_envio_desde={self._fecha(50)}&fecha_envio_hasta={self._fecha(55)}',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 6)
+
+        hasta = (self.inicio + timedelta(days=55)).isoformat().replace('+00:00', 'Z')
+        response = self.client.get(f'/api/paquetes/?fecha_registro_desde={self._fecha(50)}&fecha_registro_hasta={hasta}')
+        self.assertEqual(len(response.json()['results']), 6)
+
+    def test_valores_invalidos(self):
+        response = self.client.get('/api/paquetes/?estado=perdido&destino_bbox=1,2&cliente=uno')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'estado', 'destino_bbox', 'cliente'})
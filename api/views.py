@@ -1,19 +1,50 @@
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.filters import OrderingFilter
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.permissions import IsAuthenticated
 from .models import (
     Usuario, Cliente, Conductor, Despachador, Admin,
-    Vehiculo, Ruta, Paquete, Notificacion
+    Vehiculo, Ruta, Paquete, Notificacion, EstadoPaquete
 )
 from .serializers import (
     UsuarioSerializer, ClienteSerializer,
     ConductorSerializer, DespachadorSerializer, AdminSerializer,
-    VehiculoSerializer, RutaSerializer,
-    PaqueteSerializer, NotificacionSerializer
+    VehiculoSerializer, RutaSerializer, RutaListaSerializer,
+    PaqueteSerializer, NotificacionSerializer,
+    FORMATOS_GEOMETRIA_RUTA
 )
+from .filtros import Filtro, FiltroCaja, FiltroFecha, FiltrosIndexados
+from .paginacion import PaginacionCursorFechaEnvio
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import serializers, status
 
-class UsuarioViewSet(ModelViewSet):
+class ConsultaSegunCamposMixin:
+    """
+    Lee de la base de datos solo lo que el serializer va a entregar.
+
+    Al listar o consultar, las columnas (.only()) y las relaciones
+    (select_related) salen de los campos del serializer, ya filtrados por
+    ?fields= / ?exclude= y ampliados por ?expand= (ver
+    CamposDinamicosMixin.columnas_lectura). Así los serializers anidados
+    no generan una consulta por fila (N+1) y no se leen columnas que no se
+    serializan, como el hash de la contraseña del usuario.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            columnas, relaciones = self.get_serializer().columnas_lectura()
+            # La paginación por cursor lee de la última fila los campos de orden
+            obtener_orden = getattr(self.paginator, 'get_ordering', None)
+            orden = obtener_orden(self.request, queryset, self) if obtener_orden else ()
+            orden = [campo.lstrip('-') for campo in orden]
+            if relaciones:
+                # Sin argumentos, select_related seguiría todas las claves foráneas
+                queryset = queryset.select_related(*relaciones)
+            queryset = queryset.only(*columnas, *(campo for campo in orden if campo != 'pk'))
+        return queryset
+
+class UsuarioViewSet(ConsultaSegunCamposMixin, ModelViewSet):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     #permission_classes = [IsAuthenticated]
@@ -25,7 +56,7 @@ class UsuarioViewSet(ModelViewSet):
             status=status.HTTP_403_FORBIDDEN
         )
 
-class ClienteViewSet(ModelViewSet):
+class ClienteViewSet(ConsultaSegunCamposMixin, ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     #permission_classes = [IsAuthenticated]
@@ -41,7 +72,7 @@ class ClienteViewSet(ModelViewSet):
         context['request'] = self.request
         return context
 
-class ConductorViewSet(ModelViewSet):
+class ConductorViewSet(ConsultaSegunCamposMixin, ModelViewSet):
     queryset = Conductor.objects.all()
     serializer_class = ConductorSerializer
     #permission_classes = [IsAuthenticated]
@@ -57,7 +88,7 @@ class ConductorViewSet(ModelViewSet):
         context['request'] = self.request
         return context
 
-class DespachadorViewSet(ModelViewSet):
+class DespachadorViewSet(ConsultaSegunCamposMixin, ModelViewSet):
     queryset = Despachador.objects.all()
     serializer_class = DespachadorSerializer
     #permission_classes = [IsAuthenticated]
@@ -73,7 +104,7 @@ class DespachadorViewSet(ModelViewSet):
         context['request'] = self.request
         return context
 
-class AdminViewSet(ModelViewSet):
+class AdminViewSet(ConsultaSegunCamposMixin, ModelViewSet):
     queryset = Admin.objects.all()
     serializer_class = AdminSerializer
     #permission_classes = [IsAuthenticated]
@@ -89,22 +120,74 @@ class AdminViewSet(ModelViewSet):
         context['request'] = self.request
         return context
 
-class VehiculoViewSet(ModelViewSet):
+class VehiculoViewSet(ConsultaSegunCamposMixin, ModelViewSet):
     queryset = Vehiculo.objects.all()
     serializer_class = VehiculoSerializer
     #permission_classes = [IsAuthenticated]
 
-class RutaViewSet(ModelViewSet):
+class NegociacionGeometriaRuta(DefaultContentNegotiation):
+    """
+    Negociación de contenido que no confunde ?format=coordenadas|polyline
+    (formato de la geometría de Ruta) con el formato de la respuesta.
+    """
+
+    def filter_renderers(self, renderers, format):
+        if format in FORMATOS_GEOMETRIA_RUTA:
+            return renderers
+        return super().filter_renderers(renderers, format)
+
+class RutaViewSet(ConsultaSegunCamposMixin, ModelViewSet):
+    """
+    Rutas con un listado liviano (RutaListaSerializer) y el detalle completo.
+
+    Las columnas de geometría (polylines y niveles simplificados) solo se
+    leen si se piden con ?include=geometry&format=coordenadas|polyline.
+    """
     queryset = Ruta.objects.all()
     serializer_class = RutaSerializer
+    content_negotiation_class = NegociacionGeometriaRuta
     #permission_classes = [IsAuthenticated]
 
-class PaqueteViewSet(ModelViewSet):
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return RutaListaSerializer
+        return RutaSerializer
+
+class PaqueteViewSet(ConsultaSegunCamposMixin, ModelViewSet):
+    """
+    Paquetes con filtros indexados (ver api/filtros.py) y ?ordering=.
+
+    Fechas en ISO 8601 ('2025-06-01' o '2025-06-01T08:00:00-04:00'); estado,
+    conductor, cliente y despachador aceptan varios valores separados por coma.
+    """
     queryset = Paquete.objects.all()
     serializer_class = PaqueteSerializer
+    filter_backends = [FiltrosIndexados, OrderingFilter]
+    filtros = {
+        'estado': Filtro('estado', serializers.ChoiceField(EstadoPaquete.choices), multiple=True),
+        'conductor': Filtro('conductor', serializers.IntegerField(min_value=1), multiple=True),
+        'cliente': Filtro('cliente', serializers.IntegerField(min_value=1), multiple=True),
+        'despachador': Filtro('despachador', serializers.IntegerField(min_value=1), multiple=True),
+        'fecha_registro_desde': FiltroFecha('fecha_registro'),
+        'fecha_registro_hasta': FiltroFecha('fecha_registro', hasta=True),
+        'fecha_entrega_desde': FiltroFecha('fecha_entrega'),
+        'fecha_entrega_hasta': FiltroFecha('fecha_entrega', hasta=True),
+        'destino_bbox': FiltroCaja('direccion_envio_lat', 'direccion_envio_lng'),
+    }
+    # Columnas indexadas y sin nulos, como exige la paginación por cursor
+    ordering_fields = ['id', 'fecha_registro']
     #permission_classes = [IsAuthenticated]
 
-class NotificacionViewSet(ModelViewSet):
+class NotificacionViewSet(ConsultaSegunCamposMixin, ModelViewSet):
     queryset = Notificacion.objects.all()
     serializer_class = NotificacionSerializer
+    pagination_class = PaginacionCursorFechaEnvio
+    filter_backends = [FiltrosIndexados, OrderingFilter]
+    filtros = {
+        'cliente': Filtro('cliente', serializers.IntegerField(min_value=1), multiple=True),
+        'paquete': Filtro('paquete', serializers.IntegerField(min_value=1), multiple=True),
+        'fecha_envio_desde': FiltroFecha('fecha_envio'),
+        'fecha_envio_hasta': FiltroFecha('fecha_envio', hasta=True),
+    }
+    ordering_fields = ['id', 'fecha_envio']
     #permission_classes = [IsAuthenticated]
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class MapsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'maps'
+
+    def ready(self):
+        # Cargar el índice vial local (si hay un extracto OSM configurado)
+        from .indice_vial import precargar_indice_vial
+        precargar_indice_vial()
+
+        # Y el grafo vial, si el backend de ruteo 'local' lo necesita
+        from .grafo_vial import precargar_grafo_vial
+        precargar_grafo_vial()
@@ -0,0 +1,458 @@
+"""
+Cachés para los servicios externos de mapas.
+
+Este archivo contiene una caché LRU en memoria reutilizable y las cachés
+de dos niveles (memoria + BD) de los servicios externos:
+- Geocodificación (Nominatim), tabla GeocodificacionCache
+- Nodos viales por tesela geohash (Overpass), tabla TeselaNodosCache
+- Respuestas de rutas (OSRM), tabla RutaOSRMCache
+"""
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .constants import MAPA_CONFIG
+
+# Marcador para distinguir "no está en caché" de un valor None cacheado
+AUSENTE = object()
+
+
+class CacheLRU:
+    """
+    Caché LRU en memoria, segura para hilos y con expiración opcional.
+
+    Args:
+        capacidad: Número máximo de entradas antes de desalojar la menos usada
+        ttl_segundos: Tiempo de vida por defecto de cada entrada (None = sin expiración)
+    """
+
+    def __init__(self, capacidad: int, ttl_segundos: float = None):
+        self.capacidad = capacidad
+        self.ttl_segundos = ttl_segundos
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, default=AUSENTE):
+        """Retorna el valor asociado a la clave o `default` si no existe o expiró."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return default
+            valor, expira = entrada
+            if expira is not None and expira < time.monotonic():
+                del self._datos[clave]
+                return default
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl_segundos: float = None):
+        """Guarda un valor, desalojando la entrada menos usada si se supera la capacidad."""
+        ttl = ttl_segundos if ttl_segundos is not None else self.ttl_segundos
+        expira = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        """Elimina una entrada de la caché si existe."""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        """Elimina todas las entradas."""
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class EstadisticasCache:
+    """Contadores de aciertos y fallos de una caché, seguros para hilos."""
+
+    def __init__(self, *eventos):
+        self._eventos = eventos
+        self._contadores = {evento: 0 for evento in eventos}
+        self._lock = threading.Lock()
+
+    def registrar(self, evento: str):
+        with self._lock:
+            self._contadores[evento] = self._contadores.get(evento, 0) + 1
+
+    def como_dict(self) -> dict:
+        with self._lock:
+            return dict(self._contadores)
+
+    def reiniciar(self):
+        with self._lock:
+            self._contadores = {evento: 0 for evento in self._eventos}
+
+
+class CacheDosNiveles:
+    """
+    Base de las cachés de dos niveles: LRU en memoria y tabla en la BD.
+
+    Las subclases implementan `_leer_bd(clave)` (retorna AUSENTE si no hay
+    un valor vigente) y `_escribir_bd(clave, valor, *contexto)`. La consulta
+    al servicio externo se pasa como función, síncrona en `_obtener` o
+    corrutina en `_obtener_async`; en esta última la BD se accede con
+    sync_to_async para no bloquear el event loop.
+
+    Atributos:
+        cachear_nulos: Si un resultado None también se guarda
+    """
+    cachear_nulos = False
+
+    def __init__(self, memoria: CacheLRU):
+        self.memoria = memoria
+        self.estadisticas = EstadisticasCache('aciertos_memoria', 'aciertos_bd', 'fallos')
+
+    def _ttl_memoria(self, valor):
+        """TTL en memoria de un valor (None = el de la caché LRU)."""
+        return None
+
+    def _buscar_memoria(self, clave):
+        valor = self.memoria.obtener(clave)
+        if valor is not AUSENTE:
+            self.estadisticas.registrar('aciertos_memoria')
+        return valor
+
+    def _buscar_bd(self, clave):
+        valor = self._leer_bd(clave)
+        if valor is AUSENTE:
+            self.estadisticas.registrar('fallos')
+            return AUSENTE
+        self.estadisticas.registrar('aciertos_bd')
+        self.memoria.guardar(clave, valor, ttl_segundos=self._ttl_memoria(valor))
+        return valor
+
+    def _guardar(self, clave, valor, *contexto):
+        if valor is None and not self.cachear_nulos:
+            return
+        self.memoria.guardar(clave, valor, ttl_segundos=self._ttl_memoria(valor))
+        self._escribir_bd(clave, valor, *contexto)
+
+    def _obtener(self, clave, calcular, *contexto):
+        valor = self._buscar_memoria(clave)
+        if valor is AUSENTE:
+            valor = self._buscar_bd(clave)
+        if valor is AUSENTE:
+            valor = calcular()
+            self._guardar(clave, valor, *contexto)
+        return valor
+
+    async def _obtener_async(self, clave, calcular, *contexto):
+        valor = self._buscar_memoria(clave)
+        if valor is AUSENTE:
+            valor = await sync_to_async(self._buscar_bd)(clave)
+        if valor is AUSENTE:
+            valor = await calcular()
+            await sync_to_async(self._guardar)(clave, valor, *contexto)
+        return valor
+
+
+def normalizar_direccion(direccion: str) -> str:
+    """
+    Normaliza una dirección para usarla como clave de caché.
+
+    Elimina tildes, pasa a minúsculas y colapsa espacios, de modo que
+    "  Concepción,Bío Bío " y "concepcion, bio bio" producen la misma clave.
+    """
+    texto = unicodedata.normalize('NFKD', direccion or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = texto.lower()
+    texto = re.sub(r'\s*,\s*', ', ', texto)
+    texto = re.sub(r'\s+', ' ', texto)
+    return texto.strip(' ,')[:500]
+
+
+def _como_tupla(coordenadas):
+    """Normaliza coordenadas (lista o tupla) a tupla (lat, lng), o None."""
+    if coordenadas is None:
+        return None
+    return (coordenadas[0], coordenadas[1])
+
+
+class CacheGeocodificacion(CacheDosNiveles):
+    """
+    Caché de geocodificación en dos niveles: LRU en memoria y tabla en la BD.
+
+    Los resultados negativos (dirección no encontrada) también se cachean, con
+    un TTL más corto. Los errores de red (por ejemplo GeocoderTimedOut) no se
+    cachean y se propagan al llamador.
+    """
+
+    cachear_nulos = True
+
+    def __init__(self, capacidad: int, ttl_segundos: int, ttl_negativo_segundos: int):
+        super().__init__(CacheLRU(capacidad))
+        self.ttl_segundos = ttl_segundos
+        self.ttl_negativo_segundos = ttl_negativo_segundos
+
+    def _ttl(self, coordenadas) -> int:
+        return self.ttl_segundos if coordenadas else self.ttl_negativo_segundos
+
+    _ttl_memoria = _ttl
+
+    def _leer_bd(self, clave):
+        from .models import GeocodificacionCache
+
+        try:
+            registro = GeocodificacionCache.objects.filter(direccion_normalizada=clave).first()
+        except DatabaseError:
+            return AUSENTE
+        if registro is None:
+            return AUSENTE
+
+        coordenadas = registro.coordenadas
+        if registro.fecha_consulta < timezone.now() - timedelta(seconds=self._ttl(coordenadas)):
+            return AUSENTE
+        return coordenadas
+
+    def _escribir_bd(self, clave, coordenadas, direccion):
+        from .models import GeocodificacionCache
+
+        try:
+            GeocodificacionCache.objects.update_or_create(
+                direccion_normalizada=clave,
+                defaults={
+                    'direccion_original': direccion[:500],
+                    'latitud': coordenadas[0] if coordenadas else None,
+                    'longitud': coordenadas[1] if coordenadas else None,
+                    'encontrada': coordenadas is not None,
+                }
+            )
+        except DatabaseError as e:
+            print(f"No se pudo guardar la geocodificación en caché: {e}")
+
+    def obtener(self, direccion: str, geocodificar):
+        """
+        Retorna las coordenadas de la dirección, consultando `geocodificar`
+        solo si no hay un resultado vigente en memoria ni en la BD.
+
+        Args:
+            direccion: Dirección textual a geocodificar
+            geocodificar: Función que recibe la dirección y retorna (lat, lng) o None
+
+        Returns:
+            tuple: (latitud, longitud) o None si la dirección no existe
+        """
+        return self._obtener(
+            normalizar_direccion(direccion), lambda: _como_tupla(geocodificar(direccion)), direccion
+        )
+
+    async def obtener_async(self, direccion: str, geocodificar):
+        """Igual que `obtener`, con `geocodificar` como corrutina."""
+        async def calcular():
+            return _como_tupla(await geocodificar(direccion))
+
+        return await self._obtener_async(normalizar_direccion(direccion), calcular, direccion)
+
+    def invalidar(self, direccion: str):
+        """Elimina una dirección de ambos niveles de la caché."""
+        from .models import GeocodificacionCache
+
+        clave = normalizar_direccion(direccion)
+        self.memoria.invalidar(clave)
+        try:
+            GeocodificacionCache.objects.filter(direccion_normalizada=clave).delete()
+        except DatabaseError:
+            pass
+
+
+class CacheTeselasNodos(CacheDosNiveles):
+    """
+    Caché de nodos viales por tesela geohash: LRU en memoria y tabla en la BD.
+
+    La tabla tiene un tamaño máximo; al superarlo se eliminan las teselas
+    con el acceso más antiguo.
+    """
+
+    def __init__(self, capacidad_memoria: int, capacidad_bd: int, ttl_segundos: int):
+        super().__init__(CacheLRU(capacidad_memoria, ttl_segundos=ttl_segundos))
+        self.capacidad_bd = capacidad_bd
+        self.ttl_segundos = ttl_segundos
+
+    def _leer_bd(self, geohash):
+        from .models import TeselaNodosCache
+
+        try:
+            registro = TeselaNodosCache.objects.filter(geohash=geohash).first()
+            if registro is None:
+                return AUSENTE
+            if registro.fecha_consulta < timezone.now() - timedelta(seconds=self.ttl_segundos):
+                return AUSENTE
+            # Marcar el acceso para el desalojo LRU
+            TeselaNodosCache.objects.filter(pk=registro.pk).update(ultimo_acceso=timezone.now())
+        except DatabaseError:
+            return AUSENTE
+        return registro.nodos
+
+    def _escribir_bd(self, geohash, nodos):
+        from .models import TeselaNodosCache
+
+        try:
+            TeselaNodosCache.objects.update_or_create(
+                geohash=geohash,
+                defaults={'nodos': nodos, 'fecha_consulta': timezone.now()}
+            )
+            # Desalojar las teselas menos usadas si se supera la capacidad
+            sobrantes = list(
+                TeselaNodosCache.objects.order_by('-ultimo_acceso')
+                .values_list('pk', flat=True)[self.capacidad_bd:]
+            )
+            if sobrantes:
+                TeselaNodosCache.objects.filter(pk__in=sobrantes).delete()
+        except DatabaseError as e:
+            print(f"No se pudo guardar la tesela {geohash} en caché: {e}")
+
+    def obtener(self, geohash: str, descargar):
+        """
+        Retorna los nodos de la tesela como lista de [id, lat, lon].
+
+        Args:
+            geohash: Geohash de la tesela
+            descargar: Función que recibe el geohash y retorna la lista de nodos,
+                o None si la descarga falló (en ese caso no se cachea nada)
+
+        Returns:
+            list: Nodos de la tesela, o None si no se pudieron obtener
+        """
+        return self._obtener(geohash, lambda: descargar(geohash))
+
+    async def obtener_async(self, geohash: str, descargar):
+        """Igual que `obtener`, con `descargar` como corrutina."""
+        return await self._obtener_async(geohash, lambda: descargar(geohash))
+
+
+class CacheRutasOSRM(CacheDosNiveles):
+    """
+    Caché de respuestas de OSRM: LRU en memoria y, opcionalmente, tabla en la BD.
+
+    La clave combina el perfil de ruteo con las coordenadas ajustadas a
+    calles, redondeadas a `decimales` cifras. Las rutas no encontradas y los
+    errores no se cachean.
+    """
+
+    def __init__(self, capacidad: int, ttl_segundos: int, decimales: int, persistente: bool = True):
+        super().__init__(CacheLRU(capacidad, ttl_segundos=ttl_segundos))
+        self.ttl_segundos = ttl_segundos
+        self.decimales = decimales
+        self.persistente = persistente
+
+    def coordenadas_clave(self, nodos) -> str:
+        """Retorna las coordenadas redondeadas de los nodos en formato lon,lat;lon,lat."""
+        return ';'.join(
+            f"{nodo['lon']:.{self.decimales}f},{nodo['lat']:.{self.decimales}f}" for nodo in nodos
+        )
+
+    def clave(self, nodos, perfil: str) -> str:
+        texto = f"{perfil}|{self.coordenadas_clave(nodos)}"
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _leer_bd(self, clave):
+        from .models import RutaOSRMCache
+
+        if not self.persistente:
+            return AUSENTE
+        try:
+            registro = RutaOSRMCache.objects.filter(
+                clave=clave,
+                fecha_calculo__gte=timezone.now() - timedelta(seconds=self.ttl_segundos)
+            ).first()
+        except DatabaseError:
+            return AUSENTE
+        return registro.resultado if registro else AUSENTE
+
+    def _escribir_bd(self, clave, resultado, nodos, perfil):
+        from .models import RutaOSRMCache
+
+        if not self.persistente:
+            return
+        try:
+            RutaOSRMCache.objects.update_or_create(
+                clave=clave,
+                defaults={
+                    'perfil': perfil,
+                    'coordenadas': self.coordenadas_clave(nodos),
+                    'resultado': resultado,
+                }
+            )
+        except DatabaseError as e:
+            print(f"No se pudo guardar la ruta en caché: {e}")
+
+    def obtener(self, nodos, perfil: str, calcular):
+        """
+        Retorna la ruta cacheada para los nodos o la calcula con `calcular`.
+
+        Args:
+            nodos: Nodos ya ajustados a calles, con keys 'lat' y 'lon'
+            perfil: Perfil de ruteo de OSRM
+            calcular: Función sin argumentos que consulta OSRM y retorna el
+                resultado procesado o None
+
+        Returns:
+            Dict: Resultado de la ruta, o None si no se pudo calcular
+        """
+        return self._obtener(self.clave(nodos, perfil), calcular, nodos, perfil)
+
+    async def obtener_async(self, nodos, perfil: str, calcular):
+        """Igual que `obtener`, con `calcular` como corrutina sin argumentos."""
+        return await self._obtener_async(self.clave(nodos, perfil), calcular, nodos, perfil)
+
+    def invalidar(self, nodos, perfil: str):
+        """Elimina la ruta de los nodos dados de ambos niveles de la caché."""
+        from .models import RutaOSRMCache
+
+        clave = self.clave(nodos, perfil)
+        self.memoria.invalidar(clave)
+        try:
+            RutaOSRMCache.objects.filter(clave=clave).delete()
+        except DatabaseError:
+            pass
+
+    def limpiar(self):
+        """Elimina todas las rutas cacheadas."""
+        from .models import RutaOSRMCache
+
+        self.memoria.limpiar()
+        try:
+            RutaOSRMCache.objects.all().delete()
+        except DatabaseError:
+            pass
+
+
+cache_geocodificacion = CacheGeocodificacion(
+    capacidad=MAPA_CONFIG["cache_geocodificacion_tamano"],
+    ttl_segundos=MAPA_CONFIG["ttl_geocodificacion"],
+    ttl_negativo_segundos=MAPA_CONFIG["ttl_geocodificacion_negativa"],
+)
+
+cache_teselas_nodos = CacheTeselasNodos(
+    capacidad_memoria=MAPA_CONFIG["cache_teselas_memoria"],
+    capacidad_bd=MAPA_CONFIG["cache_teselas_max"],
+    ttl_segundos=MAPA_CONFIG["ttl_teselas"],
+)
+
+cache_rutas_osrm = CacheRutasOSRM(
+    capacidad=MAPA_CONFIG["cache_rutas_memoria"],
+    ttl_segundos=MAPA_CONFIG["ttl_rutas"],
+    decimales=MAPA_CONFIG["decimales_clave_rutas"],
+    persistente=MAPA_CONFIG["cache_rutas_persistente"],
+)
+
+
+def estadisticas_geocodificacion() -> dict:
+    """Retorna los contadores de aciertos y fallos de la caché de geocodificación."""
+    return cache_geocodificacion.estadisticas.como_dict()
@@ -0,0 +1,253 @@
+"""
+Cliente HTTP compartido para los servicios externos de mapas.
+
+Todas las consultas a Overpass y OSRM pasan por una única requests.Session,
+de modo que las conexiones TCP/TLS se reutilizan (keep-alive) en lugar de
+abrirse en cada llamada. Cada servicio tiene su propio pool de conexiones
+con un límite configurable, y el cliente registra la latencia por endpoint.
+Las llamadas a los servicios conocidos pasan además por su circuit breaker
+y su política de reintentos (ver maps/resiliencia.py).
+
+La configuración se toma de MAPA_CONFIG:
+- timeout_conexion / timeout_lectura: timeouts de requests (segundos)
+- conexiones_por_host: tamaño del pool para hosts sin límite propio
+- conexiones_por_servicio: límite de conexiones por servicio de API_URLS
+- tasa_maxima_servicios: solicitudes por segundo máximas por servicio
+- muestras_latencia: mediciones recientes guardadas por endpoint
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+from geopy.adapters import RequestsAdapter
+from requests.adapters import HTTPAdapter
+
+from .constants import API_URLS, MAPA_CONFIG
+from .resiliencia import CODIGOS_TRANSITORIOS, crear_servicio
+
+
+class EstadisticasLatencia:
+    """Latencias recientes y contadores por endpoint, seguros para hilos."""
+
+    def __init__(self, muestras: int = 500):
+        self.muestras = muestras
+        self._latencias = {}
+        self._llamadas = {}
+        self._errores = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint: str, segundos: float, error: bool = False):
+        with self._lock:
+            if endpoint not in self._latencias:
+                self._latencias[endpoint] = deque(maxlen=self.muestras)
+                self._llamadas[endpoint] = 0
+                self._errores[endpoint] = 0
+            self._latencias[endpoint].append(segundos)
+            self._llamadas[endpoint] += 1
+            if error:
+                self._errores[endpoint] += 1
+
+    def como_dict(self) -> Dict[str, Dict]:
+        """
+        Retorna por endpoint las llamadas, errores y percentiles de latencia
+        (en milisegundos) de las últimas mediciones.
+        """
+        with self._lock:
+            copia = {endpoint: list(latencias) for endpoint, latencias in self._latencias.items()}
+            llamadas = dict(self._llamadas)
+            errores = dict(self._errores)
+
+        resultado = {}
+        for endpoint, latencias in copia.items():
+            p50, p95, p99 = (np.percentile(latencias, [50, 95, 99]) * 1000).tolist()
+            resultado[endpoint] = {
+                'llamadas': llamadas[endpoint],
+                'errores': errores[endpoint],
+                'promedio_ms': sum(latencias) / len(latencias) * 1000,
+                'p50_ms': p50,
+                'p95_ms': p95,
+                'p99_ms': p99,
+                'max_ms': max(latencias) * 1000,
+            }
+        return resultado
+
+    def reiniciar(self):
+        with self._lock:
+            self._latencias.clear()
+            self._llamadas.clear()
+            self._errores.clear()
+
+
+class LimitadorTasa:
+    """
+    Limita un servicio a `por_segundo` solicitudes por segundo, seguro para hilos.
+
+    `reservar` asigna el siguiente turno libre y retorna cuántos segundos
+    hay que esperar hasta él, de modo que el mismo limitador sirve para
+    llamadas síncronas (time.sleep) y asíncronas (asyncio.sleep).
+    """
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo
+        self._siguiente = 0.0
+        self._lock = threading.Lock()
+
+    def reservar(self) -> float:
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + self.intervalo
+            return turno - ahora
+
+
+def _prefijo_host(url: str) -> str:
+    """Retorna 'esquema://host/' de una URL, usado para montar adaptadores por host."""
+    partes = urlsplit(url)
+    return f"{partes.scheme}://{partes.netloc}/"
+
+
+class ClienteServiciosMapa:
+    """
+    Sesión HTTP compartida con pools de conexiones por host y medición de latencia.
+
+    Args:
+        conexiones_por_host: Conexiones máximas por host para hosts sin límite propio
+        conexiones_por_servicio: {servicio de API_URLS: conexiones máximas}; estos
+            pools bloquean al llenarse en vez de abrir conexiones extra
+        timeout_conexion: Segundos para establecer la conexión
+        timeout_lectura: Segundos de espera entre bytes de la respuesta
+        muestras_latencia: Mediciones recientes guardadas por endpoint
+        servicios: Endpoints cuyas llamadas pasan por un ServicioResiliente
+        tasa_maxima: {endpoint: solicitudes por segundo máximas}
+    """
+
+    def __init__(self, conexiones_por_host: int = 10, conexiones_por_servicio: Dict[str, int] = None,
+                 timeout_conexion: float = 5, timeout_lectura: float = 30, muestras_latencia: int = 500,
+                 servicios=(), tasa_maxima: Dict[str, float] = None):
+        self.timeout = (timeout_conexion, timeout_lectura)
+        self.latencias = EstadisticasLatencia(muestras_latencia)
+        self.servicios = {nombre: crear_servicio(nombre) for nombre in servicios}
+        self.limitadores = {
+            endpoint: LimitadorTasa(por_segundo) for endpoint, por_segundo in (tasa_maxima or {}).items()
+        }
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=10, pool_maxsize=conexiones_por_host)
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+
+        for servicio, conexiones in (conexiones_por_servicio or {}).items():
+            if servicio in API_URLS:
+                self.session.mount(
+                    _prefijo_host(API_URLS[servicio]),
+                    HTTPAdapter(pool_connections=1, pool_maxsize=conexiones, pool_block=True),
+                )
+
+    @contextmanager
+    def medir(self, endpoint: str):
+        """Registra la duración de un bloque como una llamada a `endpoint`."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.latencias.registrar(endpoint, time.perf_counter() - inicio, error=True)
+            raise
+        self.latencias.registrar(endpoint, time.perf_counter() - inicio)
+
+    def esperar_turno(self, endpoint: str):
+        """Bloquea hasta que el límite de tasa del endpoint permita otra solicitud."""
+        limitador = self.limitadores.get(endpoint)
+        if limitador is not None:
+            espera = limitador.reservar()
+            if espera > 0:
+                time.sleep(espera)
+
+    def circuito_abierto(self, endpoint: str) -> bool:
+        """Indica si el circuito del servicio está abierto (las llamadas fallarían de inmediato)."""
+        servicio = self.servicios.get(endpoint)
+        return servicio is not None and servicio.abierto
+
+    def ejecutar(self, endpoint: str, funcion):
+        """
+        Ejecuta `funcion(segundos_restantes)` con la política de resiliencia
+        del servicio y registra su latencia. Para clientes que no usan la
+        sesión compartida (por ejemplo geopy).
+        """
+        def medida(restante):
+            self.esperar_turno(endpoint)
+            with self.medir(endpoint):
+                return funcion(restante)
+
+        servicio = self.servicios.get(endpoint)
+        if servicio is None:
+            return medida(self.timeout[1])
+        return servicio.ejecutar(medida)
+
+    def solicitar(self, metodo: str, endpoint: str, url: str, **kwargs) -> requests.Response:
+        """
+        Realiza una solicitud HTTP por la sesión compartida.
+
+        Si el endpoint tiene un ServicioResiliente, la solicitud se reintenta
+        ante errores transitorios y falla de inmediato con CircuitoAbierto
+        mientras el circuito esté abierto.
+
+        Args:
+            metodo: Método HTTP ('GET', 'POST', ...)
+            endpoint: Nombre con el que se registra la latencia (por ejemplo 'overpass')
+            url: URL completa
+            **kwargs: Argumentos de requests; `timeout` usa los de MAPA_CONFIG si no se indica
+
+        Returns:
+            requests.Response: Respuesta sin validar el código de estado (salvo
+            los códigos transitorios, que se lanzan como requests.HTTPError)
+        """
+        servicio = self.servicios.get(endpoint)
+        if servicio is None:
+            return self._solicitar_una_vez(metodo, endpoint, url, kwargs, self.timeout[1])
+        return servicio.ejecutar(lambda restante: self._solicitar_una_vez(metodo, endpoint, url, kwargs, restante))
+
+    def _solicitar_una_vez(self, metodo: str, endpoint: str, url: str, kwargs: Dict, restante: float):
+        kwargs = dict(kwargs)
+        kwargs.setdefault('timeout', (min(self.timeout[0], restante), min(self.timeout[1], restante)))
+        self.esperar_turno(endpoint)
+        inicio = time.perf_counter()
+        try:
+            response = self.session.request(metodo, url, **kwargs)
+        except requests.RequestException:
+            self.latencias.registrar(endpoint, time.perf_counter() - inicio, error=True)
+            raise
+        self.latencias.registrar(endpoint, time.perf_counter() - inicio, error=response.status_code >= 400)
+        if response.status_code in CODIGOS_TRANSITORIOS:
+            raise requests.HTTPError(f"{response.status_code} de {endpoint}", response=response)
+        return response
+
+    def get(self, endpoint: str, url: str, **kwargs) -> requests.Response:
+        return self.solicitar('GET', endpoint, url, **kwargs)
+
+    def post(self, endpoint: str, url: str, **kwargs) -> requests.Response:
+        return self.solicitar('POST', endpoint, url, **kwargs)
+
+    def fabrica_adaptador_geopy(self, conexiones: int):
+        """
+        Retorna un adapter_factory para geocodificadores de geopy que mantiene
+        conexiones persistentes con un pool acotado.
+        """
+        return partial(RequestsAdapter, pool_maxsize=conexiones, pool_block=True)
+
+
+cliente_mapas = ClienteServiciosMapa(
+    conexiones_por_host=MAPA_CONFIG["conexiones_por_host"],
+    conexiones_por_servicio=MAPA_CONFIG["conexiones_por_servicio"],
+    timeout_conexion=MAPA_CONFIG["timeout_conexion"],
+    timeout_lectura=MAPA_CONFIG["timeout_lectura"],
+    muestras_latencia=MAPA_CONFIG["muestras_latencia"],
+    servicios=('nominatim', 'overpass', 'osrm_route'),
+    tasa_maxima=MAPA_CONFIG["tasa_maxima_servicios"],
+)
@@ -0,0 +1,149 @@
+"""
+Cliente HTTP asíncrono (httpx) para los servicios externos de mapas.
+
+Lo usan las vistas async (ver maps/utilities_async.py) para que varias
+consultas a Nominatim, Overpass y OSRM estén en curso a la vez sin ocupar un
+hilo cada una. Comparte con el cliente síncrono (maps/clientes.py) los
+timeouts, las estadísticas de latencia y los circuit breakers, de modo que
+un servicio caído se detecta igual sin importar qué vista lo consulte, y
+los límites de tasa se cumplen sumando ambos clientes.
+
+Un httpx.AsyncClient queda ligado al event loop en que se creó, por lo que
+se mantiene un cliente (con sus conexiones persistentes) por event loop y se
+cierra cuando ese loop termina. Bajo WSGI cada solicitud a una vista async
+corre en un loop propio, así que su cliente vive lo que dura la solicitud.
+El límite de conexiones por servicio se aplica con un semáforo.
+"""
+
+import asyncio
+import contextlib
+import time
+import weakref
+from typing import Dict
+
+import httpx
+
+from .clientes import ClienteServiciosMapa, cliente_mapas
+from .constants import MAPA_CONFIG
+from .resiliencia import CODIGOS_TRANSITORIOS
+
+
+class ClienteAsyncServiciosMapa:
+    """
+    Versión asíncrona de ClienteServiciosMapa.
+
+    Args:
+        cliente: Cliente síncrono cuyos timeouts, latencias y servicios se comparten
+        conexiones_por_host: Conexiones máximas por host
+        conexiones_por_servicio: {endpoint: solicitudes simultáneas máximas}
+    """
+
+    def __init__(self, cliente: ClienteServiciosMapa, conexiones_por_host: int = 10,
+                 conexiones_por_servicio: Dict[str, int] = None):
+        self.cliente = cliente
+        self.conexiones_por_host = conexiones_por_host
+        self.conexiones_por_servicio = dict(conexiones_por_servicio or {})
+        self._por_loop = weakref.WeakKeyDictionary()
+
+    async def _estado_loop(self):
+        """Retorna (httpx.AsyncClient, semáforos por endpoint, guardián) del event loop actual."""
+        loop = asyncio.get_running_loop()
+        estado = self._por_loop.get(loop)
+        if estado is None:
+            timeout_conexion, timeout_lectura = self.cliente.timeout
+            cliente_http = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout_lectura, connect=timeout_conexion),
+                limits=httpx.Limits(max_connections=None,
+                                    max_keepalive_connections=self.conexiones_por_host),
+                headers={'User-Agent': 'maps'},
+            )
+            semaforos = {
+                endpoint: asyncio.Semaphore(conexiones)
+                for endpoint, conexiones in self.conexiones_por_servicio.items()
+            }
+            guardian = self._cerrar_al_terminar(loop, cliente_http)
+            await guardian.__anext__()
+            estado = (cliente_http, semaforos, guardian)
+            self._por_loop[loop] = estado
+        return estado
+
+    async def _cerrar_al_terminar(self, loop, cliente_http: httpx.AsyncClient):
+        """
+        Generador asíncrono que libera el cliente del loop al ser finalizado.
+
+        El event loop finaliza sus generadores asíncronos pendientes antes de
+        cerrarse (asyncio.run y async_to_sync llaman a shutdown_asyncgens), de
+        modo que el cliente se cierra junto con el loop al que pertenece.
+        """
+        try:
+            yield
+        finally:
+            self._por_loop.pop(loop, None)
+            await cliente_http.aclose()
+
+    async def solicitar(self, metodo: str, endpoint: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Realiza una solicitud HTTP con la política de resiliencia del endpoint.
+
+        Args:
+            metodo: Método HTTP ('GET', 'POST', ...)
+            endpoint: Nombre con el que se registra la latencia (por ejemplo 'overpass')
+            url: URL completa
+            **kwargs: Argumentos de httpx; `timeout` usa los de MAPA_CONFIG si no se indica
+
+        Returns:
+            httpx.Response: Respuesta sin validar el código de estado (salvo
+            los códigos transitorios, que se lanzan como httpx.HTTPStatusError)
+        """
+        servicio = self.cliente.servicios.get(endpoint)
+        if servicio is None:
+            return await self._solicitar_una_vez(metodo, endpoint, url, kwargs, self.cliente.timeout[1])
+        return await servicio.ejecutar_async(
+            lambda restante: self._solicitar_una_vez(metodo, endpoint, url, kwargs, restante)
+        )
+
+    async def _solicitar_una_vez(self, metodo: str, endpoint: str, url: str, kwargs: Dict, restante: float):
+        cliente_http, semaforos, _ = await self._estado_loop()
+        kwargs = dict(kwargs)
+        timeout_conexion, timeout_lectura = self.cliente.timeout
+        kwargs.setdefault('timeout', httpx.Timeout(min(timeout_lectura, restante),
+                                                   connect=min(timeout_conexion, restante)))
+
+        async with semaforos.get(endpoint) or contextlib.nullcontext():
+            limitador = self.cliente.limitadores.get(endpoint)
+            if limitador is not None:
+                espera = limitador.reservar()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+            inicio = time.perf_counter()
+            try:
+                response = await cliente_http.request(metodo, url, **kwargs)
+            except (httpx.HTTPError, asyncio.CancelledError):
+                self.cliente.latencias.registrar(endpoint, time.perf_counter() - inicio, error=True)
+                raise
+            self.cliente.latencias.registrar(endpoint, time.perf_counter() - inicio,
+                                             error=response.status_code >= 400)
+
+        if response.status_code in CODIGOS_TRANSITORIOS:
+            raise httpx.HTTPStatusError(f"{response.status_code} de {endpoint}",
+                                        request=response.request, response=response)
+        return response
+
+    async def get(self, endpoint: str, url: str, **kwargs) -> httpx.Response:
+        return await self.solicitar('GET', endpoint, url, **kwargs)
+
+    async def post(self, endpoint: str, url: str, **kwargs) -> httpx.Response:
+        return await self.solicitar('POST', endpoint, url, **kwargs)
+
+    async def cerrar(self):
+        """Cierra las conexiones del cliente del event loop actual."""
+        estado = self._por_loop.get(asyncio.get_running_loop())
+        if estado is not None:
+            await estado[2].aclose()
+
+
+cliente_mapas_async = ClienteAsyncServiciosMapa(
+    cliente_mapas,
+    conexiones_por_host=MAPA_CONFIG["conexiones_por_host"],
+    conexiones_por_servicio=MAPA_CONFIG["conexiones_por_servicio"],
+)
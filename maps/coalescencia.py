@@ -0,0 +1,113 @@
+"""
+Coalescencia de llamadas idénticas concurrentes (single-flight).
+
+Si varias solicitudes piden al mismo tiempo la misma geocodificación o la
+misma ruta (por ejemplo, varios despachadores abren el mapa del mismo
+paquete), solo la primera ejecuta la consulta; las demás esperan a que
+termine y reciben el mismo resultado, o la misma excepción.
+
+La coalescencia es por proceso: las llamadas síncronas se agrupan entre
+hilos y las asíncronas entre corrutinas del mismo event loop.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Awaitable, Callable, Dict, Hashable
+
+from .cache import EstadisticasCache
+
+
+class _LlamadaEnCurso:
+    """Resultado compartido de una llamada síncrona en curso."""
+
+    def __init__(self):
+        self.terminada = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class Coalescedor:
+    """
+    Agrupa llamadas concurrentes con la misma clave en una única ejecución.
+
+    Estadísticas (`estadisticas.como_dict()`):
+        llamadas: Llamadas recibidas
+        ejecutadas: Llamadas que ejecutaron la función
+        coalescidas: Llamadas que esperaron el resultado de otra
+
+    Args:
+        nombre: Nombre del coalescedor (para las métricas)
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.estadisticas = EstadisticasCache('llamadas', 'ejecutadas', 'coalescidas')
+        self._en_curso: Dict[Hashable, _LlamadaEnCurso] = {}
+        self._lock = threading.Lock()
+        self._en_curso_async = weakref.WeakKeyDictionary()
+
+    def ejecutar(self, clave: Hashable, funcion: Callable, *args, **kwargs):
+        """
+        Ejecuta `funcion(*args, **kwargs)`, salvo que ya haya una llamada en
+        curso con la misma clave, en cuyo caso espera y retorna su resultado.
+        """
+        with self._lock:
+            self.estadisticas.registrar('llamadas')
+            llamada = self._en_curso.get(clave)
+            propia = llamada is None
+            if propia:
+                llamada = self._en_curso[clave] = _LlamadaEnCurso()
+
+        if not propia:
+            self.estadisticas.registrar('coalescidas')
+            llamada.terminada.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        self.estadisticas.registrar('ejecutadas')
+        try:
+            llamada.resultado = funcion(*args, **kwargs)
+            return llamada.resultado
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            llamada.terminada.set()
+
+    async def ejecutar_async(self, clave: Hashable, corrutina: Callable[..., Awaitable], *args, **kwargs):
+        """Igual que `ejecutar`, con `corrutina(*args, **kwargs)` en el event loop actual."""
+        en_curso = self._en_curso_async.setdefault(asyncio.get_running_loop(), {})
+        self.estadisticas.registrar('llamadas')
+
+        tarea = en_curso.get(clave)
+        if tarea is not None:
+            self.estadisticas.registrar('coalescidas')
+            # shield: si este llamador se cancela, la llamada compartida sigue
+            return await asyncio.shield(tarea)
+
+        self.estadisticas.registrar('ejecutadas')
+        tarea = en_curso[clave] = asyncio.ensure_future(corrutina(*args, **kwargs))
+        tarea.add_done_callback(lambda _: en_curso.pop(clave, None))
+        return await asyncio.shield(tarea)
+
+    def como_dict(self) -> Dict:
+        datos = self.estadisticas.como_dict()
+        datos['en_curso'] = len(self._en_curso) + sum(len(tareas) for tareas in self._en_curso_async.values())
+        return datos
+
+
+coalescedor_geocodificacion = Coalescedor('geocodificacion')
+coalescedor_rutas = Coalescedor('rutas')
+coalescedor_calles = Coalescedor('calles')
+
+
+def estadisticas_coalescencia() -> Dict[str, Dict]:
+    """Retorna las métricas de coalescencia por coalescedor."""
+    return {
+        coalescedor.nombre: coalescedor.como_dict()
+        for coalescedor in (coalescedor_geocodificacion, coalescedor_rutas, coalescedor_calles)
+    }
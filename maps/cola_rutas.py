@@ -0,0 +1,262 @@
+"""
+Cola de cálculo de rutas respaldada por la base de datos.
+
+Las vistas y serializers encolan el paquete con `encolar_calculo_ruta` y
+responden de inmediato; el comando `manage.py procesar_rutas` toma los
+trabajos y calcula las rutas en segundo plano.
+
+- Deduplicación: hay un único TrabajoRuta por paquete. Encolar un paquete
+  que ya tiene un trabajo lo reactiva en lugar de crear otro.
+- Prioridad: los paquetes con conductor asignado se procesan antes, y las
+  rutas pedidas para visualizarlas antes que todas.
+- Reintentos: los fallos se reintentan con espera exponencial hasta
+  MAPA_CONFIG["intentos_trabajo_ruta"] intentos.
+- Varios workers pueden correr a la vez: cada trabajo se reserva con un
+  UPDATE condicional y la reserva vence si el worker muere.
+"""
+
+from datetime import timedelta
+from typing import Optional
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .constants import MAPA_CONFIG
+from .models import EstadoTrabajoRuta, TrabajoRuta
+
+# Prioridades de la cola (mayor se procesa antes)
+PRIORIDAD_NORMAL = 0
+PRIORIDAD_CON_CONDUCTOR = 10
+PRIORIDAD_VISUALIZACION = 20
+
+# Estado de la ruta de un paquete informado por la API
+RUTA_CALCULADA = 'calculada'
+RUTA_PENDIENTE = 'pendiente'
+RUTA_FALLIDA = 'fallida'
+RUTA_SIN_CALCULAR = 'sin_calcular'
+
+
+def prioridad_paquete(paquete) -> int:
+    """Prioridad por defecto de un paquete: mayor si ya tiene conductor asignado."""
+    return PRIORIDAD_CON_CONDUCTOR if paquete.conductor_id else PRIORIDAD_NORMAL
+
+
+def encolar_calculo_ruta(paquete, prioridad: int = None) -> None:
+    """
+    Encola el cálculo de la ruta de un paquete.
+
+    Si el paquete ya tiene un trabajo, se reactiva con la nueva prioridad y
+    sus intentos reiniciados. Si un worker lo está procesando, se incrementa
+    su versión para que se vuelva a calcular al terminar.
+
+    Args:
+        paquete: Instancia de Paquete ya guardada
+        prioridad: Prioridad del trabajo (por defecto según prioridad_paquete)
+    """
+    if prioridad is None:
+        prioridad = prioridad_paquete(paquete)
+
+    trabajos = TrabajoRuta.objects.filter(paquete_id=paquete.pk)
+
+    if trabajos.exclude(estado=EstadoTrabajoRuta.PROCESANDO).update(
+        estado=EstadoTrabajoRuta.PENDIENTE,
+        prioridad=prioridad,
+        intentos=0,
+        version=F('version') + 1,
+        disponible_desde=timezone.now(),
+        bloqueado_hasta=None,
+        ultimo_error='',
+    ):
+        return
+
+    if trabajos.filter(estado=EstadoTrabajoRuta.PROCESANDO).update(
+        prioridad=prioridad,
+        version=F('version') + 1,
+    ):
+        return
+
+    try:
+        TrabajoRuta.objects.create(paquete_id=paquete.pk, prioridad=prioridad)
+    except IntegrityError:
+        # Otro proceso creó el trabajo al mismo tiempo; basta con reactivarlo
+        encolar_calculo_ruta(paquete, prioridad)
+
+
+def actualizar_prioridad(paquete) -> None:
+    """Ajusta la prioridad de un trabajo aún no terminado (por ejemplo, al asignar conductor)."""
+    TrabajoRuta.objects.filter(
+        paquete_id=paquete.pk,
+        estado__in=(EstadoTrabajoRuta.PENDIENTE, EstadoTrabajoRuta.PROCESANDO),
+        prioridad__lt=prioridad_paquete(paquete),
+    ).update(prioridad=prioridad_paquete(paquete))
+
+
+def estado_ruta_paquete(paquete) -> str:
+    """
+    Retorna el estado de la ruta de un paquete para la API: 'calculada',
+    'pendiente' (en cola o en proceso), 'fallida' o 'sin_calcular'.
+    """
+    trabajo = _relacionado(paquete, 'trabajo_ruta')
+    if trabajo is not None and trabajo.estado in (EstadoTrabajoRuta.PENDIENTE, EstadoTrabajoRuta.PROCESANDO):
+        return RUTA_PENDIENTE
+    if _relacionado(paquete, 'ruta') is not None:
+        return RUTA_CALCULADA
+    if trabajo is not None and trabajo.estado == EstadoTrabajoRuta.FALLIDO:
+        return RUTA_FALLIDA
+    return RUTA_SIN_CALCULAR
+
+
+def _relacionado(instancia, nombre: str):
+    """Retorna el objeto de la relación uno a uno inversa `nombre`, o None si no existe."""
+    try:
+        return getattr(instancia, nombre)
+    except ObjectDoesNotExist:
+        return None
+
+
+def tomar_siguiente_trabajo() -> Optional[TrabajoRuta]:
+    """
+    Reserva el trabajo disponible de mayor prioridad.
+
+    También retoma trabajos en proceso cuya reserva venció (worker caído).
+    Un trabajo que ya agotó MAPA_CONFIG["intentos_trabajo_ruta"] intentos
+    (por ejemplo, porque hace caer al worker cada vez) se marca como
+    fallido en lugar de reservarse otra vez.
+
+    Returns:
+        TrabajoRuta reservado (con su paquete cargado) o None si la cola está vacía
+    """
+    ahora = timezone.now()
+    disponibles = (
+        Q(estado=EstadoTrabajoRuta.PENDIENTE, disponible_desde__lte=ahora) |
+        Q(estado=EstadoTrabajoRuta.PROCESANDO, bloqueado_hasta__lt=ahora)
+    )
+    candidatos = (
+        TrabajoRuta.objects.filter(disponibles)
+        .order_by('-prioridad', 'disponible_desde', 'id')
+        .values_list('id', 'version', 'intentos')[:10]
+    )
+
+    for id_trabajo, version, intentos in candidatos:
+        if intentos >= MAPA_CONFIG["intentos_trabajo_ruta"]:
+            TrabajoRuta.objects.filter(disponibles, id=id_trabajo, version=version).update(
+                estado=EstadoTrabajoRuta.FALLIDO,
+                bloqueado_hasta=None,
+                ultimo_error=f'Se agotaron los {intentos} intentos sin terminar el procesamiento',
+            )
+            continue
+        if _reservar(TrabajoRuta.objects.filter(disponibles, id=id_trabajo, version=version), ahora):
+            return TrabajoRuta.objects.select_related('paquete').get(id=id_trabajo)
+
+    return None
+
+
+def reservar_trabajo_paquete(paquete) -> Optional[TrabajoRuta]:
+    """
+    Encola el cálculo de la ruta de un paquete y reserva su trabajo de
+    inmediato, para procesarlo fuera de `procesar_rutas` (por ejemplo, al
+    precalentar rutas) con las mismas garantías de versión que un worker.
+
+    Returns:
+        TrabajoRuta reservado (con su paquete recién leído), o None si otro
+        worker lo está procesando
+    """
+    ahora = timezone.now()
+    trabajos = TrabajoRuta.objects.filter(paquete_id=paquete.pk)
+    if trabajos.filter(estado=EstadoTrabajoRuta.PROCESANDO, bloqueado_hasta__gte=ahora).exists():
+        return None
+
+    encolar_calculo_ruta(paquete)
+    version = trabajos.values_list('version', flat=True).first()
+    if version is None or not _reservar(trabajos.filter(estado=EstadoTrabajoRuta.PENDIENTE, version=version), ahora):
+        return None
+    return trabajos.select_related('paquete').get()
+
+
+def _reservar(trabajos, ahora) -> int:
+    """Marca como en proceso los trabajos del queryset y cuenta un intento; retorna cuántos reservó."""
+    return trabajos.update(
+        estado=EstadoTrabajoRuta.PROCESANDO,
+        bloqueado_hasta=ahora + timedelta(seconds=MAPA_CONFIG["bloqueo_trabajo_ruta"]),
+        intentos=F('intentos') + 1,
+    )
+
+
+def _terminar(trabajo: TrabajoRuta, coordenadas=None, **campos) -> None:
+    """
+    Guarda el resultado de un trabajo si nadie lo volvió a encolar mientras
+    se procesaba; en ese caso lo deja pendiente para calcular la nueva versión.
+
+    Las coordenadas de envío del paquete se actualizan en la misma
+    transacción y solo si la versión no cambió: si la dirección se modificó
+    durante el cálculo, no reciben las coordenadas de la dirección anterior.
+
+    Args:
+        trabajo: Trabajo reservado por tomar_siguiente_trabajo
+        coordenadas: (lat, lng) de destino del paquete, o None para no cambiarlas
+        **campos: Campos del TrabajoRuta a guardar
+    """
+    from api.models import Paquete
+
+    with transaction.atomic():
+        if TrabajoRuta.objects.filter(id=trabajo.id, version=trabajo.version).update(bloqueado_hasta=None, **campos):
+            if coordenadas:
+                Paquete.objects.filter(pk=trabajo.paquete_id).update(
+                    direccion_envio_lat=coordenadas[0],
+                    direccion_envio_lng=coordenadas[1],
+                )
+            return
+    TrabajoRuta.objects.filter(id=trabajo.id).update(
+        estado=EstadoTrabajoRuta.PENDIENTE,
+        intentos=0,
+        disponible_desde=timezone.now(),
+        bloqueado_hasta=None,
+    )
+
+
+def procesar_trabajo(trabajo: TrabajoRuta) -> bool:
+    """
+    Calcula y guarda la ruta del paquete de un trabajo reservado.
+
+    Si la ruta se calcula, las coordenadas de envío del paquete se
+    actualizan con el destino de la ruta; si falla, con la geocodificación
+    de la dirección (cuando existe), y el trabajo se reprograma o se marca
+    como fallido.
+
+    Returns:
+        bool: True si la ruta se calculó
+    """
+    from .utilities import calcular_y_guardar_ruta_paquete, obtener_coordenadas
+
+    paquete = trabajo.paquete
+    ruta, error = calcular_y_guardar_ruta_paquete(paquete)
+
+    if ruta and not error:
+        _terminar(
+            trabajo,
+            coordenadas=(ruta.destino_lat, ruta.destino_lng),
+            estado=EstadoTrabajoRuta.COMPLETADO,
+            ultimo_error='',
+        )
+        return True
+
+    try:
+        coordenadas = obtener_coordenadas(paquete.direccion_envio_texto)
+    except Exception:
+        # Se mantienen las coordenadas actuales
+        coordenadas = None
+
+    if trabajo.intentos >= MAPA_CONFIG["intentos_trabajo_ruta"]:
+        _terminar(trabajo, coordenadas=coordenadas, estado=EstadoTrabajoRuta.FALLIDO, ultimo_error=error or '')
+    else:
+        espera = MAPA_CONFIG["espera_reintento_trabajo_ruta"] * 2 ** (trabajo.intentos - 1)
+        _terminar(
+            trabajo,
+            coordenadas=coordenadas,
+            estado=EstadoTrabajoRuta.PENDIENTE,
+            disponible_desde=timezone.now() + timedelta(seconds=espera),
+            ultimo_error=error or '',
+        )
+    return False
@@ -5,6 +5,8 @@ Este archivo contiene las constantes utilizadas en todo el sistema para la gesti
 especialmente la información de la Universidad de Concepción como punto de origen fijo.
 """
 
+import os
+
 # Información de la Universidad de Concepción
 UNIVERSIDAD_CONCEPCION = {
     "direccion": "Universidad de Concepcion, Concepcion, Bio Bio, Chile",
@@ -24,13 +26,101 @@ UNIVERSIDAD_CONCEPCION_COORDS_TUPLE = (
 # Configuración para APIs de mapas
 MAPA_CONFIG = {
     "radio_busqueda_nodos": 50,  # metros
-    "timeout_requests": 30,      # segundos
+    "timeout_conexion": 5,       # segundos para establecer la conexión
+    "timeout_lectura": 30,       # segundos de espera de la respuesta
     "precision_distancia": 2,    # decimales para distancias en km
-    "precision_duracion": 1      # decimales para duración en minutos
+    "precision_duracion": 1,     # decimales para duración en minutos
+    "hilos_rutas": 8,            # tramos de ruta calculados en paralelo
+    "hilos_ajuste_nodos": 16,    # puntos ajustados a calles en paralelo
+
+    # Cliente HTTP compartido (conexiones persistentes)
+    "conexiones_por_host": 10,                  # pool por host sin límite propio
+    "conexiones_por_servicio": {                # pool por servicio de API_URLS / geopy
+        "overpass": 4,                          # Overpass limita las consultas simultáneas por IP
+        "osrm_route": 16,
+        "nominatim": 1,                         # política de uso: 1 consulta por segundo
+    },
+    "tasa_maxima_servicios": {                  # solicitudes por segundo por servicio (ambos clientes)
+        "nominatim": 1,                         # política de uso de Nominatim
+    },
+    "muestras_latencia": 500,                   # mediciones recientes por endpoint
+
+    # Resiliencia de los servicios externos (maps/resiliencia.py)
+    "umbral_fallos_circuito": 5,                # fallos consecutivos que abren el circuito
+    "segundos_circuito_abierto": 30,            # espera antes de la llamada de prueba
+    "intentos_servicios": 3,                    # intentos por llamada (incluido el primero)
+    "espera_base_reintento": 0.2,               # segundos, se duplica en cada reintento (con jitter)
+    "espera_maxima_reintento": 2,               # segundos
+    "plazo_total_servicios": {                  # segundos máximos por llamada, reintentos incluidos
+        "nominatim": 10,
+        "overpass": 20,
+        "osrm_route": 10,
+    },
+    "cobertura_servicios": {                    # segundos antes de lanzar una llamada de cobertura
+        "osrm_route": 1.5,                      # solo servicios idempotentes y sin límite estricto de uso
+    },
+    "hilos_cobertura": 8,
+
+    # Cola de cálculo de rutas (worker: manage.py procesar_rutas)
+    "intentos_trabajo_ruta": 5,                 # intentos antes de marcar el trabajo como fallido
+    "espera_reintento_trabajo_ruta": 30,        # segundos, se duplica en cada intento
+    "bloqueo_trabajo_ruta": 300,                # segundos que un worker reserva un trabajo
+    "intervalo_cola_rutas": 2,                  # segundos entre consultas con la cola vacía
+    "antiguedad_maxima_rutas": 7 * 24 * 3600,   # segundos tras los que precalentar_rutas recalcula una ruta
+    "hilos_precalentamiento": 8,                # paquetes procesados en paralelo por precalentar_rutas
+
+    # Caché de geocodificación
+    "cache_geocodificacion_tamano": 1024,       # entradas en memoria
+    "ttl_geocodificacion": 30 * 24 * 3600,      # segundos (30 días)
+    "ttl_geocodificacion_negativa": 24 * 3600,  # segundos (1 día) para direcciones no encontradas
+
+    # Índice vial local (extracto OSM de la región del Bío Bío, .osm o .pbf)
+    "archivo_osm": os.environ.get("MAPA_ARCHIVO_OSM", ""),
+    "tamano_celda_indice": 0.0005,              # grados (~55 m) por celda de la grilla
+    # Jerarquía de contracción del grafo vial (generada con preprocesar_jerarquia)
+    "archivo_jerarquia": os.environ.get("MAPA_ARCHIVO_JERARQUIA", ""),
+    "cache_filas_jerarquia": 20000,             # filas de aristas decodificadas en memoria (0 = sin caché)
+
+    # Caché de nodos viales por tesela geohash (Overpass)
+    "precision_geohash_teselas": 6,             # ~1,2 km x 0,6 km por tesela
+    "cache_teselas_memoria": 256,               # teselas en memoria
+    "cache_teselas_max": 5000,                  # teselas persistidas en la BD
+    "ttl_teselas": 30 * 24 * 3600,              # segundos (30 días)
+
+    # Caché de calles cercanas (vías con geometría de Overpass, para el mapa)
+    "cache_calles_memoria": 256,                # consultas en memoria
+    "decimales_clave_calles": 4,                # redondeo del punto consultado (~10 m)
+
+    # Caché de respuestas de OSRM
+    "cache_rutas_memoria": 512,                 # rutas en memoria
+    "cache_rutas_persistente": True,            # guardar también en la BD
+    "ttl_rutas": 7 * 24 * 3600,                 # segundos (7 días)
+    "decimales_clave_rutas": 5,                 # redondeo de coordenadas (~1 m)
+
+    # Coordenadas de Ruta decodificadas desde sus polylines, compartidas entre
+    # solicitudes (0 = solo se memorizan por instancia)
+    "cache_coordenadas_rutas": 256,             # polylines decodificados en memoria
+    # Polylines simplificados (Douglas-Peucker) que se precalculan al guardar una
+    # Ruta: {zoom máximo de Leaflet: tolerancia en metros}. La tolerancia es
+    # ~1 píxel en la latitud de Concepción; sobre el mayor zoom se usa la
+    # geometría completa.
+    "niveles_simplificacion_rutas": {11: 60, 13: 15, 15: 4},
+    # Formato de las geometrías de la vista map: "polyline" (las decodifica el
+    # navegador) o "coordenadas" (listas [lat, lng]); se cambia con ?formato=
+    "formato_rutas_mapa": "polyline",
+    "max_age_api_rutas": 60,                    # segundos que el navegador reutiliza la geometría sin revalidar
+
+    # Backend de ruteo: "osrm", "local" (grafo del extracto OSM), "ch" (jerarquía
+    # de contracción) o "linea_recta"
+    "backend_ruteo": os.environ.get("MAPA_BACKEND_RUTEO", "osrm"),
+    "radio_ajuste_grafo": 200,                  # metros máximos entre un punto y el grafo local
+    "factor_desvio_linea_recta": 1.3,           # distancia por calles / distancia en línea recta
+    "velocidad_linea_recta_kmh": 30,            # velocidad promedio para la estimación en línea recta
 }
 
 # URLs de servicios externos
 API_URLS = {
     "overpass": "https://overpass-api.de/api/interpreter",
-    "osrm_route": "https://router.project-osrm.org/route/v1/driving"
+    "osrm_route": "https://router.project-osrm.org/route/v1/driving",
+    "nominatim": "https://nominatim.openstreetmap.org/search",
 }
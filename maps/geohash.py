@@ -0,0 +1,85 @@
+"""
+Codificación geohash para dividir el mapa en teselas fijas.
+
+Un geohash de precisión 6 corresponde a una celda de aproximadamente
+1,2 km x 0,6 km, tamaño adecuado para cachear los nodos viales de un barrio.
+"""
+
+from typing import List, Tuple
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_INDICE_BASE32 = {caracter: i for i, caracter in enumerate(_BASE32)}
+
+
+def codificar(lat: float, lon: float, precision: int = 6) -> str:
+    """Retorna el geohash de la celda que contiene el punto (lat, lon)."""
+    rango_lat = [-90.0, 90.0]
+    rango_lon = [-180.0, 180.0]
+    resultado = []
+    bits = 0
+    valor = 0
+    es_lon = True
+
+    while len(resultado) < precision:
+        rango = rango_lon if es_lon else rango_lat
+        coordenada = lon if es_lon else lat
+        medio = (rango[0] + rango[1]) / 2
+        if coordenada >= medio:
+            valor = (valor << 1) | 1
+            rango[0] = medio
+        else:
+            valor = valor << 1
+            rango[1] = medio
+        es_lon = not es_lon
+        bits += 1
+        if bits == 5:
+            resultado.append(_BASE32[valor])
+            bits = 0
+            valor = 0
+
+    return ''.join(resultado)
+
+
+def limites(geohash: str) -> Tuple[float, float, float, float]:
+    """Retorna los límites (sur, oeste, norte, este) de la celda de un geohash."""
+    rango_lat = [-90.0, 90.0]
+    rango_lon = [-180.0, 180.0]
+    es_lon = True
+
+    for caracter in geohash:
+        valor = _INDICE_BASE32[caracter]
+        for desplazamiento in range(4, -1, -1):
+            bit = (valor >> desplazamiento) & 1
+            rango = rango_lon if es_lon else rango_lat
+            medio = (rango[0] + rango[1]) / 2
+            if bit:
+                rango[0] = medio
+            else:
+                rango[1] = medio
+            es_lon = not es_lon
+
+    return (rango_lat[0], rango_lon[0], rango_lat[1], rango_lon[1])
+
+
+def celdas_en_rectangulo(sur: float, oeste: float, norte: float, este: float, precision: int = 6) -> List[str]:
+    """Retorna los geohashes de todas las celdas que intersectan el rectángulo dado."""
+    celdas = []
+    sur_celda, oeste_celda, norte_celda, este_celda = limites(codificar(sur, oeste, precision))
+    alto = norte_celda - sur_celda
+    ancho = este_celda - oeste_celda
+
+    lat = sur
+    while True:
+        lon = oeste
+        while True:
+            celda = codificar(lat, lon, precision)
+            if celda not in celdas:
+                celdas.append(celda)
+            if lon >= este:
+                break
+            lon = min(lon + ancho, este)
+        if lat >= norte:
+            break
+        lat = min(lat + alto, norte)
+
+    return celdas
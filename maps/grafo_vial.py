@@ -0,0 +1,246 @@
+"""
+Grafo vial local construido a partir de un extracto de OpenStreetMap.
+
+Permite calcular rutas dentro del proceso (sin red) con A* sobre el tiempo
+de viaje. Las velocidades se estiman a partir de la etiqueta "highway" (o
+"maxspeed" si existe) y se respetan las vías de un solo sentido.
+"""
+
+import heapq
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .constants import MAPA_CONFIG
+from .indice_vial import IndiceEspacialNodos, leer_extracto_osm, RADIO_TIERRA_METROS
+
+# Velocidades por defecto (km/h) según el tipo de vía
+VELOCIDADES_KMH = {
+    'motorway': 100, 'motorway_link': 60,
+    'trunk': 80, 'trunk_link': 50,
+    'primary': 60, 'primary_link': 45,
+    'secondary': 50, 'secondary_link': 40,
+    'tertiary': 40, 'tertiary_link': 35,
+    'unclassified': 30, 'residential': 30,
+    'service': 20, 'living_street': 10,
+}
+
+# Vías que no son transitables en auto
+VIAS_EXCLUIDAS = {
+    'footway', 'path', 'cycleway', 'steps', 'pedestrian', 'bridleway',
+    'corridor', 'proposed', 'construction', 'platform', 'elevator', 'track',
+}
+
+VELOCIDAD_POR_DEFECTO_KMH = 30
+
+
+def distancia_metros(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia haversine en metros entre dos puntos."""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    a = (math.sin((lat2_rad - lat1_rad) / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * RADIO_TIERRA_METROS * math.asin(math.sqrt(a))
+
+
+def _velocidad_via(etiquetas: Dict[str, str]) -> float:
+    """Retorna la velocidad estimada de una vía en km/h."""
+    maxspeed = etiquetas.get('maxspeed', '')
+    if maxspeed.isdigit():
+        return float(maxspeed)
+    return VELOCIDADES_KMH.get(etiquetas.get('highway'), VELOCIDAD_POR_DEFECTO_KMH)
+
+
+def _sentido_via(etiquetas: Dict[str, str]) -> int:
+    """Retorna 1 si la vía es de sentido único, -1 si es único en reversa y 0 si es doble."""
+    oneway = etiquetas.get('oneway', '')
+    if oneway in ('yes', 'true', '1'):
+        return 1
+    if oneway == '-1':
+        return -1
+    if oneway == 'no':
+        return 0
+    if etiquetas.get('junction') in ('roundabout', 'circular') or etiquetas.get('highway') == 'motorway':
+        return 1
+    return 0
+
+
+class GrafoVial:
+    """
+    Grafo dirigido de la red vial.
+
+    Los nodos se numeran de 0 a N-1; `adyacencia[u]` contiene tuplas
+    (v, segundos, metros, indice_via) con las aristas que salen de u.
+    """
+
+    def __init__(self):
+        self.lats: List[float] = []
+        self.lons: List[float] = []
+        self.ids_osm: List[int] = []
+        self.adyacencia: List[List[Tuple[int, float, float, int]]] = []
+        self.nombres_vias: List[str] = []
+        self.velocidad_maxima_ms = VELOCIDAD_POR_DEFECTO_KMH / 3.6
+        self.indice: Optional[IndiceEspacialNodos] = None
+
+    @property
+    def total_nodos(self) -> int:
+        return len(self.lats)
+
+    @property
+    def total_aristas(self) -> int:
+        return sum(len(aristas) for aristas in self.adyacencia)
+
+    @classmethod
+    def desde_extracto_osm(cls, ruta: str) -> 'GrafoVial':
+        """Construye el grafo con las vías transitables de un extracto OSM."""
+        nodos, vias = leer_extracto_osm(ruta)
+        return cls.desde_nodos_y_vias(nodos, vias)
+
+    @classmethod
+    def desde_nodos_y_vias(cls, nodos, vias) -> 'GrafoVial':
+        grafo = cls()
+        posicion = {}
+
+        def indice_nodo(id_osm):
+            if id_osm not in posicion:
+                lat, lon = nodos[id_osm]
+                posicion[id_osm] = len(grafo.lats)
+                grafo.lats.append(lat)
+                grafo.lons.append(lon)
+                grafo.ids_osm.append(id_osm)
+                grafo.adyacencia.append([])
+            return posicion[id_osm]
+
+        for etiquetas, referencias in vias:
+            if etiquetas.get('highway') in VIAS_EXCLUIDAS:
+                continue
+            referencias = [ref for ref in referencias if ref in nodos]
+            if len(referencias) < 2:
+                continue
+
+            velocidad_ms = _velocidad_via(etiquetas) / 3.6
+            grafo.velocidad_maxima_ms = max(grafo.velocidad_maxima_ms, velocidad_ms)
+            sentido = _sentido_via(etiquetas)
+            indice_via = len(grafo.nombres_vias)
+            grafo.nombres_vias.append(etiquetas.get('name', 'Sin nombre'))
+
+            for ref_a, ref_b in zip(referencias, referencias[1:]):
+                u, v = indice_nodo(ref_a), indice_nodo(ref_b)
+                metros = distancia_metros(grafo.lats[u], grafo.lons[u], grafo.lats[v], grafo.lons[v])
+                segundos = metros / velocidad_ms
+                if sentido >= 0:
+                    grafo.adyacencia[u].append((v, segundos, metros, indice_via))
+                if sentido <= 0:
+                    grafo.adyacencia[v].append((u, segundos, metros, indice_via))
+
+        grafo.indice = IndiceEspacialNodos(
+            {i: (lat, lon) for i, (lat, lon) in enumerate(zip(grafo.lats, grafo.lons))},
+            tamano_celda=MAPA_CONFIG["tamano_celda_indice"],
+        )
+        return grafo
+
+    def nodo_mas_cercano(self, lat: float, lon: float, radio: float) -> Optional[int]:
+        """Retorna el índice del nodo del grafo más cercano dentro de `radio` metros."""
+        nodo = self.indice.nodo_mas_cercano(lat, lon, radio)
+        return nodo['id'] if nodo else None
+
+    def ruta_mas_corta(self, origen: int, destino: int) -> Optional[List[Tuple[int, float, float, int]]]:
+        """
+        Calcula la ruta de menor tiempo entre dos nodos con A*.
+
+        La heurística es la distancia en línea recta dividida por la
+        velocidad máxima del grafo, por lo que nunca sobreestima.
+
+        Returns:
+            list: Aristas recorridas como (nodo_destino, segundos, metros, indice_via),
+            o None si el destino no es alcanzable
+        """
+        if origen == destino:
+            return []
+
+        lat_destino, lon_destino = self.lats[destino], self.lons[destino]
+        velocidad = self.velocidad_maxima_ms
+
+        def heuristica(nodo):
+            return distancia_metros(self.lats[nodo], self.lons[nodo], lat_destino, lon_destino) / velocidad
+
+        costos = {origen: 0.0}
+        previos = {}
+        cola = [(heuristica(origen), 0.0, origen)]
+        cerrados = set()
+
+        while cola:
+            _, costo, nodo = heapq.heappop(cola)
+            if nodo in cerrados:
+                continue
+            if nodo == destino:
+                break
+            cerrados.add(nodo)
+
+            for vecino, segundos, metros, indice_via in self.adyacencia[nodo]:
+                nuevo_costo = costo + segundos
+                if nuevo_costo < costos.get(vecino, math.inf):
+                    costos[vecino] = nuevo_costo
+                    previos[vecino] = (nodo, segundos, metros, indice_via)
+                    heapq.heappush(cola, (nuevo_costo + heuristica(vecino), nuevo_costo, vecino))
+
+        if destino not in previos:
+            return None
+
+        aristas = []
+        nodo = destino
+        while nodo != origen:
+            anterior, segundos, metros, indice_via = previos[nodo]
+            aristas.append((nodo, segundos, metros, indice_via))
+            nodo = anterior
+        aristas.reverse()
+        return aristas
+
+
+_grafo_vial = None
+_lock_grafo = threading.Lock()
+
+
+def obtener_grafo_vial() -> Optional[GrafoVial]:
+    """Retorna el grafo vial si ya terminó de cargarse, o None en caso contrario."""
+    return _grafo_vial
+
+
+def cargar_grafo_vial(ruta: str = None) -> Optional[GrafoVial]:
+    """
+    Construye el grafo vial desde el extracto configurado (una sola vez por proceso).
+
+    Args:
+        ruta: Ruta al extracto; por defecto MAPA_CONFIG["archivo_osm"]
+
+    Returns:
+        GrafoVial o None si no hay extracto configurado o falla la carga
+    """
+    global _grafo_vial
+
+    ruta = ruta or MAPA_CONFIG["archivo_osm"]
+    if not ruta or not os.path.exists(ruta):
+        return None
+
+    with _lock_grafo:
+        if _grafo_vial is not None:
+            return _grafo_vial
+        try:
+            inicio = time.perf_counter()
+            _grafo_vial = GrafoVial.desde_extracto_osm(ruta)
+            print(f"Grafo vial cargado: {_grafo_vial.total_nodos} nodos, {_grafo_vial.total_aristas} aristas "
+                  f"en {time.perf_counter() - inicio:.1f} s")
+        except Exception as e:
+            print(f"Error al construir el grafo vial desde {ruta}: {e}")
+        return _grafo_vial
+
+
+def precargar_grafo_vial():
+    """
+    Inicia la construcción del grafo vial en segundo plano si el backend de
+    ruteo configurado lo usa, para que ninguna petición espere el parseo.
+    """
+    if MAPA_CONFIG["archivo_osm"] and MAPA_CONFIG["backend_ruteo"] == 'local':
+        threading.Thread(target=cargar_grafo_vial, name='carga-grafo-vial', daemon=True).start()
@@ -0,0 +1,211 @@
+"""
+Índice espacial local de nodos viales.
+
+Carga un extracto de OpenStreetMap de la región (archivo .osm/.xml o .pbf)
+y construye una grilla regular con los nodos que pertenecen a vías con la
+etiqueta "highway". Permite responder "nodo vial más cercano dentro de N
+metros" sin consultar Overpass.
+
+El archivo se configura con MAPA_CONFIG["archivo_osm"] (variable de entorno
+MAPA_ARCHIVO_OSM). Si no está configurado, el índice no se carga y el
+ajuste de nodos sigue usando Overpass.
+"""
+
+import math
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .constants import MAPA_CONFIG
+
+RADIO_TIERRA_METROS = 6371000
+METROS_POR_GRADO_LAT = 111320
+
+
+def leer_extracto_osm(ruta: str) -> Tuple[Dict[int, Tuple[float, float]], List[Tuple[Dict[str, str], List[int]]]]:
+    """
+    Lee un extracto OSM y retorna sus nodos y sus vías con etiqueta "highway".
+
+    Los archivos .pbf requieren la librería opcional `osmium`; los archivos
+    XML (.osm, .xml) se leen con la librería estándar.
+
+    Args:
+        ruta: Ruta al archivo del extracto
+
+    Returns:
+        tuple: (nodos, vias) donde nodos es {id: (lat, lon)} y vias es una
+        lista de (etiquetas, lista de ids de nodos)
+    """
+    if ruta.endswith('.pbf'):
+        return _leer_extracto_pbf(ruta)
+    return _leer_extracto_xml(ruta)
+
+
+def _leer_extracto_xml(ruta):
+    nodos = {}
+    vias = []
+
+    for _, elemento in ET.iterparse(ruta, events=('end',)):
+        if elemento.tag == 'node':
+            nodos[int(elemento.get('id'))] = (float(elemento.get('lat')), float(elemento.get('lon')))
+            elemento.clear()
+        elif elemento.tag == 'way':
+            etiquetas = {tag.get('k'): tag.get('v') for tag in elemento.iter('tag')}
+            if 'highway' in etiquetas:
+                referencias = [int(nd.get('ref')) for nd in elemento.iter('nd')]
+                vias.append((etiquetas, referencias))
+            elemento.clear()
+        elif elemento.tag == 'relation':
+            elemento.clear()
+
+    return nodos, vias
+
+
+def _leer_extracto_pbf(ruta):
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Se necesita la librería 'osmium' para leer extractos .pbf (pip install osmium)")
+
+    nodos = {}
+    vias = []
+
+    class _Lector(osmium.SimpleHandler):
+        def node(self, n):
+            nodos[n.id] = (n.location.lat, n.location.lon)
+
+        def way(self, w):
+            if 'highway' in w.tags:
+                vias.append(({t.k: t.v for t in w.tags}, [nd.ref for nd in w.nodes]))
+
+    _Lector().apply_file(ruta)
+    return nodos, vias
+
+
+class IndiceEspacialNodos:
+    """
+    Grilla regular de nodos viales para búsquedas de vecino más cercano.
+
+    Cada celda mide `tamano_celda` grados por lado; una búsqueda revisa solo
+    las celdas que intersectan el radio pedido, por lo que el costo no depende
+    del número total de nodos.
+
+    Args:
+        nodos: Diccionario {id: (lat, lon)} con los nodos a indexar
+        tamano_celda: Lado de cada celda en grados
+    """
+
+    def __init__(self, nodos: Dict[int, Tuple[float, float]], tamano_celda: float = 0.0005):
+        self.tamano_celda = tamano_celda
+        self.celdas = defaultdict(list)
+        self.total_nodos = len(nodos)
+
+        for id_nodo, (lat, lon) in nodos.items():
+            self.celdas[self._celda(lat, lon)].append((lat, lon, id_nodo))
+
+        if nodos:
+            lats = [lat for lat, _ in nodos.values()]
+            lons = [lon for _, lon in nodos.values()]
+            self.limites = (min(lats), min(lons), max(lats), max(lons))
+        else:
+            self.limites = None
+
+    def _celda(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.tamano_celda), math.floor(lon / self.tamano_celda))
+
+    def cubre(self, lat: float, lon: float) -> bool:
+        """Indica si el punto está dentro del área cubierta por el extracto."""
+        if self.limites is None:
+            return False
+        lat_min, lon_min, lat_max, lon_max = self.limites
+        return lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+
+    def nodo_mas_cercano(self, lat: float, lon: float, radio: float = 50) -> Optional[Dict]:
+        """
+        Busca el nodo vial más cercano dentro de `radio` metros.
+
+        Returns:
+            Dict: Nodo con el mismo formato que Overpass ('type', 'id', 'lat', 'lon'),
+            o None si no hay nodos dentro del radio
+        """
+        delta_lat = radio / METROS_POR_GRADO_LAT
+        delta_lon = radio / (METROS_POR_GRADO_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        fila_min, col_min = self._celda(lat - delta_lat, lon - delta_lon)
+        fila_max, col_max = self._celda(lat + delta_lat, lon + delta_lon)
+
+        lat_rad = math.radians(lat)
+        cos_lat = math.cos(lat_rad)
+        mejor = None
+        mejor_distancia = radio
+
+        for fila in range(fila_min, fila_max + 1):
+            for col in range(col_min, col_max + 1):
+                for lat_nodo, lon_nodo, id_nodo in self.celdas.get((fila, col), ()):
+                    lat_nodo_rad = math.radians(lat_nodo)
+                    dlat = lat_nodo_rad - lat_rad
+                    dlon = math.radians(lon_nodo - lon)
+                    a = (math.sin(dlat / 2) ** 2 +
+                         cos_lat * math.cos(lat_nodo_rad) * math.sin(dlon / 2) ** 2)
+                    distancia = 2 * RADIO_TIERRA_METROS * math.asin(math.sqrt(a))
+                    if distancia <= mejor_distancia:
+                        mejor_distancia = distancia
+                        mejor = (lat_nodo, lon_nodo, id_nodo)
+
+        if mejor is None:
+            return None
+        return {'type': 'node', 'id': mejor[2], 'lat': mejor[0], 'lon': mejor[1]}
+
+    @classmethod
+    def desde_extracto_osm(cls, ruta: str, tamano_celda: float = 0.0005) -> 'IndiceEspacialNodos':
+        """Construye el índice con los nodos de las vías "highway" de un extracto OSM."""
+        nodos, vias = leer_extracto_osm(ruta)
+        ids_viales = {id_nodo for _, referencias in vias for id_nodo in referencias}
+        nodos_viales = {id_nodo: nodos[id_nodo] for id_nodo in ids_viales if id_nodo in nodos}
+        return cls(nodos_viales, tamano_celda=tamano_celda)
+
+
+_indice_vial = None
+_lock_indice = threading.Lock()
+
+
+def obtener_indice_vial() -> Optional[IndiceEspacialNodos]:
+    """Retorna el índice vial si ya terminó de cargarse, o None en caso contrario."""
+    return _indice_vial
+
+
+def cargar_indice_vial(ruta: str = None) -> Optional[IndiceEspacialNodos]:
+    """
+    Carga el índice vial desde el extracto configurado (una sola vez por proceso).
+
+    Args:
+        ruta: Ruta al extracto; por defecto MAPA_CONFIG["archivo_osm"]
+
+    Returns:
+        IndiceEspacialNodos o None si no hay extracto configurado o falla la carga
+    """
+    global _indice_vial
+
+    ruta = ruta or MAPA_CONFIG["archivo_osm"]
+    if not ruta or not os.path.exists(ruta):
+        return None
+
+    with _lock_indice:
+        if _indice_vial is not None:
+            return _indice_vial
+        try:
+            inicio = time.perf_counter()
+            _indice_vial = IndiceEspacialNodos.desde_extracto_osm(ruta, MAPA_CONFIG["tamano_celda_indice"])
+            print(f"Índice vial cargado: {_indice_vial.total_nodos} nodos en "
+                  f"{time.perf_counter() - inicio:.1f} s desde {ruta}")
+        except Exception as e:
+            print(f"Error al cargar el índice vial desde {ruta}: {e}")
+        return _indice_vial
+
+
+def precargar_indice_vial():
+    """Inicia la carga del índice vial en segundo plano para no bloquear el arranque."""
+    if MAPA_CONFIG["archivo_osm"]:
+        threading.Thread(target=cargar_indice_vial, name='carga-indice-vial', daemon=True).start()
@@ -0,0 +1,471 @@
+"""
+Jerarquía de contracción (contraction hierarchy) del grafo vial.
+
+El preprocesamiento contrae los nodos del GrafoVial en orden de importancia
+y agrega atajos que preservan los tiempos mínimos de viaje. Una consulta es
+un Dijkstra bidireccional que solo sube en la jerarquía, por lo que visita
+unos pocos cientos de nodos aunque el grafo tenga los de una ciudad entera.
+
+La jerarquía se guarda en un único archivo binario con arreglos NumPy
+alineados, que se abre con np.memmap sin copiar el grafo a memoria:
+
+    MAGIA (8 bytes) | largo del encabezado (uint64) | encabezado JSON |
+    relleno | arreglos
+
+El archivo se configura con MAPA_CONFIG["archivo_jerarquia"] (variable de
+entorno MAPA_ARCHIVO_JERARQUIA) y se genera con:
+
+    python manage.py preprocesar_jerarquia
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache import CacheLRU
+from .constants import MAPA_CONFIG
+from .indice_vial import IndiceEspacialNodos
+
+MAGIA = b'MAPACH01'
+ALINEACION = 8
+
+# Arreglos del archivo y su tipo. Las aristas "arriba" van de un nodo a otro
+# de mayor rango y se guardan en el origen; las aristas "abajo" van de un nodo
+# de mayor rango al nodo y se guardan en el destino. `medio` es el nodo
+# contraído que reemplaza un atajo, o -1 si la arista es una calle original.
+TIPOS_ARREGLOS = {
+    'lats': np.float64,
+    'lons': np.float64,
+    'ids_osm': np.int64,
+    'rango': np.int32,
+    'arriba_inicio': np.int64,
+    'arriba_destino': np.int32,
+    'arriba_costo': np.float64,
+    'arriba_metros': np.float64,
+    'arriba_medio': np.int32,
+    'arriba_via': np.int32,
+    'abajo_inicio': np.int64,
+    'abajo_origen': np.int32,
+    'abajo_costo': np.float64,
+    'abajo_metros': np.float64,
+    'abajo_medio': np.int32,
+    'abajo_via': np.int32,
+}
+
+
+def _busqueda_testigo(salida, origen: int, excluido: int, limite: float, max_asentados: int) -> Dict[int, float]:
+    """
+    Dijkstra local desde `origen` que ignora el nodo `excluido`.
+
+    Se detiene al superar `limite` segundos o `max_asentados` nodos; las
+    distancias retornadas son cotas superiores válidas.
+    """
+    distancias = {origen: 0.0}
+    cola = [(0.0, origen)]
+    asentados = 0
+
+    while cola:
+        costo, nodo = heapq.heappop(cola)
+        if costo > distancias[nodo]:
+            continue
+        if costo > limite or asentados >= max_asentados:
+            break
+        asentados += 1
+
+        for vecino, arista in salida[nodo].items():
+            if vecino == excluido:
+                continue
+            nuevo_costo = costo + arista[0]
+            if nuevo_costo < distancias.get(vecino, math.inf):
+                distancias[vecino] = nuevo_costo
+                heapq.heappush(cola, (nuevo_costo, vecino))
+
+    return distancias
+
+
+def _atajos_necesarios(salida, entrada, nodo: int, max_asentados: int) -> List[Tuple[int, int, float, float]]:
+    """Retorna los atajos (origen, destino, segundos, metros) que requiere contraer `nodo`."""
+    atajos = []
+    if not salida[nodo]:
+        return atajos
+
+    costo_salida_maximo = max(arista[0] for arista in salida[nodo].values())
+    for origen, (costo_entrada, _, metros_entrada, _) in entrada[nodo].items():
+        distancias = _busqueda_testigo(salida, origen, nodo, costo_entrada + costo_salida_maximo, max_asentados)
+        for destino, (costo_salida, _, metros_salida, _) in salida[nodo].items():
+            if destino == origen:
+                continue
+            costo = costo_entrada + costo_salida
+            if distancias.get(destino, math.inf) > costo:
+                atajos.append((origen, destino, costo, metros_entrada + metros_salida))
+
+    return atajos
+
+
+def _prioridad(salida, entrada, nodo: int, vecinos_contraidos: List[int], profundidad: List[int],
+               max_asentados: int):
+    """
+    Prioridad de contracción (menor se contrae antes): diferencia de aristas,
+    vecinos ya contraídos y profundidad en la jerarquía, para contraer de
+    forma pareja en todo el grafo.
+    """
+    atajos = _atajos_necesarios(salida, entrada, nodo, max_asentados)
+    diferencia = len(atajos) - len(salida[nodo]) - len(entrada[nodo])
+    return 2 * diferencia + vecinos_contraidos[nodo] + profundidad[nodo], atajos
+
+
+def _arreglos_csr(aristas_por_nodo, prefijo: str, campo_vecino: str) -> Dict[str, np.ndarray]:
+    """Convierte listas de aristas por nodo al formato CSR (inicio + arreglos planos)."""
+    cantidades = [len(aristas) for aristas in aristas_por_nodo]
+    inicio = np.zeros(len(aristas_por_nodo) + 1, dtype=np.int64)
+    np.cumsum(cantidades, out=inicio[1:])
+
+    planas = [arista for aristas in aristas_por_nodo for arista in aristas]
+    columnas = list(zip(*planas)) if planas else [(), (), (), (), ()]
+    nombres = (campo_vecino, 'costo', 'medio', 'metros', 'via')
+
+    arreglos = {f'{prefijo}_inicio': inicio}
+    for nombre, columna in zip(nombres, columnas):
+        clave = f'{prefijo}_{nombre}'
+        arreglos[clave] = np.array(columna, dtype=TIPOS_ARREGLOS[clave])
+    return arreglos
+
+
+def construir_jerarquia(grafo, max_asentados: int = 500) -> 'JerarquiaContraccion':
+    """
+    Contrae todos los nodos de un GrafoVial y retorna la jerarquía resultante.
+
+    Args:
+        grafo: GrafoVial con la red vial
+        max_asentados: Nodos máximos por búsqueda de testigos; valores más
+            bajos aceleran el preprocesamiento a cambio de más atajos
+
+    Returns:
+        JerarquiaContraccion: Jerarquía lista para consultar o guardar
+    """
+    total = grafo.total_nodos
+
+    # salida[u][v] = entrada[v][u] = (segundos, medio, metros, indice_via)
+    salida = [{} for _ in range(total)]
+    entrada = [{} for _ in range(total)]
+    for origen, aristas in enumerate(grafo.adyacencia):
+        for destino, segundos, metros, indice_via in aristas:
+            if destino == origen:
+                continue
+            actual = salida[origen].get(destino)
+            if actual is None or segundos < actual[0]:
+                salida[origen][destino] = entrada[destino][origen] = (segundos, -1, metros, indice_via)
+
+    vecinos_contraidos = [0] * total
+    profundidad = [0] * total
+    cola = [
+        (_prioridad(salida, entrada, nodo, vecinos_contraidos, profundidad, max_asentados)[0], nodo)
+        for nodo in range(total)
+    ]
+    heapq.heapify(cola)
+
+    rango = np.empty(total, dtype=np.int32)
+    arriba = [[] for _ in range(total)]
+    abajo = [[] for _ in range(total)]
+    nivel = 0
+
+    while cola:
+        _, nodo = heapq.heappop(cola)
+
+        # Actualización perezosa: si la prioridad empeoró, el nodo vuelve a la cola
+        prioridad, atajos = _prioridad(salida, entrada, nodo, vecinos_contraidos, profundidad, max_asentados)
+        if cola and prioridad > cola[0][0]:
+            heapq.heappush(cola, (prioridad, nodo))
+            continue
+
+        rango[nodo] = nivel
+        nivel += 1
+
+        for destino, (costo, medio, metros, indice_via) in salida[nodo].items():
+            arriba[nodo].append((destino, costo, medio, metros, indice_via))
+            del entrada[destino][nodo]
+            vecinos_contraidos[destino] += 1
+            profundidad[destino] = max(profundidad[destino], profundidad[nodo] + 1)
+        for origen, (costo, medio, metros, indice_via) in entrada[nodo].items():
+            abajo[nodo].append((origen, costo, medio, metros, indice_via))
+            del salida[origen][nodo]
+            vecinos_contraidos[origen] += 1
+            profundidad[origen] = max(profundidad[origen], profundidad[nodo] + 1)
+        salida[nodo] = {}
+        entrada[nodo] = {}
+
+        for origen, destino, costo, metros in atajos:
+            actual = salida[origen].get(destino)
+            if actual is None or costo < actual[0]:
+                salida[origen][destino] = entrada[destino][origen] = (costo, nodo, metros, -1)
+
+    arreglos = {
+        'lats': np.asarray(grafo.lats, dtype=np.float64),
+        'lons': np.asarray(grafo.lons, dtype=np.float64),
+        'ids_osm': np.asarray(grafo.ids_osm, dtype=np.int64),
+        'rango': rango,
+    }
+    arreglos.update(_arreglos_csr(arriba, 'arriba', 'destino'))
+    arreglos.update(_arreglos_csr(abajo, 'abajo', 'origen'))
+    return JerarquiaContraccion(arreglos, list(grafo.nombres_vias))
+
+
+class JerarquiaContraccion:
+    """
+    Jerarquía de contracción consultable.
+
+    Expone la misma interfaz que GrafoVial para el ruteo (`lats`, `lons`,
+    `nombres_vias`, `nodo_mas_cercano` y `ruta_mas_corta`), de modo que los
+    backends de ruteo pueden usar cualquiera de los dos.
+    """
+
+    def __init__(self, arreglos: Dict[str, np.ndarray], nombres_vias: List[str]):
+        for nombre in TIPOS_ARREGLOS:
+            setattr(self, nombre, arreglos[nombre])
+        self.nombres_vias = nombres_vias
+        self._indice = None
+        # Aristas ya leídas del archivo, por (tipo, nodo): [(vecino, segundos, medio, metros, indice_via)].
+        # Las consultas visitan sobre todo la parte alta de la jerarquía, así
+        # que una caché acotada basta; el resto se vuelve a leer del memmap.
+        capacidad = MAPA_CONFIG["cache_filas_jerarquia"]
+        self._filas = CacheLRU(capacidad) if capacidad else None
+
+    @property
+    def total_nodos(self) -> int:
+        return len(self.lats)
+
+    @property
+    def total_aristas(self) -> int:
+        return len(self.arriba_destino) + len(self.abajo_origen)
+
+    @property
+    def indice(self) -> IndiceEspacialNodos:
+        if self._indice is None:
+            self._indice = IndiceEspacialNodos(
+                dict(enumerate(zip(self.lats.tolist(), self.lons.tolist()))),
+                tamano_celda=MAPA_CONFIG["tamano_celda_indice"],
+            )
+        return self._indice
+
+    def nodo_mas_cercano(self, lat: float, lon: float, radio: float) -> Optional[int]:
+        """Retorna el índice del nodo más cercano dentro de `radio` metros."""
+        nodo = self.indice.nodo_mas_cercano(lat, lon, radio)
+        return nodo['id'] if nodo else None
+
+    def _fila(self, tipo: str, nodo: int) -> List[Tuple[int, float, int, float, int]]:
+        """Retorna las aristas "arriba" o "abajo" de un nodo como tuplas de Python."""
+        fila = self._filas.obtener((tipo, nodo), None) if self._filas is not None else None
+        if fila is None:
+            inicio = getattr(self, f'{tipo}_inicio')
+            desde, hasta = int(inicio[nodo]), int(inicio[nodo + 1])
+            vecinos = self.arriba_destino if tipo == 'arriba' else self.abajo_origen
+            fila = list(zip(
+                vecinos[desde:hasta].tolist(),
+                getattr(self, f'{tipo}_costo')[desde:hasta].tolist(),
+                getattr(self, f'{tipo}_medio')[desde:hasta].tolist(),
+                getattr(self, f'{tipo}_metros')[desde:hasta].tolist(),
+                getattr(self, f'{tipo}_via')[desde:hasta].tolist(),
+            ))
+            if self._filas is not None:
+                self._filas.guardar((tipo, nodo), fila)
+        return fila
+
+    def ruta_mas_corta(self, origen: int, destino: int) -> Optional[List[Tuple[int, float, float, int]]]:
+        """
+        Calcula la ruta de menor tiempo con un Dijkstra bidireccional ascendente.
+
+        Returns:
+            list: Aristas originales recorridas como (nodo_destino, segundos,
+            metros, indice_via), o None si el destino no es alcanzable
+        """
+        if origen == destino:
+            return []
+
+        distancias_ida = {origen: 0.0}
+        distancias_vuelta = {destino: 0.0}
+        previos_ida = {}
+        previos_vuelta = {}
+        cola_ida = [(0.0, origen)]
+        cola_vuelta = [(0.0, destino)]
+        mejor = math.inf
+        encuentro = None
+
+        # Cada búsqueda sube por sus aristas y revisa las de la otra dirección
+        # para no expandir nodos que se alcanzan más barato desde arriba
+        # (stall-on-demand).
+        busquedas = (
+            (cola_ida, distancias_ida, previos_ida, distancias_vuelta, 'arriba', 'abajo'),
+            (cola_vuelta, distancias_vuelta, previos_vuelta, distancias_ida, 'abajo', 'arriba'),
+        )
+
+        while (cola_ida and cola_ida[0][0] < mejor) or (cola_vuelta and cola_vuelta[0][0] < mejor):
+            for cola, distancias, previos, distancias_opuestas, tipo, tipo_inverso in busquedas:
+                if not cola or cola[0][0] >= mejor:
+                    continue
+                costo, nodo = heapq.heappop(cola)
+                if costo > distancias[nodo]:
+                    continue
+
+                if nodo in distancias_opuestas and costo + distancias_opuestas[nodo] < mejor:
+                    mejor = costo + distancias_opuestas[nodo]
+                    encuentro = nodo
+
+                if any(distancias.get(arista[0], math.inf) + arista[1] < costo
+                       for arista in self._fila(tipo_inverso, nodo)):
+                    continue
+
+                for posicion, arista in enumerate(self._fila(tipo, nodo)):
+                    vecino = arista[0]
+                    nuevo_costo = costo + arista[1]
+                    if nuevo_costo < distancias.get(vecino, math.inf):
+                        distancias[vecino] = nuevo_costo
+                        previos[vecino] = (nodo, posicion)
+                        heapq.heappush(cola, (nuevo_costo, vecino))
+
+        if encuentro is None:
+            return None
+
+        # Aristas de la jerarquía como (origen, destino, tipo, nodo que la guarda, posición)
+        tramo_ida = []
+        nodo = encuentro
+        while nodo != origen:
+            anterior, posicion = previos_ida[nodo]
+            tramo_ida.append((anterior, nodo, 'arriba', anterior, posicion))
+            nodo = anterior
+        tramo_ida.reverse()
+
+        tramo_vuelta = []
+        nodo = encuentro
+        while nodo != destino:
+            siguiente, posicion = previos_vuelta[nodo]
+            tramo_vuelta.append((nodo, siguiente, 'abajo', siguiente, posicion))
+            nodo = siguiente
+
+        aristas = []
+        for arista in tramo_ida + tramo_vuelta:
+            aristas.extend(self._desempaquetar(*arista))
+        return aristas
+
+    def _desempaquetar(self, origen: int, destino: int, tipo: str, dueno: int,
+                       posicion: int) -> List[Tuple[int, float, float, int]]:
+        """
+        Expande un atajo hasta las calles originales.
+
+        El nodo medio de un atajo se contrajo antes que sus extremos, así que
+        la arista origen→medio está guardada "abajo" en medio y la arista
+        medio→destino está guardada "arriba" en medio.
+        """
+        aristas = []
+        pendientes = [(origen, destino, tipo, dueno, posicion)]
+
+        while pendientes:
+            origen, destino, tipo, dueno, posicion = pendientes.pop()
+            _, segundos, medio, metros, indice_via = self._fila(tipo, dueno)[posicion]
+            if medio < 0:
+                aristas.append((destino, segundos, metros, indice_via))
+                continue
+
+            entrada = [arista[0] for arista in self._fila('abajo', medio)].index(origen)
+            salida = [arista[0] for arista in self._fila('arriba', medio)].index(destino)
+            # Se apila primero el segundo tramo para procesar el primero antes
+            pendientes.append((medio, destino, 'arriba', medio, salida))
+            pendientes.append((origen, medio, 'abajo', medio, entrada))
+
+        return aristas
+
+    def guardar(self, ruta: str) -> int:
+        """
+        Escribe la jerarquía en `ruta`.
+
+        Returns:
+            int: Tamaño del archivo en bytes
+        """
+        arreglos = {}
+        desplazamiento = 0
+        for nombre, tipo in TIPOS_ARREGLOS.items():
+            arreglo = np.ascontiguousarray(getattr(self, nombre), dtype=tipo)
+            arreglos[nombre] = (arreglo, desplazamiento)
+            desplazamiento += -(-arreglo.nbytes // ALINEACION) * ALINEACION
+        total_datos = desplazamiento
+
+        encabezado = json.dumps({
+            'nombres_vias': self.nombres_vias,
+            'arreglos': {
+                nombre: {'tipo': arreglo.dtype.str, 'forma': arreglo.shape, 'desplazamiento': desplazamiento}
+                for nombre, (arreglo, desplazamiento) in arreglos.items()
+            },
+        }).encode('utf-8')
+        inicio_datos = -(-(len(MAGIA) + 8 + len(encabezado)) // ALINEACION) * ALINEACION
+
+        with open(ruta, 'wb') as archivo:
+            archivo.write(MAGIA)
+            archivo.write(np.uint64(len(encabezado)).tobytes())
+            archivo.write(encabezado)
+            for arreglo, desplazamiento in arreglos.values():
+                archivo.seek(inicio_datos + desplazamiento)
+                archivo.write(arreglo.tobytes())
+            archivo.truncate(inicio_datos + total_datos)
+
+        return os.path.getsize(ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'JerarquiaContraccion':
+        """
+        Abre una jerarquía guardada con `guardar` mapeando el archivo en memoria.
+
+        Raises:
+            ValueError: Si el archivo no es una jerarquía válida
+        """
+        datos = np.memmap(ruta, dtype=np.uint8, mode='r')
+        if bytes(datos[:len(MAGIA)]) != MAGIA:
+            raise ValueError(f"{ruta} no es un archivo de jerarquía de contracción")
+
+        largo = int(np.frombuffer(datos[len(MAGIA):len(MAGIA) + 8], dtype=np.uint64)[0])
+        encabezado = json.loads(bytes(datos[len(MAGIA) + 8:len(MAGIA) + 8 + largo]).decode('utf-8'))
+        inicio_datos = -(-(len(MAGIA) + 8 + largo) // ALINEACION) * ALINEACION
+
+        arreglos = {
+            nombre: np.ndarray(tuple(info['forma']), dtype=np.dtype(info['tipo']), buffer=datos,
+                               offset=inicio_datos + info['desplazamiento'])
+            for nombre, info in encabezado['arreglos'].items()
+        }
+        return cls(arreglos, encabezado['nombres_vias'])
+
+
+_jerarquia = None
+_lock_jerarquia = threading.Lock()
+
+
+def obtener_jerarquia(ruta: str = None) -> Optional[JerarquiaContraccion]:
+    """
+    Retorna la jerarquía de contracción, abriéndola la primera vez desde
+    MAPA_CONFIG["archivo_jerarquia"].
+
+    Returns:
+        JerarquiaContraccion o None si no hay archivo configurado o falla la carga
+    """
+    global _jerarquia
+
+    if _jerarquia is not None:
+        return _jerarquia
+
+    ruta = ruta or MAPA_CONFIG["archivo_jerarquia"]
+    if not ruta or not os.path.exists(ruta):
+        return None
+
+    with _lock_jerarquia:
+        if _jerarquia is None:
+            try:
+                inicio = time.perf_counter()
+                _jerarquia = JerarquiaContraccion.cargar(ruta)
+                print(f"Jerarquía de contracción cargada: {_jerarquia.total_nodos} nodos "
+                      f"en {time.perf_counter() - inicio:.3f} s")
+            except Exception as e:
+                print(f"Error al cargar la jerarquía de contracción desde {ruta}: {e}")
+        return _jerarquia
@@ -0,0 +1,78 @@
+"""
+Comando Django para comparar el cálculo escalar y vectorizado de distancias.
+
+Uso:
+    python manage.py benchmark_distancias
+    python manage.py benchmark_distancias --tamanos 10000 100000 --repeticiones 5
+
+Genera nodos aleatorios alrededor de la Universidad de Concepción y mide:
+- Búsqueda del nodo más cercano con el bucle escalar (haversine_distance)
+- Búsqueda del nodo más cercano vectorizada (encontrar_nodo_mas_cercano)
+- Matriz de distancias de 100 puntos contra todos los nodos
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from maps.constants import UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+from maps.utilities import haversine_distance, encontrar_nodo_mas_cercano, matriz_distancias
+
+
+def _nodo_mas_cercano_escalar(lat, lon, nodos):
+    """Implementación original en Python puro, usada como referencia."""
+    nodo_cercano = None
+    min_dist = float('inf')
+    for nodo in nodos:
+        dist = haversine_distance(lat, lon, nodo['lat'], nodo['lon'])
+        if dist < min_dist:
+            min_dist = dist
+            nodo_cercano = nodo
+    return nodo_cercano
+
+
+def _medir(funcion, repeticiones):
+    """Retorna el mejor tiempo (en segundos) de varias ejecuciones."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+class Command(BaseCommand):
+    help = 'Compara el cálculo de distancias haversine escalar contra la versión vectorizada con NumPy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[10000, 100000],
+                            help='Cantidades de nodos a probar')
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help='Ejecuciones por medición (se reporta la mejor)')
+
+    def handle(self, *args, **options):
+        lat, lon = UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+        aleatorio = random.Random(42)
+        repeticiones = options['repeticiones']
+
+        for tamano in options['tamanos']:
+            nodos = [
+                {'id': i, 'lat': lat + aleatorio.uniform(-0.05, 0.05), 'lon': lon + aleatorio.uniform(-0.05, 0.05)}
+                for i in range(tamano)
+            ]
+
+            escalar = _medir(lambda: _nodo_mas_cercano_escalar(lat, lon, nodos), repeticiones)
+            vectorizado = _medir(lambda: encontrar_nodo_mas_cercano(lat, lon, nodos), repeticiones)
+
+            if _nodo_mas_cercano_escalar(lat, lon, nodos) is not encontrar_nodo_mas_cercano(lat, lon, nodos):
+                self.stderr.write(self.style.ERROR(f'Resultados distintos con {tamano} nodos'))
+
+            puntos = [(nodo['lat'], nodo['lon']) for nodo in nodos]
+            matriz = _medir(lambda: matriz_distancias(puntos[:100], puntos), 1)
+
+            self.stdout.write(self.style.SUCCESS(f'{tamano} nodos:'))
+            self.stdout.write(f'  Nodo más cercano (escalar):     {escalar * 1000:9.2f} ms')
+            self.stdout.write(f'  Nodo más cercano (vectorizado): {vectorizado * 1000:9.2f} ms '
+                              f'(x{escalar / vectorizado:.1f})')
+            self.stdout.write(f'  Matriz 100 x {tamano}:          {matriz * 1000:9.2f} ms')
@@ -0,0 +1,80 @@
+"""
+Comando Django para comparar el códec de maps/polilineas.py con la librería polyline.
+
+Uso:
+    python manage.py benchmark_polylines
+    python manage.py benchmark_polylines --puntos 10000 --repeticiones 50 --precision 6
+
+Genera una ruta sintética (caminata aleatoria alrededor de Concepción),
+verifica que ambos códecs producen el mismo resultado y reporta el tiempo
+por llamada de codificar y decodificar para rutas completas y para
+geometrías cortas como las de cada paso de una ruta.
+"""
+
+import time
+
+import numpy as np
+import polyline
+from django.core.management.base import BaseCommand, CommandError
+
+from maps import polilineas
+from maps.constants import UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+
+
+def _medir(funcion, argumento, repeticiones: int) -> float:
+    """Retorna la mediana en milisegundos de `repeticiones` llamadas."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos)) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compara el códec de polylines propio con la librería polyline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--puntos', type=int, default=10000,
+                            help='Puntos de la ruta completa')
+        parser.add_argument('--puntos-paso', type=int, default=8,
+                            help='Puntos de la geometría de un paso')
+        parser.add_argument('--repeticiones', type=int, default=30,
+                            help='Llamadas medidas por caso (se reporta la mediana)')
+        parser.add_argument('--precision', type=int, default=5, choices=(5, 6))
+
+    def handle(self, *args, **options):
+        precision = options['precision']
+        aleatorio = np.random.default_rng(42)
+
+        casos = []
+        for nombre, puntos in (('ruta', options['puntos']), ('paso', options['puntos_paso'])):
+            pasos = aleatorio.normal(0, 0.0003, size=(puntos, 2))
+            coordenadas = np.round(np.asarray(UNIVERSIDAD_CONCEPCION_COORDS_TUPLE) + np.cumsum(pasos, axis=0), precision)
+            tuplas = [tuple(punto) for punto in coordenadas.tolist()]
+            codificado = polyline.encode(tuplas, precision)
+
+            if polilineas.codificar(coordenadas, precision) != codificado:
+                raise CommandError(f'La codificación de "{nombre}" difiere de la librería polyline')
+            if polilineas.decodificar_lista(codificado, precision) != [list(t) for t in polyline.decode(codificado, precision)]:
+                raise CommandError(f'La decodificación de "{nombre}" difiere de la librería polyline')
+            casos.append((nombre, puntos, tuplas, coordenadas, codificado))
+
+        repeticiones = options['repeticiones']
+        self.stdout.write(f'Precisión {precision}, mediana de {repeticiones} llamadas (ms)')
+        self.stdout.write(f'{"caso":<6} {"puntos":>7} {"operación":<11} {"polyline":>10} {"polilineas":>11} {"mejora":>7}')
+
+        for nombre, puntos, tuplas, coordenadas, codificado in casos:
+            filas = (
+                ('decodificar',
+                 _medir(lambda c: polyline.decode(c, precision), codificado, repeticiones),
+                 _medir(lambda c: polilineas.decodificar(c, precision), codificado, repeticiones)),
+                ('codificar',
+                 _medir(lambda c: polyline.encode(c, precision), tuplas, repeticiones),
+                 _medir(lambda c: polilineas.codificar(c, precision), coordenadas, repeticiones)),
+            )
+            for operacion, referencia, propio in filas:
+                self.stdout.write(
+                    f'{nombre:<6} {puntos:>7} {operacion:<11} {referencia:>10.3f} {propio:>11.3f} '
+                    f'{referencia / propio:>6.1f}x'
+                )
@@ -0,0 +1,79 @@
+"""
+Comando Django para comparar los backends de ruteo sobre los mismos pares de puntos.
+
+Uso:
+    python manage.py comparar_backends_ruteo
+    python manage.py comparar_backends_ruteo --backends local linea_recta --pares 50
+
+Genera pares de puntos aleatorios alrededor de la Universidad de Concepción y
+reporta, para cada backend, la latencia promedio y máxima, las rutas
+encontradas y la diferencia de distancia respecto del primer backend listado.
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maps.constants import UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+from maps.ruteo import BACKENDS_RUTEO, obtener_backend_ruteo
+
+
+class Command(BaseCommand):
+    help = 'Compara latencia y distancia de los backends de ruteo disponibles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', default=list(BACKENDS_RUTEO),
+                            help='Backends a comparar (el primero se usa como referencia)')
+        parser.add_argument('--pares', type=int, default=20,
+                            help='Cantidad de pares origen/destino a probar')
+        parser.add_argument('--radio', type=float, default=0.03,
+                            help='Dispersión de los puntos en grados alrededor de la universidad')
+
+    def handle(self, *args, **options):
+        lat, lon = UNIVERSIDAD_CONCEPCION_COORDS_TUPLE
+        aleatorio = random.Random(42)
+        radio = options['radio']
+
+        def punto():
+            return {'lat': lat + aleatorio.uniform(-radio, radio), 'lon': lon + aleatorio.uniform(-radio, radio)}
+
+        pares = [[punto(), punto()] for _ in range(options['pares'])]
+
+        try:
+            backends = [obtener_backend_ruteo(nombre) for nombre in options['backends']]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        distancias_referencia = None
+        for backend in backends:
+            tiempos = []
+            distancias = []
+            for nodos in pares:
+                inicio = time.perf_counter()
+                try:
+                    resultado = backend.calcular(nodos)
+                except Exception as e:
+                    self.stderr.write(f'  {backend.nombre}: error {e}')
+                    resultado = None
+                tiempos.append(time.perf_counter() - inicio)
+                distancias.append(resultado['distancia_km'] if resultado else None)
+
+            encontradas = sum(1 for distancia in distancias if distancia is not None)
+            self.stdout.write(self.style.SUCCESS(f'{backend.nombre}:'))
+            self.stdout.write(f'  Rutas encontradas: {encontradas}/{len(pares)}')
+            self.stdout.write(f'  Latencia promedio: {sum(tiempos) / len(tiempos) * 1000:9.2f} ms')
+            self.stdout.write(f'  Latencia máxima:   {max(tiempos) * 1000:9.2f} ms')
+
+            if distancias_referencia is None:
+                distancias_referencia = distancias
+                continue
+
+            diferencias = [
+                abs(distancia - referencia) / referencia
+                for distancia, referencia in zip(distancias, distancias_referencia)
+                if distancia is not None and referencia
+            ]
+            if diferencias:
+                self.stdout.write(f'  Diferencia de distancia vs {backends[0].nombre}: '
+                                  f'{sum(diferencias) / len(diferencias) * 100:.1f} % promedio')
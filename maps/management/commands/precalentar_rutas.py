@@ -0,0 +1,129 @@
+"""
+Comando Django para precalentar las cachés de geocodificación y rutas.
+
+Uso:
+    python manage.py precalentar_rutas
+    python manage.py precalentar_rutas --hilos 4 --limite 500
+    python manage.py precalentar_rutas --dias 1 --simular
+
+Busca los paquetes en bodega o en ruta sin Ruta calculada o con una ruta
+más antigua que MAPA_CONFIG["antiguedad_maxima_rutas"], geocodifica sus
+direcciones y calcula y guarda sus rutas en paralelo. Cada ruta se calcula
+reservando el trabajo del paquete en la cola (maps/cola_rutas.py), de modo
+que si la dirección cambia durante la ejecución no se guarda la ruta de la
+dirección anterior y el worker no la vuelve a calcular. Conviene ejecutarlo
+después de una carga masiva de paquetes o antes del turno de la mañana,
+para que ni despachadores ni conductores esperen una ruta en frío.
+
+La concurrencia se limita con --hilos y, por servicio, con los límites de
+conexiones y de tasa de MAPA_CONFIG que ya aplica el cliente compartido.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import EstadoPaquete, Paquete
+from maps.cache import cache_geocodificacion, cache_rutas_osrm, normalizar_direccion
+from maps.clientes import cliente_mapas
+from maps.cola_rutas import procesar_trabajo, reservar_trabajo_paquete
+from maps.constants import MAPA_CONFIG
+from maps.models import TrabajoRuta
+from maps.utilities import _en_hilo, obtener_coordenadas
+
+
+class Command(BaseCommand):
+    help = 'Geocodifica y calcula por adelantado las rutas de los paquetes pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=float, default=MAPA_CONFIG["antiguedad_maxima_rutas"] / 86400,
+                            help='Antigüedad en días a partir de la cual una ruta se recalcula')
+        parser.add_argument('--hilos', type=int, default=MAPA_CONFIG["hilos_precalentamiento"],
+                            help='Paquetes procesados en paralelo')
+        parser.add_argument('--limite', type=int, default=None,
+                            help='Cantidad máxima de paquetes a procesar')
+        parser.add_argument('--simular', action='store_true',
+                            help='Solo informa cuántos paquetes se procesarían')
+
+    def handle(self, *args, **options):
+        vencimiento = timezone.now() - timedelta(days=options['dias'])
+        paquetes = list(
+            Paquete.objects
+            .filter(estado__in=(EstadoPaquete.EN_BODEGA, EstadoPaquete.EN_RUTA))
+            .filter(Q(ruta__isnull=True) | Q(ruta__fecha_calculo__lt=vencimiento))
+            .order_by('id')[:options['limite']]
+        )
+        self.stdout.write(f'{len(paquetes)} paquetes sin ruta o con ruta anterior a {vencimiento:%Y-%m-%d %H:%M}')
+        if options['simular'] or not paquetes:
+            return
+
+        cliente_mapas.latencias.reiniciar()
+        cache_geocodificacion.estadisticas.reiniciar()
+        cache_rutas_osrm.estadisticas.reiniciar()
+
+        with ThreadPoolExecutor(max_workers=options['hilos'], thread_name_prefix='precalentar') as pool:
+            # 1) Geocodificar cada dirección distinta una sola vez
+            direcciones = {}
+            for paquete in paquetes:
+                direcciones.setdefault(normalizar_direccion(paquete.direccion_envio_texto), paquete.direccion_envio_texto)
+
+            inicio = time.perf_counter()
+            resultados = list(pool.map(_en_hilo(_geocodificar), direcciones.values()))
+            tiempo_geocodificacion = time.perf_counter() - inicio
+            fallos_geocodificacion = [(direccion, error) for direccion, error in zip(direcciones.values(), resultados) if error]
+
+            # 2) Calcular y guardar las rutas (las direcciones ya están en caché)
+            inicio = time.perf_counter()
+            resultados = list(pool.map(_en_hilo(_calcular_ruta), paquetes))
+            tiempo_rutas = time.perf_counter() - inicio
+            fallos_rutas = [(paquete, error) for paquete, error in zip(paquetes, resultados) if error]
+
+        self._reportar('Geocodificación', len(direcciones), fallos_geocodificacion, tiempo_geocodificacion)
+        self._reportar('Rutas', len(paquetes), fallos_rutas, tiempo_rutas)
+
+        for direccion, error in fallos_geocodificacion[:10]:
+            self.stderr.write(f'  Dirección "{direccion}": {error}')
+        for paquete, error in fallos_rutas[:10]:
+            self.stderr.write(f'  Paquete #{paquete.id}: {error}')
+
+        self.stdout.write(f'Caché de geocodificación: {cache_geocodificacion.estadisticas.como_dict()}')
+        self.stdout.write(f'Caché de rutas OSRM: {cache_rutas_osrm.estadisticas.como_dict()}')
+        for endpoint, datos in cliente_mapas.latencias.como_dict().items():
+            self.stdout.write(
+                f'  {endpoint:<12} {datos["llamadas"]:6d} llamadas, {datos["errores"]:4d} errores, '
+                f'p50 {datos["p50_ms"]:8.1f} ms, p95 {datos["p95_ms"]:8.1f} ms'
+            )
+
+    def _reportar(self, nombre, total, fallos, segundos):
+        exitos = total - len(fallos)
+        tasa = total / segundos if segundos > 0 else 0.0
+        estilo = self.style.WARNING if fallos else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f'{nombre}: {exitos}/{total} correctas, {len(fallos)} fallidas '
+            f'en {segundos:.1f} s ({tasa:.1f}/s)'
+        ))
+
+
+def _geocodificar(direccion):
+    """Retorna None si la dirección quedó en caché, o el mensaje de error."""
+    try:
+        if obtener_coordenadas(direccion) is None:
+            return 'dirección no encontrada'
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return None
+
+
+def _calcular_ruta(paquete):
+    """Retorna None si la ruta se calculó y guardó, o el mensaje de error."""
+    trabajo = reservar_trabajo_paquete(paquete)
+    if trabajo is None:
+        return 'otro worker está calculando la ruta'
+    if procesar_trabajo(trabajo):
+        return None
+    error = TrabajoRuta.objects.filter(id=trabajo.id).values_list('ultimo_error', flat=True).first()
+    return error or 'ruta no calculada'
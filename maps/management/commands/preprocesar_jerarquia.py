@@ -0,0 +1,95 @@
+"""
+Comando Django para preprocesar el grafo vial en una jerarquía de contracción.
+
+Uso:
+    python manage.py preprocesar_jerarquia
+    python manage.py preprocesar_jerarquia --osm biobio.osm.pbf --salida biobio.ch
+    python manage.py preprocesar_jerarquia --consultas 2000 --verificar 50
+
+Construye el grafo desde el extracto OSM, contrae sus nodos y guarda el
+resultado en un archivo que el backend de ruteo "ch" abre con np.memmap.
+Reporta el tiempo de preprocesamiento, el tamaño del archivo y los
+percentiles de latencia de consultas entre pares de nodos aleatorios.
+"""
+
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from maps.constants import MAPA_CONFIG
+from maps.grafo_vial import GrafoVial
+from maps.jerarquia import JerarquiaContraccion, construir_jerarquia
+
+
+class Command(BaseCommand):
+    help = 'Preprocesa el grafo vial del extracto OSM en una jerarquía de contracción'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--osm', default=MAPA_CONFIG["archivo_osm"],
+                            help='Extracto OSM de entrada (por defecto MAPA_CONFIG["archivo_osm"])')
+        parser.add_argument('--salida', default=MAPA_CONFIG["archivo_jerarquia"],
+                            help='Archivo de salida (por defecto MAPA_CONFIG["archivo_jerarquia"])')
+        parser.add_argument('--max-asentados', type=int, default=500,
+                            help='Nodos máximos por búsqueda de testigos al contraer')
+        parser.add_argument('--consultas', type=int, default=1000,
+                            help='Consultas aleatorias para medir la latencia')
+        parser.add_argument('--verificar', type=int, default=20,
+                            help='Consultas a comparar contra A* sobre el grafo original')
+
+    def handle(self, *args, **options):
+        if not options['osm']:
+            raise CommandError('Indique el extracto con --osm o la variable MAPA_ARCHIVO_OSM')
+        if not options['salida']:
+            raise CommandError('Indique el archivo de salida con --salida o la variable MAPA_ARCHIVO_JERARQUIA')
+
+        inicio = time.perf_counter()
+        grafo = GrafoVial.desde_extracto_osm(options['osm'])
+        tiempo_grafo = time.perf_counter() - inicio
+        self.stdout.write(f'Grafo: {grafo.total_nodos} nodos, {grafo.total_aristas} aristas '
+                          f'({tiempo_grafo:.1f} s)')
+
+        inicio = time.perf_counter()
+        jerarquia = construir_jerarquia(grafo, max_asentados=options['max_asentados'])
+        tiempo_contraccion = time.perf_counter() - inicio
+
+        tamano = jerarquia.guardar(options['salida'])
+        jerarquia = JerarquiaContraccion.cargar(options['salida'])
+
+        self.stdout.write(self.style.SUCCESS(f'Jerarquía guardada en {options["salida"]}'))
+        self.stdout.write(f'  Preprocesamiento: {tiempo_contraccion:9.1f} s')
+        self.stdout.write(f'  Aristas (con atajos): {jerarquia.total_aristas}')
+        self.stdout.write(f'  Tamaño del archivo: {tamano / 1024 / 1024:9.2f} MB')
+
+        if grafo.total_nodos < 2:
+            return
+
+        aleatorio = random.Random(42)
+        pares = [(aleatorio.randrange(grafo.total_nodos), aleatorio.randrange(grafo.total_nodos))
+                 for _ in range(options['consultas'])]
+
+        latencias = []
+        for origen, destino in pares:
+            inicio = time.perf_counter()
+            jerarquia.ruta_mas_corta(origen, destino)
+            latencias.append(time.perf_counter() - inicio)
+
+        if latencias:
+            p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+            self.stdout.write(f'  Latencia de consulta ({len(latencias)} pares): '
+                              f'p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms')
+
+        diferencias = 0
+        for origen, destino in pares[:options['verificar']]:
+            esperada = grafo.ruta_mas_corta(origen, destino)
+            obtenida = jerarquia.ruta_mas_corta(origen, destino)
+            if (esperada is None) != (obtenida is None):
+                diferencias += 1
+            elif esperada is not None and abs(sum(a[1] for a in esperada) - sum(a[1] for a in obtenida)) > 1e-6:
+                diferencias += 1
+
+        if diferencias:
+            self.stderr.write(self.style.ERROR(f'  {diferencias} rutas difieren del A* sobre el grafo original'))
+        elif options['verificar']:
+            self.stdout.write(f'  Verificación contra A*: {min(options["verificar"], len(pares))} rutas idénticas')
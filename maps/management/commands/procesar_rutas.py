@@ -0,0 +1,63 @@
+"""
+Worker que calcula en segundo plano las rutas encoladas de los paquetes.
+
+Uso:
+    python manage.py procesar_rutas
+    python manage.py procesar_rutas --una-vez
+    python manage.py procesar_rutas --max-trabajos 100
+
+Toma los trabajos de la tabla TrabajoRuta por prioridad (ver
+maps/cola_rutas.py). Se pueden ejecutar varios workers en paralelo.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from maps.cola_rutas import procesar_trabajo, tomar_siguiente_trabajo
+from maps.constants import MAPA_CONFIG
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de cálculo de rutas de paquetes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa los trabajos disponibles y termina')
+        parser.add_argument('--max-trabajos', type=int, default=None,
+                            help='Termina después de procesar esta cantidad de trabajos')
+        parser.add_argument('--intervalo', type=float, default=MAPA_CONFIG["intervalo_cola_rutas"],
+                            help='Segundos de espera cuando la cola está vacía')
+
+    def handle(self, *args, **options):
+        procesados = 0
+
+        while options['max_trabajos'] is None or procesados < options['max_trabajos']:
+            close_old_connections()
+            trabajo = tomar_siguiente_trabajo()
+
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            inicio = time.perf_counter()
+            try:
+                calculada = procesar_trabajo(trabajo)
+            except Exception as e:
+                # La reserva vence y otro intento retomará el trabajo
+                self.stderr.write(self.style.ERROR(f'Paquete #{trabajo.paquete_id}: error inesperado {e}'))
+                calculada = False
+            procesados += 1
+
+            duracion = time.perf_counter() - inicio
+            if calculada:
+                self.stdout.write(f'Paquete #{trabajo.paquete_id}: ruta calculada en {duracion:.1f} s')
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'Paquete #{trabajo.paquete_id}: intento {trabajo.intentos} fallido ({duracion:.1f} s)'
+                ))
+
+        self.stdout.write(self.style.SUCCESS(f'{procesados} trabajos procesados'))
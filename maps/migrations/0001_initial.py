@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodificacionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direccion_normalizada', models.CharField(help_text='Dirección normalizada usada como clave de la caché', max_length=500, unique=True)),
+                ('direccion_original', models.CharField(help_text='Dirección tal como fue consultada la primera vez', max_length=500)),
+                ('latitud', models.FloatField(blank=True, help_text='Latitud obtenida (nula si la dirección no se encontró)', null=True)),
+                ('longitud', models.FloatField(blank=True, help_text='Longitud obtenida (nula si la dirección no se encontró)', null=True)),
+                ('encontrada', models.BooleanField(default=True, help_text='Indica si Nominatim encontró la dirección')),
+                ('fecha_consulta', models.DateTimeField(auto_now=True, help_text='Fecha y hora de la última consulta a Nominatim')),
+            ],
+            options={
+                'verbose_name': 'Geocodificación en caché',
+                'verbose_name_plural': 'Geocodificaciones en caché',
+            },
+        ),
+    ]
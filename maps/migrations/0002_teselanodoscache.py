@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeselaNodosCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('geohash', models.CharField(help_text='Geohash de la tesela', max_length=12, unique=True)),
+                ('nodos', models.JSONField(help_text='Nodos viales de la tesela como lista de [id, lat, lon]')),
+                ('fecha_consulta', models.DateTimeField(auto_now_add=True, help_text='Fecha y hora en que se descargó la tesela desde Overpass')),
+                ('ultimo_acceso', models.DateTimeField(auto_now=True, db_index=True, help_text='Fecha y hora del último uso (para desalojo LRU)')),
+            ],
+            options={
+                'verbose_name': 'Tesela de nodos en caché',
+                'verbose_name_plural': 'Teselas de nodos en caché',
+            },
+        ),
+    ]
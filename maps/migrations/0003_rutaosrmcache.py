@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0002_teselanodoscache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RutaOSRMCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='Hash SHA-256 del perfil y las coordenadas redondeadas', max_length=64, unique=True)),
+                ('perfil', models.CharField(help_text='Perfil de ruteo de OSRM (driving, walking, ...)', max_length=20)),
+                ('coordenadas', models.TextField(help_text='Coordenadas redondeadas de la ruta en formato lon,lat;lon,lat')),
+                ('resultado', models.JSONField(help_text='Resultado procesado de la ruta (distancia, duración, pasos y geometría)')),
+                ('fecha_calculo', models.DateTimeField(auto_now=True, db_index=True, help_text='Fecha y hora en que se consultó OSRM')),
+            ],
+            options={
+                'verbose_name': 'Ruta OSRM en caché',
+                'verbose_name_plural': 'Rutas OSRM en caché',
+            },
+        ),
+    ]
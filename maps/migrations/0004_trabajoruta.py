@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('maps', '0003_rutaosrmcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoRuta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', help_text='Estado actual del trabajo', max_length=12)),
+                ('prioridad', models.SmallIntegerField(default=0, help_text='Los trabajos de mayor prioridad se procesan primero')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, help_text='Intentos realizados para la versión actual')),
+                ('version', models.PositiveIntegerField(default=0, help_text='Se incrementa cada vez que el paquete se vuelve a encolar')),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now, help_text='Momento a partir del cual el trabajo puede tomarse (espera entre reintentos)')),
+                ('bloqueado_hasta', models.DateTimeField(blank=True, help_text='Fin de la reserva del worker que lo procesa; vencida, otro worker puede retomarlo', null=True)),
+                ('ultimo_error', models.TextField(blank=True, default='', help_text='Mensaje del último intento fallido')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, help_text='Fecha y hora en que se encoló el paquete por primera vez')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, help_text='Fecha y hora del último cambio del trabajo')),
+                ('paquete', models.OneToOneField(help_text='Paquete cuya ruta se debe calcular', on_delete=django.db.models.deletion.CASCADE, related_name='trabajo_ruta', to='api.paquete')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de cálculo de ruta',
+                'verbose_name_plural': 'Trabajos de cálculo de ruta',
+                'indexes': [models.Index(fields=['estado', '-prioridad', 'disponible_desde'], name='trabajo_ruta_cola_idx')],
+            },
+        ),
+    ]
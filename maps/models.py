@@ -1,3 +1,210 @@
+"""
+Modelos de la aplicación de mapas.
+
+Contiene las tablas de caché persistente que evitan repetir consultas a los
+servicios externos de mapas (Nominatim, Overpass y OSRM) y la cola de
+trabajos de cálculo de rutas que procesa `manage.py procesar_rutas`.
+"""
+
 from django.db import models
+from django.utils import timezone
+
+
+class GeocodificacionCache(models.Model):
+    """
+    Resultado cacheado de una geocodificación con Nominatim.
+
+    La clave es la dirección normalizada (sin mayúsculas, tildes ni espacios
+    repetidos), de modo que "Concepción" y "concepcion" comparten la misma fila.
+    También se guardan los resultados negativos (dirección no encontrada) para
+    no volver a consultar direcciones inválidas hasta que expire su TTL.
+    """
+    direccion_normalizada = models.CharField(
+        max_length=500,
+        unique=True,
+        help_text="Dirección normalizada usada como clave de la caché"
+    )
+    direccion_original = models.CharField(
+        max_length=500,
+        help_text="Dirección tal como fue consultada la primera vez"
+    )
+    latitud = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Latitud obtenida (nula si la dirección no se encontró)"
+    )
+    longitud = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Longitud obtenida (nula si la dirección no se encontró)"
+    )
+    encontrada = models.BooleanField(
+        default=True,
+        help_text="Indica si Nominatim encontró la dirección"
+    )
+    fecha_consulta = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha y hora de la última consulta a Nominatim"
+    )
+
+    def __str__(self):
+        if self.encontrada:
+            return f"{self.direccion_normalizada} → ({self.latitud}, {self.longitud})"
+        return f"{self.direccion_normalizada} → no encontrada"
+
+    @property
+    def coordenadas(self):
+        """Retorna la tupla (latitud, longitud) o None si no se encontró."""
+        if not self.encontrada:
+            return None
+        return (self.latitud, self.longitud)
+
+    class Meta:
+        verbose_name = "Geocodificación en caché"
+        verbose_name_plural = "Geocodificaciones en caché"
+
+
+class TeselaNodosCache(models.Model):
+    """
+    Nodos viales de una tesela geohash obtenidos desde Overpass.
+
+    Cada tesela se descarga una sola vez con una consulta combinada
+    way→node; los puntos posteriores dentro de la misma tesela se
+    resuelven sin acceder a la red.
+    """
+    geohash = models.CharField(
+        max_length=12,
+        unique=True,
+        help_text="Geohash de la tesela"
+    )
+    nodos = models.JSONField(
+        help_text="Nodos viales de la tesela como lista de [id, lat, lon]"
+    )
+    fecha_consulta = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Fecha y hora en que se descargó la tesela desde Overpass"
+    )
+    ultimo_acceso = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        help_text="Fecha y hora del último uso (para desalojo LRU)"
+    )
+
+    def __str__(self):
+        return f"Tesela {self.geohash} ({len(self.nodos)} nodos)"
+
+    class Meta:
+        verbose_name = "Tesela de nodos en caché"
+        verbose_name_plural = "Teselas de nodos en caché"
+
+
+class RutaOSRMCache(models.Model):
+    """
+    Respuesta procesada de OSRM para una lista de coordenadas ya ajustadas.
+
+    La clave es un hash del perfil de ruteo y de las coordenadas redondeadas,
+    por lo que rutas idénticas (por ejemplo, siempre desde la Universidad)
+    se reutilizan sin volver a consultar OSRM.
+    """
+    clave = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="Hash SHA-256 del perfil y las coordenadas redondeadas"
+    )
+    perfil = models.CharField(
+        max_length=20,
+        help_text="Perfil de ruteo de OSRM (driving, walking, ...)"
+    )
+    coordenadas = models.TextField(
+        help_text="Coordenadas redondeadas de la ruta en formato lon,lat;lon,lat"
+    )
+    resultado = models.JSONField(
+        help_text="Resultado procesado de la ruta (distancia, duración, pasos y geometría)"
+    )
+    fecha_calculo = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        help_text="Fecha y hora en que se consultó OSRM"
+    )
+
+    def __str__(self):
+        return f"Ruta {self.perfil}: {self.coordenadas[:60]}"
+
+    class Meta:
+        verbose_name = "Ruta OSRM en caché"
+        verbose_name_plural = "Rutas OSRM en caché"
+
+
+class EstadoTrabajoRuta(models.TextChoices):
+    """Estados de un trabajo de cálculo de ruta."""
+    PENDIENTE = 'pendiente', 'Pendiente'
+    PROCESANDO = 'procesando', 'Procesando'
+    COMPLETADO = 'completado', 'Completado'
+    FALLIDO = 'fallido', 'Fallido'
+
+
+class TrabajoRuta(models.Model):
+    """
+    Trabajo pendiente de cálculo de la ruta de un paquete.
+
+    Hay a lo sumo un trabajo por paquete: volver a encolar un paquete
+    reutiliza su fila e incrementa `version`, de modo que un worker que
+    estaba calculando la dirección anterior no marca el trabajo como
+    completado. Los workers toman los trabajos por prioridad y antigüedad.
+    """
+    paquete = models.OneToOneField(
+        'api.Paquete',
+        on_delete=models.CASCADE,
+        related_name='trabajo_ruta',
+        help_text="Paquete cuya ruta se debe calcular"
+    )
+    estado = models.CharField(
+        max_length=12,
+        choices=EstadoTrabajoRuta.choices,
+        default=EstadoTrabajoRuta.PENDIENTE,
+        help_text="Estado actual del trabajo"
+    )
+    prioridad = models.SmallIntegerField(
+        default=0,
+        help_text="Los trabajos de mayor prioridad se procesan primero"
+    )
+    intentos = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Intentos realizados para la versión actual"
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        help_text="Se incrementa cada vez que el paquete se vuelve a encolar"
+    )
+    disponible_desde = models.DateTimeField(
+        default=timezone.now,
+        help_text="Momento a partir del cual el trabajo puede tomarse (espera entre reintentos)"
+    )
+    bloqueado_hasta = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Fin de la reserva del worker que lo procesa; vencida, otro worker puede retomarlo"
+    )
+    ultimo_error = models.TextField(
+        blank=True,
+        default='',
+        help_text="Mensaje del último intento fallido"
+    )
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Fecha y hora en que se encoló el paquete por primera vez"
+    )
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha y hora del último cambio del trabajo"
+    )
+
+    def __str__(self):
+        return f"Ruta del paquete #{self.paquete_id} ({self.get_estado_display()})"
 
-# Create your models here.
+    class Meta:
+        verbose_name = "Trabajo de cálculo de ruta"
+        verbose_name_plural = "Trabajos de cálculo de ruta"
+        indexes = [
+            models.Index(fields=['estado', '-prioridad', 'disponible_desde'], name='trabajo_ruta_cola_idx'),
+        ]
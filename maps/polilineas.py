@@ -0,0 +1,381 @@
+"""
+Codificación y decodificación de polylines (Encoded Polyline Algorithm de Google).
+
+Las rutas completas se procesan vectorizadas con NumPy: la cadena se
+decodifica en bloque a un arreglo (N, 2) de float64, sin crear una tupla
+por punto ni recorrer la cadena carácter a carácter en Python. Las
+geometrías cortas (por ejemplo, las de cada paso de una ruta), donde el
+costo fijo de NumPy domina, se recorren en Python escribiendo directamente
+en un array('d'). Soporta precisión 5 (Google, OSRM) y 6 (OpenStreetMap,
+Valhalla).
+
+    decodificar(cadena)        -> np.ndarray (N, 2) de (lat, lng)
+    decodificar_lista(cadena)  -> [[lat, lng], ...] (para JSON / Leaflet)
+    codificar(coordenadas)     -> str
+    simplificar(coordenadas, tolerancia_metros) -> np.ndarray (Douglas-Peucker)
+    niveles_simplificados(cadena, niveles)      -> {zoom: cadena simplificada}
+    cuantizar(cadena, precision_destino)        -> cadena con menos decimales
+    primer_punto(cadena)                        -> (lat, lng) sin decodificar el resto
+
+El resultado coincide con la librería `polyline` (ver el comando
+benchmark_polylines).
+"""
+
+import logging
+import math
+from array import array
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Radio medio de la Tierra, para proyectar a metros en `simplificar`
+_RADIO_TIERRA_METROS = 6371000
+
+# Un valor de coordenada ocupa como máximo 7 grupos de 5 bits con precisión 6;
+# más grupos indican una cadena corrupta (y desbordarían int64)
+_MAX_GRUPOS = 12
+
+# Tamaños bajo los cuales el recorrido en Python es más rápido que NumPy
+_CARACTERES_CORTO = 128
+_PUNTOS_CORTO = 64
+
+
+def decodificar(codificado: str, precision: int = 5) -> np.ndarray:
+    """
+    Decodifica un polyline a un arreglo de coordenadas.
+
+    Args:
+        codificado: Cadena polyline
+        precision: Decimales con que se codificaron las coordenadas (5 o 6)
+
+    Returns:
+        np.ndarray: Arreglo (N, 2) de float64 con pares (lat, lng)
+
+    Raises:
+        ValueError: Si la cadena no es un polyline válido
+    """
+    if not codificado:
+        return np.empty((0, 2), dtype=np.float64)
+    if len(codificado) < _CARACTERES_CORTO:
+        return _decodificar_corto(codificado, float(10 ** precision))
+
+    try:
+        datos = np.frombuffer(codificado.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    except UnicodeEncodeError:
+        raise ValueError("El polyline contiene caracteres no ASCII")
+    if datos.min() < 0 or datos.max() > 0x3f:
+        raise ValueError("El polyline contiene caracteres fuera de rango")
+
+    # Cada valor termina en el primer byte sin el bit de continuación (0x20)
+    fin_valor = datos < 0x20
+    if not fin_valor[-1]:
+        raise ValueError("El polyline termina con un valor incompleto")
+    finales = np.flatnonzero(fin_valor)
+    inicios = np.empty_like(finales)
+    inicios[0] = 0
+    inicios[1:] = finales[:-1] + 1
+    if len(finales) % 2:
+        raise ValueError("El polyline tiene una cantidad impar de valores")
+
+    # Posición de cada byte dentro de su valor (0, 1, 2, ...)
+    valor_de_byte = np.repeat(np.arange(len(finales)), finales - inicios + 1)
+    posicion = np.arange(len(datos)) - inicios[valor_de_byte]
+    if posicion.max() >= _MAX_GRUPOS:
+        raise ValueError("El polyline contiene un valor demasiado largo")
+
+    # Los grupos de 5 bits no se solapan, por lo que sumarlos equivale a unirlos
+    valores = np.add.reduceat((datos & 0x1f) << (5 * posicion), inicios)
+    deltas = np.where(valores & 1, ~(valores >> 1), valores >> 1)
+
+    coordenadas = np.cumsum(deltas.reshape(-1, 2), axis=0) / float(10 ** precision)
+    logger.debug("Polyline decodificado: %d puntos", len(coordenadas))
+    return coordenadas
+
+
+def _decodificar_corto(codificado: str, factor: float) -> np.ndarray:
+    """Decodificación escalar para cadenas cortas, sobre un array('d')."""
+    salida = array('d')
+    lat = lng = valor = desplazamiento = 0
+    es_lat = True
+
+    try:
+        datos = codificado.encode('ascii')
+    except UnicodeEncodeError:
+        raise ValueError("El polyline contiene caracteres no ASCII")
+
+    for byte in datos:
+        byte -= 63
+        if byte < 0 or byte > 0x3f:
+            raise ValueError("El polyline contiene caracteres fuera de rango")
+        valor |= (byte & 0x1f) << desplazamiento
+        if byte >= 0x20:
+            desplazamiento += 5
+            continue
+
+        delta = ~(valor >> 1) if valor & 1 else valor >> 1
+        if es_lat:
+            lat += delta
+        else:
+            lng += delta
+            salida.append(lat / factor)
+            salida.append(lng / factor)
+        es_lat = not es_lat
+        valor = desplazamiento = 0
+
+    if desplazamiento:
+        raise ValueError("El polyline termina con un valor incompleto")
+    if not es_lat:
+        raise ValueError("El polyline tiene una cantidad impar de valores")
+    return np.frombuffer(salida, dtype=np.float64).reshape(-1, 2)
+
+
+def decodificar_lista(codificado: str, precision: int = 5) -> list:
+    """Igual que `decodificar`, retornando una lista de pares [lat, lng]."""
+    return decodificar(codificado, precision).tolist()
+
+
+def codificar(coordenadas, precision: int = 5) -> str:
+    """
+    Codifica coordenadas como polyline.
+
+    Args:
+        coordenadas: Secuencia de pares (lat, lng) o arreglo (N, 2)
+        precision: Decimales a conservar (5 o 6)
+
+    Returns:
+        str: Cadena polyline
+    """
+    if len(coordenadas) < _PUNTOS_CORTO:
+        if isinstance(coordenadas, np.ndarray):
+            coordenadas = coordenadas.tolist()
+        return _codificar_corto(coordenadas, 10 ** precision)
+
+    puntos = np.asarray(coordenadas, dtype=np.float64).reshape(-1, 2)
+
+    # Redondeo "half away from zero", igual al algoritmo original
+    escalados = puntos * 10 ** precision
+    enteros = (np.sign(escalados) * np.floor(np.abs(escalados) + 0.5)).astype(np.int64)
+
+    deltas = np.diff(enteros, axis=0, prepend=0).ravel()
+    valores = deltas << 1
+    valores = np.where(deltas < 0, ~valores, valores)
+
+    # Grupos de 5 bits de cada valor, del menos al más significativo
+    grupos = np.empty((len(valores), _MAX_GRUPOS), dtype=np.int64)
+    cantidad = np.ones(len(valores), dtype=np.int64)
+    resto = valores
+    for indice in range(_MAX_GRUPOS):
+        grupos[:, indice] = resto & 0x1f
+        resto = resto >> 5
+        cantidad += resto > 0
+        if not resto.any():
+            grupos = grupos[:, :indice + 1]
+            break
+
+    # Bit de continuación en todos los grupos salvo el último de cada valor
+    columnas = np.arange(grupos.shape[1])
+    grupos |= np.where(columnas < (cantidad - 1)[:, None], 0x20, 0)
+    caracteres = (grupos + 63)[columnas < cantidad[:, None]]
+
+    return caracteres.astype(np.uint8).tobytes().decode('ascii')
+
+
+def _codificar_corto(coordenadas, factor: int) -> str:
+    """Codificación escalar para pocas coordenadas."""
+    caracteres = []
+    anterior_lat = anterior_lng = 0
+
+    for lat, lng in coordenadas:
+        # Redondeo "half away from zero", igual al algoritmo original
+        lat = int(math.copysign(math.floor(abs(lat * factor) + 0.5), lat))
+        lng = int(math.copysign(math.floor(abs(lng * factor) + 0.5), lng))
+        for delta in (lat - anterior_lat, lng - anterior_lng):
+            valor = ~(delta << 1) if delta < 0 else delta << 1
+            while valor >= 0x20:
+                caracteres.append(chr((0x20 | (valor & 0x1f)) + 63))
+                valor >>= 5
+            caracteres.append(chr(valor + 63))
+        anterior_lat, anterior_lng = lat, lng
+
+    return ''.join(caracteres)
+
+
+def simplificar(coordenadas, tolerancia_metros: float) -> np.ndarray:
+    """
+    Simplifica una línea con el algoritmo de Douglas-Peucker.
+
+    Las coordenadas se proyectan a metros (equirectangular alrededor de la
+    latitud media, suficiente a escala de ciudad) y se conservan los puntos
+    a más de `tolerancia_metros` del tramo simplificado. Los extremos se
+    conservan siempre.
+
+    Args:
+        coordenadas: Secuencia de pares (lat, lng) o arreglo (N, 2)
+        tolerancia_metros: Desviación máxima permitida
+
+    Returns:
+        np.ndarray: Arreglo (M, 2) con los puntos conservados, en orden
+    """
+    puntos = np.asarray(coordenadas, dtype=np.float64).reshape(-1, 2)
+    if len(puntos) < 3 or tolerancia_metros <= 0:
+        return puntos
+
+    radianes = np.radians(puntos)
+    xy = np.column_stack((radianes[:, 1] * math.cos(radianes[:, 0].mean()), radianes[:, 0])) * _RADIO_TIERRA_METROS
+
+    conservar = np.zeros(len(puntos), dtype=bool)
+    conservar[[0, -1]] = True
+    pendientes = [(0, len(puntos) - 1)]
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        if fin - inicio < 2:
+            continue
+
+        # Distancia de cada punto intermedio al segmento inicio-fin (no a la
+        # recta, para que los tramos de ida y vuelta no se colapsen)
+        segmento = xy[fin] - xy[inicio]
+        intermedios = xy[inicio + 1:fin] - xy[inicio]
+        largo2 = segmento @ segmento
+        if largo2 > 0:
+            t = np.clip(intermedios @ segmento / largo2, 0.0, 1.0)
+            intermedios = intermedios - t[:, None] * segmento
+        distancias = np.einsum('ij,ij->i', intermedios, intermedios)
+
+        mayor = int(distancias.argmax())
+        if distancias[mayor] > tolerancia_metros * tolerancia_metros:
+            medio = inicio + 1 + mayor
+            conservar[medio] = True
+            pendientes.append((inicio, medio))
+            pendientes.append((medio, fin))
+
+    return puntos[conservar]
+
+
+def niveles_simplificados(codificado: str, niveles: dict, precision: int = 5) -> dict:
+    """
+    Simplifica un polyline para varios niveles de zoom.
+
+    Args:
+        codificado: Polyline completo
+        niveles: {zoom máximo: tolerancia en metros}
+        precision: Decimales del polyline (5 o 6)
+
+    Returns:
+        dict: {str(zoom máximo): polyline simplificado}, omitiendo los niveles
+        que no resultan más cortos que el original
+    """
+    if not codificado:
+        return {}
+    coordenadas = decodificar(codificado, precision)
+    resultado = {}
+    for zoom_maximo, tolerancia in sorted(niveles.items()):
+        simplificado = codificar(simplificar(coordenadas, tolerancia), precision)
+        if len(simplificado) < len(codificado):
+            resultado[str(zoom_maximo)] = simplificado
+    return resultado
+
+
+def cuantizar(codificado: str, precision_destino: int, precision: int = 5) -> str:
+    """
+    Recodifica un polyline con menos decimales.
+
+    El redondeo se hace sobre los enteros del polyline ("half away from
+    zero") y los puntos consecutivos que quedan iguales se omiten. El
+    resultado se decodifica con `precision_destino`.
+
+    Args:
+        codificado: Polyline original
+        precision_destino: Decimales a conservar (menor o igual que `precision`)
+        precision: Decimales del polyline original
+
+    Returns:
+        str: Polyline cuantizado
+
+    Raises:
+        ValueError: Si la cadena no es un polyline válido
+    """
+    if not codificado or precision_destino >= precision:
+        return codificado
+    divisor = 10 ** (precision - precision_destino)
+    if len(codificado) < _CARACTERES_CORTO:
+        return _cuantizar_corto(codificado, divisor)
+
+    enteros = np.rint(decodificar(codificado, precision) * 10 ** precision).astype(np.int64)
+    cuantizados = np.sign(enteros) * ((np.abs(enteros) + divisor // 2) // divisor)
+    repetidos = np.zeros(len(cuantizados), dtype=bool)
+    repetidos[1:] = (cuantizados[1:] == cuantizados[:-1]).all(axis=1)
+    return codificar(cuantizados[~repetidos] / 10 ** precision_destino, precision_destino)
+
+
+def _cuantizar_corto(codificado: str, divisor: int) -> str:
+    """Cuantización escalar para cadenas cortas, sin pasar por coordenadas en punto flotante."""
+    caracteres = []
+    lat = lng = valor = desplazamiento = 0
+    anterior_lat = anterior_lng = None
+    es_lat = True
+    mitad = divisor // 2
+
+    for caracter in codificado:
+        byte = ord(caracter) - 63
+        if byte < 0 or byte > 0x3f:
+            raise ValueError("El polyline contiene caracteres fuera de rango")
+        valor |= (byte & 0x1f) << desplazamiento
+        if byte >= 0x20:
+            desplazamiento += 5
+            continue
+
+        delta = ~(valor >> 1) if valor & 1 else valor >> 1
+        valor = desplazamiento = 0
+        if es_lat:
+            lat += delta
+            es_lat = False
+            continue
+        lng += delta
+        es_lat = True
+
+        punto_lat = (abs(lat) + mitad) // divisor * (1 if lat >= 0 else -1)
+        punto_lng = (abs(lng) + mitad) // divisor * (1 if lng >= 0 else -1)
+        if anterior_lat is None:
+            deltas = (punto_lat, punto_lng)
+        elif punto_lat == anterior_lat and punto_lng == anterior_lng:
+            continue
+        else:
+            deltas = (punto_lat - anterior_lat, punto_lng - anterior_lng)
+        for delta in deltas:
+            salida = ~(delta << 1) if delta < 0 else delta << 1
+            while salida >= 0x20:
+                caracteres.append(chr((0x20 | (salida & 0x1f)) + 63))
+                salida >>= 5
+            caracteres.append(chr(salida + 63))
+        anterior_lat, anterior_lng = punto_lat, punto_lng
+
+    if desplazamiento:
+        raise ValueError("El polyline termina con un valor incompleto")
+    if not es_lat:
+        raise ValueError("El polyline tiene una cantidad impar de valores")
+    return ''.join(caracteres)
+
+
+def primer_punto(codificado: str, precision: int = 5):
+    """
+    Decodifica solo el primer punto de un polyline.
+
+    Returns:
+        tuple: (lat, lng), o None si la cadena está vacía o no es válida
+    """
+    valores = []
+    valor = desplazamiento = 0
+    for caracter in codificado or '':
+        byte = ord(caracter) - 63
+        if byte < 0 or byte > 0x3f:
+            return None
+        valor |= (byte & 0x1f) << desplazamiento
+        if byte >= 0x20:
+            desplazamiento += 5
+            continue
+        valores.append((~(valor >> 1) if valor & 1 else valor >> 1) / 10 ** precision)
+        if len(valores) == 2:
+            return valores[0], valores[1]
+        valor = desplazamiento = 0
+    return None
@@ -0,0 +1,321 @@
+"""
+Circuit breakers, reintentos y solicitudes de cobertura para los servicios externos.
+
+Cada servicio externo (Nominatim, Overpass, OSRM) tiene un ServicioResiliente
+que envuelve sus llamadas:
+
+- Circuit breaker: tras `umbral_fallos` fallos consecutivos el circuito se
+  abre y las llamadas fallan de inmediato con CircuitoAbierto. Pasados
+  `segundos_abierto`, se deja pasar una única llamada de prueba (semiabierto):
+  si funciona el circuito se cierra, si falla vuelve a abrirse.
+- Reintentos: los errores transitorios se reintentan con espera exponencial
+  y jitter completo, siempre dentro de un plazo total por llamada.
+- Cobertura (hedging, opcional): si una llamada no responde en
+  `retraso_cobertura` segundos se lanza una segunda en paralelo y se usa la
+  primera que termine bien.
+
+Las llamadas síncronas (requests, geopy) usan `ejecutar` y las asíncronas
+(httpx, ver maps/clientes_async.py) `ejecutar_async`; ambas comparten el
+mismo circuit breaker del servicio.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+import requests
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+
+from .constants import MAPA_CONFIG
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+# Códigos HTTP que indican un problema transitorio del servicio
+CODIGOS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+_pool_cobertura = ThreadPoolExecutor(max_workers=MAPA_CONFIG["hilos_cobertura"], thread_name_prefix='cobertura')
+
+
+class CircuitoAbierto(Exception):
+    """El circuito del servicio está abierto y la llamada no se realizó."""
+
+    def __init__(self, servicio: str):
+        super().__init__(f"Circuito abierto para el servicio '{servicio}'")
+        self.servicio = servicio
+
+
+class PlazoAgotado(Exception):
+    """Se agotó el plazo total de la llamada sin obtener respuesta."""
+
+
+def es_error_transitorio(error: Exception) -> bool:
+    """Indica si vale la pena reintentar una llamada que falló con `error`."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in CODIGOS_TRANSITORIOS
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in CODIGOS_TRANSITORIOS
+    return isinstance(error, (
+        requests.ConnectionError, requests.Timeout,
+        httpx.TransportError, asyncio.TimeoutError,
+        GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited,
+    ))
+
+
+class InterruptorCircuito:
+    """
+    Circuit breaker por servicio, seguro para hilos.
+
+    Args:
+        nombre: Nombre del servicio (para mensajes)
+        umbral_fallos: Fallos consecutivos que abren el circuito
+        segundos_abierto: Tiempo que el circuito permanece abierto antes de la prueba
+    """
+
+    def __init__(self, nombre: str, umbral_fallos: int = 5, segundos_abierto: float = 30):
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.segundos_abierto = segundos_abierto
+        self.estado = CERRADO
+        self.fallos_consecutivos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def abierto(self) -> bool:
+        """True si una llamada ahora sería rechazada (sin consumir la prueba)."""
+        with self._lock:
+            if self.estado == ABIERTO:
+                return time.monotonic() - self._abierto_desde < self.segundos_abierto
+            return self.estado == SEMIABIERTO and self._prueba_en_curso
+
+    def permitir(self) -> bool:
+        """Indica si se puede realizar una llamada; en semiabierto deja pasar solo una."""
+        with self._lock:
+            if self.estado == CERRADO:
+                return True
+            if self.estado == ABIERTO:
+                if time.monotonic() - self._abierto_desde < self.segundos_abierto:
+                    return False
+                self.estado = SEMIABIERTO
+                self._prueba_en_curso = False
+            if self._prueba_en_curso:
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def registrar_exito(self):
+        with self._lock:
+            if self.estado != CERRADO:
+                print(f"Circuito de '{self.nombre}' cerrado nuevamente.")
+            self.estado = CERRADO
+            self.fallos_consecutivos = 0
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self.fallos_consecutivos += 1
+            if self.estado == SEMIABIERTO or self.fallos_consecutivos >= self.umbral_fallos:
+                if self.estado != ABIERTO:
+                    print(f"Circuito de '{self.nombre}' abierto tras {self.fallos_consecutivos} fallos.")
+                self.estado = ABIERTO
+                self._abierto_desde = time.monotonic()
+                self._prueba_en_curso = False
+
+    def como_dict(self) -> Dict:
+        with self._lock:
+            return {'estado': self.estado, 'fallos_consecutivos': self.fallos_consecutivos}
+
+
+class ServicioResiliente:
+    """
+    Ejecuta las llamadas a un servicio externo con circuit breaker,
+    reintentos con jitter dentro de un plazo total y cobertura opcional.
+
+    Args:
+        nombre: Nombre del servicio
+        interruptor: Circuit breaker del servicio
+        intentos: Intentos máximos por llamada (incluido el primero)
+        espera_base: Espera inicial entre intentos en segundos (se duplica en cada uno)
+        espera_maxima: Espera máxima entre intentos en segundos
+        plazo_total: Segundos máximos para la llamada completa, reintentos incluidos
+        retraso_cobertura: Segundos tras los cuales se lanza una llamada de
+            cobertura en paralelo (None = sin cobertura)
+    """
+
+    def __init__(self, nombre: str, interruptor: InterruptorCircuito, intentos: int = 3,
+                 espera_base: float = 0.2, espera_maxima: float = 2.0, plazo_total: float = 10,
+                 retraso_cobertura: Optional[float] = None):
+        self.nombre = nombre
+        self.interruptor = interruptor
+        self.intentos = intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.plazo_total = plazo_total
+        self.retraso_cobertura = retraso_cobertura
+
+    @property
+    def abierto(self) -> bool:
+        return self.interruptor.abierto
+
+    def ejecutar(self, funcion: Callable[[float], object]):
+        """
+        Ejecuta `funcion(segundos_restantes)` aplicando las políticas del servicio.
+
+        La función recibe los segundos que quedan del plazo total para usarlos
+        como timeout de la solicitud.
+
+        Raises:
+            CircuitoAbierto: Si el circuito está abierto
+            PlazoAgotado: Si no queda tiempo para otro intento
+            Exception: El último error de la función si no es transitorio o
+                se agotaron los intentos
+        """
+        limite = time.monotonic() + self.plazo_total
+        ultimo_error = None
+
+        for intento in range(self.intentos):
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            if not self.interruptor.permitir():
+                raise CircuitoAbierto(self.nombre)
+
+            try:
+                resultado = self._intentar(funcion, limite)
+            except Exception as e:
+                if not es_error_transitorio(e):
+                    # El servicio respondió: el error es de la consulta, no del servicio
+                    self.interruptor.registrar_exito()
+                    raise
+                self.interruptor.registrar_fallo()
+                ultimo_error = e
+            else:
+                self.interruptor.registrar_exito()
+                return resultado
+
+            # Espera exponencial con jitter completo, sin pasarse del plazo
+            espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** intento))
+            if time.monotonic() + espera >= limite:
+                break
+            time.sleep(espera)
+
+        if ultimo_error is not None:
+            raise ultimo_error
+        raise PlazoAgotado(f"Plazo de {self.plazo_total} s agotado para el servicio '{self.nombre}'")
+
+    def _intentar(self, funcion, limite: float):
+        """Un intento, con una llamada de cobertura si la primera se demora."""
+        if self.retraso_cobertura is None:
+            return funcion(limite - time.monotonic())
+
+        pendientes = {_pool_cobertura.submit(funcion, limite - time.monotonic())}
+        terminados, pendientes = wait(pendientes, timeout=self.retraso_cobertura)
+        if not terminados:
+            pendientes.add(_pool_cobertura.submit(funcion, limite - time.monotonic()))
+
+        ultimo_error = None
+        while True:
+            for futuro in terminados:
+                if futuro.exception() is None:
+                    return futuro.result()
+                ultimo_error = futuro.exception()
+            if not pendientes:
+                raise ultimo_error
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise requests.Timeout(f"Sin respuesta de '{self.nombre}' dentro del plazo")
+            terminados, pendientes = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+
+    async def ejecutar_async(self, funcion: Callable[[float], Awaitable]):
+        """
+        Igual que `ejecutar`, con `funcion(segundos_restantes)` como corrutina.
+        Las esperas entre intentos no bloquean el event loop.
+        """
+        limite = time.monotonic() + self.plazo_total
+        ultimo_error = None
+
+        for intento in range(self.intentos):
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            if not self.interruptor.permitir():
+                raise CircuitoAbierto(self.nombre)
+
+            try:
+                resultado = await self._intentar_async(funcion, limite)
+            except Exception as e:
+                if not es_error_transitorio(e):
+                    self.interruptor.registrar_exito()
+                    raise
+                self.interruptor.registrar_fallo()
+                ultimo_error = e
+            else:
+                self.interruptor.registrar_exito()
+                return resultado
+
+            espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** intento))
+            if time.monotonic() + espera >= limite:
+                break
+            await asyncio.sleep(espera)
+
+        if ultimo_error is not None:
+            raise ultimo_error
+        raise PlazoAgotado(f"Plazo de {self.plazo_total} s agotado para el servicio '{self.nombre}'")
+
+    async def _intentar_async(self, funcion, limite: float):
+        """Un intento asíncrono, con una tarea de cobertura si la primera se demora."""
+        if self.retraso_cobertura is None:
+            return await funcion(limite - time.monotonic())
+
+        pendientes = {asyncio.ensure_future(funcion(limite - time.monotonic()))}
+        try:
+            terminados, pendientes = await asyncio.wait(pendientes, timeout=self.retraso_cobertura)
+            if not terminados:
+                pendientes.add(asyncio.ensure_future(funcion(limite - time.monotonic())))
+
+            ultimo_error = None
+            while True:
+                for tarea in terminados:
+                    if tarea.exception() is None:
+                        return tarea.result()
+                    ultimo_error = tarea.exception()
+                if not pendientes:
+                    raise ultimo_error
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise asyncio.TimeoutError(f"Sin respuesta de '{self.nombre}' dentro del plazo")
+                terminados, pendientes = await asyncio.wait(
+                    pendientes, timeout=restante, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            # La llamada que perdió la carrera no se sigue esperando
+            for tarea in pendientes:
+                tarea.cancel()
+
+    def como_dict(self) -> Dict:
+        return dict(self.interruptor.como_dict(), plazo_total=self.plazo_total,
+                    retraso_cobertura=self.retraso_cobertura)
+
+
+def crear_servicio(nombre: str) -> ServicioResiliente:
+    """Crea el ServicioResiliente de un servicio con la configuración de MAPA_CONFIG."""
+    return ServicioResiliente(
+        nombre,
+        InterruptorCircuito(
+            nombre,
+            umbral_fallos=MAPA_CONFIG["umbral_fallos_circuito"],
+            segundos_abierto=MAPA_CONFIG["segundos_circuito_abierto"],
+        ),
+        intentos=MAPA_CONFIG["intentos_servicios"],
+        espera_base=MAPA_CONFIG["espera_base_reintento"],
+        espera_maxima=MAPA_CONFIG["espera_maxima_reintento"],
+        plazo_total=MAPA_CONFIG["plazo_total_servicios"].get(nombre, MAPA_CONFIG["timeout_lectura"]),
+        retraso_cobertura=MAPA_CONFIG["cobertura_servicios"].get(nombre),
+    )
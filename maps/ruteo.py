@@ -0,0 +1,267 @@
+"""
+Backends de ruteo intercambiables.
+
+Todos los backends reciben una lista de nodos ({'lat', 'lon'}) y retornan
+un diccionario con el mismo formato:
+
+    {
+        'distancia_km', 'duracion_minutos',
+        'distancia_metros', 'duracion_segundos',
+        'pasos': [{'nombre', 'distancia', 'duracion', 'geometria', 'instruccion'}],
+        'geometria_completa': polyline codificado (precisión 5),
+    }
+
+o None si no se pudo calcular la ruta.
+
+Backends disponibles (MAPA_CONFIG["backend_ruteo"]):
+- 'osrm': API HTTP de OSRM (comportamiento original)
+- 'local': A* dentro del proceso sobre el grafo del extracto OSM
+- 'ch': consultas sobre la jerarquía de contracción preprocesada del grafo
+- 'linea_recta': estimación en línea recta con haversine
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+
+from . import polilineas
+from .cache import cache_rutas_osrm
+from .clientes import cliente_mapas
+from .clientes_async import cliente_mapas_async
+from .constants import API_URLS, MAPA_CONFIG
+from .grafo_vial import obtener_grafo_vial, distancia_metros
+from .jerarquia import obtener_jerarquia
+
+# Perfil de ruteo de OSRM (último segmento de la URL, por ejemplo "driving")
+PERFIL_OSRM = API_URLS["osrm_route"].rstrip('/').rsplit('/', 1)[-1]
+
+
+def _resultado_ruta(metros: float, segundos: float, pasos: List[Dict], geometria: str) -> Dict:
+    """Arma el diccionario de resultado común a todos los backends."""
+    return {
+        'distancia_km': metros / 1000,
+        'duracion_minutos': segundos / 60,
+        'distancia_metros': metros,
+        'duracion_segundos': segundos,
+        'pasos': pasos,
+        'geometria_completa': geometria,
+    }
+
+
+class BackendRuteo(ABC):
+    """
+    Interfaz de los backends de ruteo.
+
+    Atributos:
+        nombre: Identificador del backend en MAPA_CONFIG["backend_ruteo"]
+        ajusta_nodos: Si los puntos deben ajustarse a calles (Overpass o
+            índice vial) antes de llamar a `calcular`
+        servicio: Servicio externo del que depende (endpoint de cliente_mapas),
+            o None si calcula dentro del proceso
+    """
+    nombre = ''
+    ajusta_nodos = False
+    servicio = None
+
+    @abstractmethod
+    def calcular(self, nodos: List[Dict]) -> Optional[Dict]:
+        """Calcula la ruta que pasa por los nodos en orden, o None si no se puede."""
+
+    async def calcular_async(self, nodos: List[Dict]) -> Optional[Dict]:
+        """
+        Versión para vistas async. Por defecto ejecuta `calcular` en un hilo
+        aparte, ya que los backends locales solo consumen CPU.
+        """
+        return await sync_to_async(self.calcular, thread_sensitive=False)(nodos)
+
+
+class BackendOSRM(BackendRuteo):
+    """Ruteo mediante la API HTTP de OSRM, con caché de respuestas."""
+    nombre = 'osrm'
+    ajusta_nodos = True
+    servicio = 'osrm_route'
+
+    def calcular(self, nodos: List[Dict]) -> Optional[Dict]:
+        return cache_rutas_osrm.obtener(nodos, PERFIL_OSRM, lambda: self._consultar(nodos))
+
+    async def calcular_async(self, nodos: List[Dict]) -> Optional[Dict]:
+        return await cache_rutas_osrm.obtener_async(nodos, PERFIL_OSRM, lambda: self._consultar_async(nodos))
+
+    def _url(self, nodos: List[Dict]) -> str:
+        """URL de la API de rutas de OSRM para los nodos dados."""
+        # Crear string de coordenadas para OSRM (lon,lat)
+        coordenadas = ";".join([f"{nodo['lon']},{nodo['lat']}" for nodo in nodos])
+        return f"{API_URLS['osrm_route']}/{coordenadas}?overview=full&steps=true"
+
+    def _consultar(self, nodos: List[Dict]) -> Optional[Dict]:
+        """Consulta la API de rutas de OSRM (sin caché)."""
+        response = cliente_mapas.get('osrm_route', self._url(nodos))
+        response.raise_for_status()
+        return self._procesar_respuesta(response.json())
+
+    async def _consultar_async(self, nodos: List[Dict]) -> Optional[Dict]:
+        """Consulta la API de rutas de OSRM con el cliente asíncrono (sin caché)."""
+        response = await cliente_mapas_async.get('osrm_route', self._url(nodos))
+        response.raise_for_status()
+        return self._procesar_respuesta(response.json())
+
+    def _procesar_respuesta(self, route_data: Dict) -> Optional[Dict]:
+        """Convierte la respuesta JSON de OSRM al formato común de los backends."""
+        if not route_data.get('routes') or len(route_data['routes']) == 0:
+            print("No se encontró una ruta con detalles.")
+            return None
+
+        # Obtener la primera ruta
+        route = route_data['routes'][0]
+
+        # Extraer pasos detallados
+        pasos = []
+        for leg in route['legs']:
+            for step in leg['steps']:
+                pasos.append({
+                    'nombre': step.get('name', 'Sin nombre'),
+                    'distancia': step.get('distance', 0),
+                    'duracion': step.get('duration', 0),
+                    'geometria': step.get('geometry', ''),
+                    'instruccion': step.get('maneuver', {}).get('instruction', '')
+                })
+
+        return _resultado_ruta(route['distance'], route['duration'], pasos, route.get('geometry', ''))
+
+
+class BackendGrafoLocal(BackendRuteo):
+    """
+    Ruteo dentro del proceso con A* sobre el grafo vial del extracto OSM.
+
+    Retorna None si el grafo no está disponible (o aún se está cargando en
+    segundo plano) o si algún punto queda a más de
+    MAPA_CONFIG["radio_ajuste_grafo"] metros de la red vial.
+    """
+    nombre = 'local'
+
+    def __init__(self, grafo=None):
+        self._grafo = grafo
+
+    @property
+    def grafo(self):
+        return self._grafo or obtener_grafo_vial()
+
+    def calcular(self, nodos: List[Dict]) -> Optional[Dict]:
+        grafo = self.grafo
+        if grafo is None:
+            return None
+
+        indices = []
+        for nodo in nodos:
+            indice = grafo.nodo_mas_cercano(nodo['lat'], nodo['lon'], MAPA_CONFIG["radio_ajuste_grafo"])
+            if indice is None:
+                return None
+            indices.append(indice)
+
+        puntos = [(grafo.lats[indices[0]], grafo.lons[indices[0]])]
+        pasos = []
+        distancia_total = 0.0
+        duracion_total = 0.0
+
+        for origen, destino in zip(indices, indices[1:]):
+            aristas = grafo.ruta_mas_corta(origen, destino)
+            if aristas is None:
+                return None
+
+            anterior = origen
+            for nodo, segundos, metros, indice_via in aristas:
+                nombre = grafo.nombres_vias[indice_via]
+                if not pasos or pasos[-1]['nombre'] != nombre:
+                    pasos.append({
+                        'nombre': nombre,
+                        'distancia': 0.0,
+                        'duracion': 0.0,
+                        'puntos': [(grafo.lats[anterior], grafo.lons[anterior])],
+                        'instruccion': f"Continuar por {nombre}",
+                    })
+                paso = pasos[-1]
+                paso['distancia'] += metros
+                paso['duracion'] += segundos
+                paso['puntos'].append((grafo.lats[nodo], grafo.lons[nodo]))
+                puntos.append((grafo.lats[nodo], grafo.lons[nodo]))
+                distancia_total += metros
+                duracion_total += segundos
+                anterior = nodo
+
+        for paso in pasos:
+            paso['geometria'] = polilineas.codificar(paso.pop('puntos'))
+
+        return _resultado_ruta(distancia_total, duracion_total, pasos, polilineas.codificar(puntos))
+
+
+class BackendJerarquia(BackendGrafoLocal):
+    """
+    Ruteo sobre la jerarquía de contracción del grafo vial.
+
+    Produce las mismas rutas que BackendGrafoLocal, pero cada consulta
+    visita solo los nodos importantes de la jerarquía.
+    """
+    nombre = 'ch'
+
+    @property
+    def grafo(self):
+        return self._grafo or obtener_jerarquia()
+
+
+class BackendLineaRecta(BackendRuteo):
+    """
+    Estimación sin red: distancia haversine multiplicada por un factor de
+    desvío y recorrida a una velocidad promedio fija.
+    """
+    nombre = 'linea_recta'
+
+    def calcular(self, nodos: List[Dict]) -> Optional[Dict]:
+        if len(nodos) < 2:
+            return None
+
+        factor = MAPA_CONFIG["factor_desvio_linea_recta"]
+        velocidad_ms = MAPA_CONFIG["velocidad_linea_recta_kmh"] / 3.6
+
+        pasos = []
+        for origen, destino in zip(nodos, nodos[1:]):
+            metros = distancia_metros(origen['lat'], origen['lon'], destino['lat'], destino['lon']) * factor
+            pasos.append({
+                'nombre': 'Línea recta',
+                'distancia': metros,
+                'duracion': metros / velocidad_ms,
+                'geometria': polilineas.codificar([(origen['lat'], origen['lon']), (destino['lat'], destino['lon'])]),
+                'instruccion': 'Trayecto estimado en línea recta',
+            })
+
+        distancia = sum(paso['distancia'] for paso in pasos)
+        geometria = polilineas.codificar([(nodo['lat'], nodo['lon']) for nodo in nodos])
+        return _resultado_ruta(distancia, distancia / velocidad_ms, pasos, geometria)
+
+
+BACKENDS_RUTEO = {
+    BackendOSRM.nombre: BackendOSRM,
+    BackendGrafoLocal.nombre: BackendGrafoLocal,
+    BackendJerarquia.nombre: BackendJerarquia,
+    BackendLineaRecta.nombre: BackendLineaRecta,
+}
+
+_instancias = {}
+
+
+def obtener_backend_ruteo(nombre: str = None) -> BackendRuteo:
+    """
+    Retorna la instancia compartida del backend de ruteo pedido.
+
+    Args:
+        nombre: Nombre del backend; por defecto MAPA_CONFIG["backend_ruteo"]
+
+    Raises:
+        ValueError: Si el backend no existe
+    """
+    nombre = nombre or MAPA_CONFIG["backend_ruteo"]
+    if nombre not in BACKENDS_RUTEO:
+        raise ValueError(f"Backend de ruteo desconocido: '{nombre}'. Opciones: {', '.join(BACKENDS_RUTEO)}")
+    if nombre not in _instancias:
+        _instancias[nombre] = BACKENDS_RUTEO[nombre]()
+    return _instancias[nombre]
@@ -1,4 +1,27 @@
 
+// Endpoints del servidor que reemplazan las consultas directas a Overpass y
+// OSRM (pasan por las cachés del servidor, ver maps/views.py)
+const API_MAPAS = {
+    nodoCercano: '/maps/api/nodo-cercano/',
+    callesCercanas: '/maps/api/calles-cercanas/',
+    rutaNodos: '/maps/api/ruta-nodos/',
+};
+
+/**
+ * Consulta un endpoint JSON del servidor de mapas
+ *
+ * @param {string} url - URL del endpoint
+ * @param {Object} parametros - Parámetros GET
+ * @returns {Object} - Respuesta decodificada
+ */
+async function consultarApiMapas(url, parametros) {
+    const response = await fetch(`${url}?${new URLSearchParams(parametros)}`, { credentials: 'same-origin' });
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status} en ${url}`);
+    }
+    return response.json();
+}
+
 // Inicializa el mapa con botones de zoom
 var map = L.map('map', {
     zoomControl: true
@@ -104,22 +127,12 @@ function dibujarPolilineaConFlechas(coordinates, color = 'blue', mensaje = '') {
  * @returns {string} - Nombre de la calle o "Sin nombre"
  */
 async function encontrarNombreCalle(lat, lon) {
-    const query = `
-        [out:json];
-            way["highway"](around:15, ${lat}, ${lon});
-        out body;
-    `;
-    const url = `https://overpass-api.de/api/interpreter?data=${encodeURIComponent(query)}`;
-
     try {
-        const response = await fetch(url);
-        const data = await response.json();
+        const calles = await consultarApiMapas(API_MAPAS.callesCercanas, { lat, lon, radio: 15 });
 
-        if (data.elements && data.elements.length > 0) {
-            for (const way of data.elements) {
-                if (way.tags?.name) {
-                    return way.tags.name;
-                }
+        for (const calle of calles) {
+            if (calle.nombre) {
+                return calle.nombre;
             }
         }
 
@@ -139,26 +152,14 @@ async function encontrarNombreCalle(lat, lon) {
  * @param {number} radius - Radio de búsqueda en metros
  */
 async function mostrarCallesCercanas(lat, lon, radius = 500) {
-    // API de Overpass para obtener calles cercanas
-    const query = `
-        [out:json];
-        (
-            way["highway"](around:${radius}, ${lat}, ${lon});
-        );
-        out geom;`;
-
-    const url = `https://overpass-api.de/api/interpreter?data=${encodeURIComponent(query)}`;
-
     try {
-        const response = await fetch(url);
-        const data = await response.json();
+        const calles = await consultarApiMapas(API_MAPAS.callesCercanas, { lat, lon, radio: radius });
 
         // Procesar y añadir calles al mapa
-        data.elements.forEach(element => {
-            if (element.type === 'way' && element.geometry) {
-                const latlngs = element.geometry.map(coord => [coord.lat, coord.lon]);
-                L.polyline(latlngs, { color: 'blue', weight: 4 }).addTo(map)
-                    .bindPopup(`Calle: ${element.tags.name || 'Desconocida'}`);
+        calles.forEach(calle => {
+            if (calle.geometria.length > 0) {
+                L.polyline(calle.geometria, { color: 'blue', weight: 4 }).addTo(map)
+                    .bindPopup(`Calle: ${calle.nombre || 'Desconocida'}`);
             }
         });
     } catch (error) {
@@ -222,50 +223,15 @@ function nodoMasCercano(lat, lon, nodos) {
  * @param {number} radius - Radio de búsqueda en metros
  */
 async function mostrarNodoCercanoConMarcador(lat, lon, radius = 50) {
-    const query = `
-        [out:json];
-        way(around:${radius},${lat},${lon})["highway"];
-        out body;
-    `;
-    const url = `https://overpass-api.de/api/interpreter?data=${encodeURIComponent(query)}`;
-
     try {
-        const response = await fetch(url);
-        const data = await response.json();
-
-        if (!data.elements || data.elements.length === 0) {
-            console.log("No se encontraron calles cercanas");
-            return;
-        }
-
-        // Extrae los nodos de los `way`
-        const nodeIds = data.elements.flatMap(way => way.nodes);
-
-        // Otra consulta para obtener los nodos de los `way`
-        const nodesQuery = `
-            [out:json];
-            node(id:${nodeIds.join(',')});
-            out body;
-        `;
-        const nodesUrl = `https://overpass-api.de/api/interpreter?data=${encodeURIComponent(nodesQuery)}`;
-
-        const nodesResponse = await fetch(nodesUrl);
-        const nodesData = await nodesResponse.json();
-
-        if (!nodesData.elements || nodesData.elements.length === 0) {
-            console.log("No se encontraron nodos asociados a las calles");
-            return;
-        }
-
-        // Encuentra el nodo más cercano y coloca un marcador
-        const nodo = nodoMasCercano(lat, lon, nodesData.elements);
-
-        let nameCalleNodo = await encontrarNombreCalle(nodo.lat, nodo.lon);
+        // El servidor busca el nodo en su índice vial o en las teselas cacheadas
+        const data = await consultarApiMapas(API_MAPAS.nodoCercano, { lat, lon, radio: radius });
+        const nodo = data.nodo;
 
         if (nodo) {
             L.marker([nodo.lat, nodo.lon])
                 .addTo(map)
-                .bindPopup(`Nodo en calle: ${nameCalleNodo ? nameCalleNodo : "Sin nombre"}`)
+                .bindPopup(`Nodo en calle: ${data.calle ? data.calle : "Sin nombre"}`)
                 //.openPopup();
         } else {
             console.log("No se encontró ningún nodo cercano");
@@ -291,56 +257,30 @@ async function calcularRutaEntreNodos(nodos, roundtrip = true) {
             return;
         }
 
-        // Si roundtrip es true, agregamos el primer nodo al final para cerrar el ciclo
-        let nodosRuta = [...nodos];
-        if (roundtrip) {
-            nodosRuta.push(nodos[0]);
-        }
-
-        // Mostrar el nodo más cercano a los nodos
-        for (let i = 0; i < nodosRuta.length; i++) {
-            const nodo = nodosRuta[i];
-
-            const nodo_cercano = await mostrarNodoCercanoConMarcador(nodo.lat, nodo.lon, 50);
-            if (nodo_cercano) {
-                nodosRuta[i] = nodo_cercano; // Reemplazar el nodo original por el más cercano
-            }
-        }
-
-        const coordenadas = nodosRuta.map(nodo => `${nodo.lon},${nodo.lat}`).join(";");
-
-        const routeUrl = `https://router.project-osrm.org/route/v1/driving/${coordenadas}?overview=full&steps=true`;
-
-        const routeResponse = await fetch(routeUrl);
-        if (!routeResponse.ok) {
-            console.error(`Error al consultar OSRM Route: ${routeResponse.statusText}`);
-            return;
-        }
-
-        const routeData = await routeResponse.json();
-
-        if (!routeData.routes || routeData.routes.length === 0) {
-            console.log("No se encontró una ruta con detalles.");
+        // El servidor ajusta los puntos a calles y calcula la ruta (con caché)
+        const puntos = nodos.map(nodo => `${nodo.lat},${nodo.lon}`).join(";");
+        let routeData;
+        try {
+            routeData = await consultarApiMapas(API_MAPAS.rutaNodos, { puntos, roundtrip: roundtrip ? 1 : 0 });
+        } catch (error) {
+            console.error(`Error al consultar la ruta: ${error.message}`);
             return;
         }
 
-        if (routeData.routes.length > 1) {
-            console.log("Se encontraron múltiples rutas. Usando la primera.");
-        }
+        // Marcar los nodos de calle usados por la ruta
+        routeData.nodos.forEach(nodo => {
+            L.marker([nodo.lat, nodo.lon]).addTo(map).bindPopup("Nodo de la ruta");
+        });
 
         // Mostrar la distancia y duración de la ruta
-        const routeSummary = routeData.routes[0];
-        console.log(`Ruta calculada: ${routeSummary.distance / 1000} km en ${routeSummary.duration / 60} minutos.`);
+        console.log(`Ruta calculada: ${routeData.distancia_km} km en ${routeData.duracion_minutos} minutos.`);
 
         // Dibujar los pasos en el mapa y etiquetar las calles
-        const steps = routeData.routes[0].legs.flatMap(leg => leg.steps);
-
-        steps.forEach(step => {
-            const name = step.name || "Sin nombre";
+        routeData.pasos.forEach(step => {
+            const name = step.nombre || "Sin nombre";
 
             // Decodificar la geometría de cada tramo
-            const polylineDecoded = polyline.decode(step.geometry);
-            const coordinates = polylineDecoded.map(coord => [coord[0], coord[1]]);
+            const coordinates = polyline.decode(step.geometria);
 
             const color = 'red'; //generarColorAleatorio();
 
@@ -12,6 +12,8 @@ var map;
 var rutasData;
 var distanciaTotal;
 var duracionTotal;
+// Rutas con polylines simplificados por zoom: {capa, data, decodificados}
+var rutasConNiveles = [];
 
 /**
  * Verifica que las dependencias requeridas estén disponibles
@@ -96,6 +98,8 @@ function verificarRangoChile(lat, lng) {
  * @param {Object} data - Datos de la ruta que debe contener:
  *   - {string} nombre - Nombre descriptivo de la ruta
  *   - {string} [polyline] - Polyline codificado de la ruta (opcional)
+ *   - {number} [precision] - Decimales con que se codificó el polyline (opcional, 5 por defecto)
+ *   - {Object} [niveles] - Polylines simplificados por zoom máximo (opcional)
  *   - {Array<Array<number>>} [coordenadas] - Array de coordenadas [lat, lng] (opcional)
  *   - {string} [color] - Color de la línea en formato hex (opcional)
  *   - {number} [distancia_km] - Distancia de la ruta en kilómetros (opcional)
@@ -114,7 +118,7 @@ function mostrarRuta(data, index = 0) {
     // Intentar decodificar polyline si está disponible y la librería está cargada
     if (data.polyline && typeof polyline !== 'undefined') {
         try {
-            coordenadas = polyline.decode(data.polyline);
+            coordenadas = polyline.decode(data.polyline, data.precision);
             console.log(`Polyline decodificada para ${data.nombre}: ${coordenadas.length} puntos`);
         } catch (error) {
             console.warn(`Error decodificando polyline de ${data.nombre}, usando coordenadas directas:`, error);
@@ -158,9 +162,57 @@ function mostrarRuta(data, index = 0) {
     
     ruta.bindPopup(popupContent);
     
+    // Con niveles simplificados, dibujar solo el detalle que el zoom permite ver
+    if (data.polyline && data.niveles && Object.keys(data.niveles).length > 0 && typeof polyline !== 'undefined') {
+        const decodificados = {};
+        decodificados[data.polyline] = coordenadas;
+        rutasConNiveles.push({ capa: ruta, data: data, decodificados: decodificados, actual: data.polyline });
+    }
+    
     return ruta;
 }
 
+/**
+ * Elige el polyline de una ruta para un nivel de zoom
+ * @param {Object} data - Datos de la ruta con polyline y niveles ({zoom máximo: polyline})
+ * @param {number} zoom - Zoom actual del mapa
+ * @returns {string} - Polyline simplificado del menor nivel que cubre el zoom, o el completo
+ */
+function polylineParaZoom(data, zoom) {
+    const niveles = Object.keys(data.niveles || {}).map(Number).sort((a, b) => a - b);
+    for (const zoomMaximo of niveles) {
+        if (zoom <= zoomMaximo) {
+            return data.niveles[zoomMaximo];
+        }
+    }
+    return data.polyline;
+}
+
+/**
+ * Cambia la geometría de las rutas al nivel de simplificación del zoom actual
+ * @description Los niveles decodificados se guardan por ruta, por lo que cada
+ *              nivel se decodifica una sola vez
+ */
+function actualizarNivelesRutas() {
+    const zoom = map.getZoom();
+    rutasConNiveles.forEach(item => {
+        const codificado = polylineParaZoom(item.data, zoom);
+        if (item.actual === codificado) {
+            return;
+        }
+        if (!item.decodificados[codificado]) {
+            try {
+                item.decodificados[codificado] = polyline.decode(codificado);
+            } catch (error) {
+                console.warn(`Error decodificando nivel de ${item.data.nombre}:`, error);
+                return;
+            }
+        }
+        item.capa.setLatLngs(item.decodificados[codificado]);
+        item.actual = codificado;
+    });
+}
+
 /**
  * Crea marcadores de inicio y destino en el mapa con iconos personalizados
  * @param {Array<number>} coordenadasInicio - Coordenadas del punto de inicio [lat, lng]
@@ -198,7 +250,8 @@ function crearMarcadores(coordenadasInicio, coordenadasDestino) {
  * Muestra los pasos detallados de una ruta individual como polilíneas
  * @param {Object} rutaData - Datos de la ruta que contiene:
  *   - {string} nombre - Nombre de la ruta
- *   - {Array<Object>} [pasos] - Array de pasos con coordenadas e instrucciones
+ *   - {number} [precision] - Decimales con que se codificaron los polylines (5 por defecto)
+ *   - {Array<Object>} [pasos] - Array de pasos con coordenadas o polyline e instrucciones
  * @param {number} index - Índice de la ruta para generar colores únicos
  * @description Renderiza cada paso como una polilínea con colores diferenciados
  *              y popups informativos con instrucciones de navegación
@@ -207,9 +260,17 @@ function mostrarPasosRuta(rutaData, index) {
     if (rutaData.pasos && rutaData.pasos.length > 0) {
         console.log(`Mostrando pasos de ${rutaData.nombre}:`, rutaData.pasos.length);
         rutaData.pasos.forEach((paso, pasoIndex) => {
-            if (paso.coordenadas && paso.coordenadas.length > 0) {
+            let coordenadasPaso = paso.coordenadas;
+            if (paso.polyline && typeof polyline !== 'undefined') {
+                try {
+                    coordenadasPaso = polyline.decode(paso.polyline, rutaData.precision);
+                } catch (error) {
+                    console.warn(`Error decodificando el paso ${pasoIndex + 1} de ${rutaData.nombre}:`, error);
+                }
+            }
+            if (coordenadasPaso && coordenadasPaso.length > 0) {
                 const colorPaso = `hsl(${((index * 180) + (pasoIndex * 30)) % 360}, 70%, 50%)`;
-                L.polyline(paso.coordenadas, {
+                L.polyline(coordenadasPaso, {
                     color: colorPaso,
                     weight: 2,
                     opacity: 0.4
@@ -252,7 +313,7 @@ function mostrarRutas(rutasArray) {
                 // Obtener coordenadas para marcadores
                 if (rutaData.polyline && typeof polyline !== 'undefined') {
                     try {
-                        coordenadas = polyline.decode(rutaData.polyline);
+                        coordenadas = polyline.decode(rutaData.polyline, rutaData.precision);
                     } catch (error) {
                         coordenadas = rutaData.coordenadas || [];
                     }
@@ -277,6 +338,11 @@ function mostrarRutas(rutasArray) {
         const group = new L.featureGroup(todasLasRutas);
         map.fitBounds(group.getBounds(), { padding: [20, 20] });
     }
+    
+    if (rutasConNiveles.length > 0) {
+        map.on('zoomend', actualizarNivelesRutas);
+        actualizarNivelesRutas();
+    }
 }
 
 /**
@@ -342,6 +408,38 @@ function inicializarMapaRutas(datosRutas, distTotal, durTotal, paginaAnt) {
     }
 }
 
+/**
+ * Pide la geometría de una ruta guardada al endpoint de rutas y luego inicializa el mapa
+ * @param {string} url - URL de maps:api_ruta_paquete
+ * @param {number} distTotal - Distancia total calculada en kilómetros
+ * @param {number} durTotal - Duración total calculada en minutos
+ * @param {string} paginaAnt - URL de la página anterior para navegación
+ * @description El navegador revalida la respuesta con su ETag, por lo que las
+ *              visitas repetidas reciben un 304 sin volver a descargar la geometría
+ */
+function cargarRutasDesdeApi(url, distTotal, durTotal, paginaAnt) {
+    fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+        .then(response => {
+            if (response.status === 202) {
+                throw new Error('La ruta se está calculando, intente nuevamente en unos segundos');
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(datos => {
+            inicializarMapaRutas(datos.rutas, datos.distancia_total_km, datos.duracion_total_minutos, paginaAnt);
+        })
+        .catch(error => {
+            console.error('No se pudo cargar la ruta:', error);
+            // Mostrar al menos el mapa y el resumen de la ruta
+            inicializarMapaRutas([], distTotal, durTotal, paginaAnt);
+            actualizarInformacionHeader();
+        });
+}
+
 // Hacer las funciones disponibles globalmente para el template
 window.inicializarMapaRutas = inicializarMapaRutas;
+window.cargarRutasDesdeApi = cargarRutasDesdeApi;
 window.regresarPaginaAnterior = regresarPaginaAnterior;
@@ -1,3 +1,155 @@
-from django.test import TestCase
+import random
 
-# Create your tests here.
+import numpy as np
+import polyline
+from django.test import SimpleTestCase
+
+from . import polilineas
+
+
+def _recorrido(cantidad, semilla=0):
+    """Caminata aleatoria de `cantidad` puntos alrededor de Concepción."""
+    aleatorio = random.Random(semilla)
+    lat, lng = -36.8302049, -73.0372293
+    puntos = []
+    for _ in range(cantidad):
+        lat += aleatorio.uniform(-0.002, 0.002)
+        lng += aleatorio.uniform(-0.002, 0.002)
+        puntos.append((lat, lng))
+    return puntos
+
+
+class PolilineasTests(SimpleTestCase):
+    """
+    El codec de maps/polilineas.py debe coincidir con la librería `polyline`,
+    tanto en el recorrido en Python (cadenas cortas) como en el vectorizado.
+    """
+
+    # Cantidades de puntos que caen en el camino corto y en el vectorizado
+    CANTIDADES = {'corto': 10, 'vectorizado': 500}
+
+    def _casos(self):
+        for camino, cantidad in self.CANTIDADES.items():
+            for precision in (5, 6):
+                with self.subTest(camino=camino, precision=precision):
+                    yield _recorrido(cantidad), precision
+
+    def test_codificar_igual_a_polyline(self):
+        for puntos, precision in self._casos():
+            self.assertEqual(polilineas.codificar(puntos, precision), polyline.encode(puntos, precision))
+            self.assertEqual(
+                polilineas.codificar(np.array(puntos), precision), polyline.encode(puntos, precision)
+            )
+
+    def test_decodificar_igual_a_polyline(self):
+        for puntos, precision in self._casos():
+            codificado = polyline.encode(puntos, precision)
+            esperado = [list(punto) for punto in polyline.decode(codificado, precision)]
+
+            self.assertEqual(polilineas.decodificar_lista(codificado, precision), esperado)
+            self.assertEqual(polilineas.decodificar(codificado, precision).shape, (len(puntos), 2))
+
+    def test_ida_y_vuelta(self):
+        for puntos, precision in self._casos():
+            codificado = polilineas.codificar(puntos, precision)
+            self.assertEqual(polilineas.codificar(polilineas.decodificar(codificado, precision), precision), codificado)
+
+    def test_cadena_vacia(self):
+        self.assertEqual(polilineas.decodificar('').shape, (0, 2))
+        self.assertEqual(polilineas.codificar([]), '')
+        self.assertIsNone(polilineas.primer_punto(''))
+
+    def test_cadenas_invalidas(self):
+        for camino, cantidad in self.CANTIDADES.items():
+            valido = polyline.encode(_recorrido(cantidad), 5)
+            invalidos = {
+                'no ascii': valido + 'ñ',
+                'fuera de rango': valido + ' ?',
+                'valor incompleto': valido + '_',
+                'cantidad impar': valido + '?',
+            }
+            for motivo, codificado in invalidos.items():
+                with self.subTest(camino=camino, motivo=motivo):
+                    with self.assertRaises(ValueError):
+                        polilineas.decodificar(codificado)
+
+        with self.assertRaises(ValueError):
+            polilineas.decodificar(polyline.encode(_recorrido(500), 5) + '_' * 13 + '??')
+
+    def test_cadenas_truncadas(self):
+        for camino, cantidad in self.CANTIDADES.items():
+            codificado = polyline.encode(_recorrido(cantidad), 5)
+            # Se corta dentro de un valor de varios caracteres
+            corte = next(
+                indice for indice in range(len(codificado) - 1, 0, -1)
+                if ord(codificado[indice - 1]) - 63 >= 0x20
+            )
+            with self.subTest(camino=camino):
+                with self.assertRaises(ValueError):
+                    polilineas.decodificar(codificado[:corte])
+                with self.assertRaises(ValueError):
+                    polilineas.cuantizar(codificado[:corte], 4)
+
+    def test_primer_punto(self):
+        for puntos, precision in self._casos():
+            codificado = polyline.encode(puntos, precision)
+            self.assertEqual(polilineas.primer_punto(codificado, precision), polyline.decode(codificado, precision)[0])
+
+        self.assertIsNone(polilineas.primer_punto('_'))
+        self.assertIsNone(polilineas.primer_punto('?'))
+        self.assertIsNone(polilineas.primer_punto(' ??'))
+
+    def test_cuantizar(self):
+        for camino, cantidad in self.CANTIDADES.items():
+            puntos = _recorrido(cantidad)
+            # Puntos repetidos al bajar de precisión, que deben omitirse
+            puntos[3:3] = [(puntos[2][0] + 0.000001, puntos[2][1] - 0.000001)] * 2
+            codificado = polyline.encode(puntos, 5)
+
+            enteros = [
+                tuple(round(valor * 10 ** 5) for valor in punto) for punto in polyline.decode(codificado, 5)
+            ]
+            esperados = []
+            for lat, lng in enteros:
+                punto = tuple((abs(valor) + 5) // 10 * (1 if valor >= 0 else -1) for valor in (lat, lng))
+                if not esperados or esperados[-1] != punto:
+                    esperados.append(punto)
+
+            with self.subTest(camino=camino):
+                cuantizado = polilineas.cuantizar(codificado, 4)
+                self.assertEqual(
+                    cuantizado, polyline.encode([(lat / 10 ** 4, lng / 10 ** 4) for lat, lng in esperados], 4)
+                )
+                self.assertLess(len(cuantizado), len(codificado))
+
+        self.assertEqual(polilineas.cuantizar(codificado, 5), codificado)
+        self.assertEqual(polilineas.cuantizar('', 4), '')
+
+    def test_simplificar(self):
+        # Línea recta: solo quedan los extremos
+        recta = [(-36.8, -73.0 + i * 0.001) for i in range(20)]
+        self.assertEqual(polilineas.simplificar(recta, 1).tolist(), [list(recta[0]), list(recta[-1])])
+
+        # Un desvío de ~110 m se conserva con tolerancia menor y se descarta con una mayor
+        desvio = [(-36.8, -73.0), (-36.799, -72.995), (-36.8, -72.99)]
+        self.assertEqual(len(polilineas.simplificar(desvio, 50)), 3)
+        self.assertEqual(len(polilineas.simplificar(desvio, 200)), 2)
+
+        # Un tramo de ida y vuelta no colapsa aunque los extremos coincidan
+        ida_y_vuelta = [(-36.8, -73.0), (-36.8, -72.99), (-36.8, -73.0)]
+        self.assertEqual(len(polilineas.simplificar(ida_y_vuelta, 50)), 3)
+
+        puntos = _recorrido(100)
+        self.assertEqual(len(polilineas.simplificar(puntos, 0)), 100)
+        simplificado = polilineas.simplificar(puntos, 100)
+        self.assertLess(len(simplificado), 100)
+        self.assertEqual(simplificado[0].tolist(), list(puntos[0]))
+        self.assertEqual(simplificado[-1].tolist(), list(puntos[-1]))
+
+    def test_niveles_simplificados(self):
+        codificado = polyline.encode(_recorrido(500), 5)
+        niveles = polilineas.niveles_simplificados(codificado, {12: 100, 15: 10, 18: 0})
+
+        self.assertEqual(set(niveles), {'12', '15'})
+        self.assertLess(len(niveles['12']), len(niveles['15']))
+        self.assertEqual(polilineas.primer_punto(niveles['12']), polilineas.primer_punto(codificado))
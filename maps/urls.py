@@ -7,5 +7,14 @@ app_name = 'maps'  # Define el namespace
 urlpatterns = [
     path('', views.map, name='map'),
     path('paquete/<int:paquete_id>/', views.map_paquete, name='map_paquete'),
-    path('direccion/', views.map_direccion, name='map_direccion')
+    path('direccion/', views.map_direccion, name='map_direccion'),
+    path('api/rutas/<int:paquete_id>/', views.api_ruta_paquete, name='api_ruta_paquete'),
+    # Proxies de Overpass y OSRM para maps/static/js/map.js
+    path('api/nodo-cercano/', views.api_nodo_cercano, name='api_nodo_cercano'),
+    path('api/calles-cercanas/', views.api_calles_cercanas, name='api_calles_cercanas'),
+    path('api/ruta-nodos/', views.api_ruta_nodos, name='api_ruta_nodos'),
+    # Versiones async (ASGI) de las mismas vistas
+    path('async/', views.map_async, name='map_async'),
+    path('async/paquete/<int:paquete_id>/', views.map_paquete_async, name='map_paquete_async'),
+    path('async/direccion/', views.map_direccion_async, name='map_direccion_async'),
 ]
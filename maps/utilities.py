@@ -1,15 +1,46 @@
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut
 from typing import Dict, Tuple, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from django.utils import timezone
 import requests
 import math
-import polyline
+import logging
+import numpy as np
 from .constants import UNIVERSIDAD_CONCEPCION, UNIVERSIDAD_CONCEPCION_COORDS_TUPLE, API_URLS, MAPA_CONFIG
+from . import geohash, polilineas
+from .cache import AUSENTE, CacheLRU, cache_geocodificacion, cache_teselas_nodos, cache_rutas_osrm, normalizar_direccion
+from .clientes import cliente_mapas
+from .resiliencia import CircuitoAbierto
+from .coalescencia import coalescedor_calles, coalescedor_geocodificacion, coalescedor_rutas
+from .indice_vial import obtener_indice_vial
+from .ruteo import obtener_backend_ruteo, PERFIL_OSRM
+
+logger = logging.getLogger(__name__)
+
+# Cliente de Nominatim compartido por todas las consultas (conexión persistente)
+geolocator = Nominatim(
+    user_agent="maps",
+    timeout=cliente_mapas.timeout,
+    adapter_factory=cliente_mapas.fabrica_adaptador_geopy(MAPA_CONFIG["conexiones_por_servicio"]["nominatim"]),
+)
+
+# Pools de hilos acotados: uno para los tramos de una ruta y otro para el
+# ajuste de puntos a calles (separados para que un tramo que espera sus
+# ajustes nunca bloquee a los hilos que deben resolverlos)
+_pool_rutas = ThreadPoolExecutor(max_workers=MAPA_CONFIG["hilos_rutas"], thread_name_prefix='rutas')
+_pool_ajuste_nodos = ThreadPoolExecutor(max_workers=MAPA_CONFIG["hilos_ajuste_nodos"], thread_name_prefix='ajuste-nodos')
 
 def obtener_coordenadas(direccion):
     """
     Obtiene las coordenadas geográficas (latitud, longitud) a partir de una dirección textual.
 
+    Los resultados (incluidas las direcciones no encontradas) se guardan en la
+    caché de geocodificación, por lo que una dirección repetida no vuelve a
+    consultar Nominatim mientras su entrada esté vigente. Las llamadas
+    concurrentes con la misma dirección comparten una única consulta.
+
     Parámetros:
         direccion (str): Dirección en formato "Calle y número, Ciudad, Región/Estado, País".
             Ejemplo: "Pasaje 1 #2693, Concepcion, Bio Bio, Chile"
@@ -18,15 +49,23 @@ def obtener_coordenadas(direccion):
         tuple: (latitud, longitud) si la dirección es válida.
         None: Si la dirección no se encuentra o ocurre un error.
     """
-    geolocator = Nominatim(user_agent="maps")
+    return coalescedor_geocodificacion.ejecutar(
+        normalizar_direccion(direccion), cache_geocodificacion.obtener, direccion, _geocodificar_nominatim
+    )
+
+def _geocodificar_nominatim(direccion):
+    """Consulta Nominatim directamente, sin pasar por la caché."""
     try:
-        location = geolocator.geocode(direccion)
-        if location:
-            return (location.latitude, location.longitude)
-        else:
-            return None  # Dirección no encontrada o mal escrita
-    except GeocoderTimedOut as e:
-        raise e
+        location = cliente_mapas.ejecutar(
+            'nominatim', lambda restante: geolocator.geocode(direccion, timeout=min(restante, MAPA_CONFIG["timeout_lectura"]))
+        )
+    except CircuitoAbierto as e:
+        # Los llamadores ya manejan GeocoderTimedOut como "servicio no disponible"
+        raise GeocoderTimedOut(str(e))
+    if location:
+        return (location.latitude, location.longitude)
+    else:
+        return None  # Dirección no encontrada o mal escrita
 
 def calcular_datos_ruta(origen: Tuple[float, float], destino: Tuple[float, float]) -> Dict[str, float]:
     """
@@ -90,6 +129,79 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     return R * c
 
+def haversine_vectorizado(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """
+    Versión vectorizada de haversine_distance sobre arreglos de NumPy.
+
+    Los argumentos se combinan con broadcasting, por lo que se puede calcular
+    la distancia de un punto a muchos (escalares contra arreglos) o de
+    arreglos de puntos elemento a elemento.
+    
+    Args:
+        lat, lon: Latitud y longitud del primer punto (o arreglos de puntos)
+        lats, lons: Latitudes y longitudes de los demás puntos
+    
+    Returns:
+        np.ndarray: Distancias en metros
+    """
+    R = 6371000  # Radio de la Tierra en metros
+
+    lat1_rad = np.radians(lat)
+    lat2_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2_rad - lat1_rad
+    dlon = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def matriz_distancias(puntos_a, puntos_b=None) -> np.ndarray:
+    """
+    Calcula la matriz de distancias haversine entre dos conjuntos de puntos.
+    
+    Args:
+        puntos_a: Secuencia o arreglo (N, 2) de pares (lat, lon)
+        puntos_b: Secuencia o arreglo (M, 2) de pares (lat, lon); si se omite
+            se usa puntos_a (matriz de todos contra todos)
+    
+    Returns:
+        np.ndarray: Matriz (N, M) de distancias en metros
+    """
+    a = np.asarray(puntos_a, dtype=np.float64).reshape(-1, 2)
+    b = a if puntos_b is None else np.asarray(puntos_b, dtype=np.float64).reshape(-1, 2)
+    return haversine_vectorizado(a[:, 0:1], a[:, 1:2], b[:, 0], b[:, 1])
+
+def _coordenadas_nodos(nodos: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Extrae las latitudes y longitudes de una lista de nodos como arreglos."""
+    lats = np.fromiter((nodo['lat'] for nodo in nodos), dtype=np.float64, count=len(nodos))
+    lons = np.fromiter((nodo['lon'] for nodo in nodos), dtype=np.float64, count=len(nodos))
+    return lats, lons
+
+def k_nodos_mas_cercanos(lat: float, lon: float, nodos: List[Dict], k: int = 1) -> List[Tuple[Dict, float]]:
+    """
+    Encuentra los k nodos más cercanos a un punto dado.
+    
+    Args:
+        lat, lon: Coordenadas del punto de referencia
+        nodos: Lista de nodos con keys 'lat' y 'lon'
+        k: Cantidad de nodos a retornar
+    
+    Returns:
+        List[Tuple[Dict, float]]: Pares (nodo, distancia en metros) ordenados
+        de menor a mayor distancia
+    """
+    if not nodos or k <= 0:
+        return []
+
+    distancias = haversine_vectorizado(lat, lon, *_coordenadas_nodos(nodos))
+    k = min(k, len(nodos))
+    if k < len(nodos):
+        indices = np.argpartition(distancias, k - 1)[:k]
+    else:
+        indices = np.arange(len(nodos))
+    indices = indices[np.argsort(distancias[indices], kind='stable')]
+
+    return [(nodos[i], float(distancias[i])) for i in indices]
+
 def encontrar_nodo_mas_cercano(lat: float, lon: float, nodos: List[Dict]) -> Optional[Dict]:
     """
     Encuentra el nodo más cercano a un punto dado.
@@ -104,76 +216,193 @@ def encontrar_nodo_mas_cercano(lat: float, lon: float, nodos: List[Dict]) -> Opt
     if not nodos:
         return None
     
-    nodo_cercano = None
-    min_dist = float('inf')
-    
-    for nodo in nodos:
-        dist = haversine_distance(lat, lon, nodo['lat'], nodo['lon'])
-        if dist < min_dist:
-            min_dist = dist
-            nodo_cercano = nodo
-    
-    return nodo_cercano
+    distancias = haversine_vectorizado(lat, lon, *_coordenadas_nodos(nodos))
+    return nodos[int(np.argmin(distancias))]
 
 def obtener_nodos_cercanos(lat: float, lon: float, radius: int = 50) -> List[Dict]:
     """
     Obtiene nodos de calles cercanos a una ubicación usando Overpass API.
+
+    Los nodos se descargan por teselas geohash fijas y se guardan en la caché
+    de teselas, por lo que los puntos posteriores dentro de las mismas
+    teselas no requieren acceder a la red.
     
     Args:
         lat, lon: Coordenadas del punto
         radius: Radio de búsqueda en metros
     
     Returns:
-        List[Dict]: Lista de nodos cercanos
+        List[Dict]: Lista de nodos a menos de `radius` metros del punto
+    """
+    listas_nodos = [cache_teselas_nodos.obtener(tesela, _descargar_nodos_tesela)
+                    for tesela in _teselas_alrededor(lat, lon, radius)]
+    return _nodos_en_radio(lat, lon, radius, listas_nodos)
+
+def _teselas_alrededor(lat: float, lon: float, radius: int) -> List[str]:
+    """Teselas geohash que cubren el cuadrado de lado 2·radius centrado en el punto."""
+    precision = MAPA_CONFIG["precision_geohash_teselas"]
+    delta_lat = radius / 111320
+    delta_lon = radius / (111320 * max(math.cos(math.radians(lat)), 1e-6))
+    return geohash.celdas_en_rectangulo(
+        lat - delta_lat, lon - delta_lon, lat + delta_lat, lon + delta_lon, precision
+    )
+
+def _nodos_en_radio(lat: float, lon: float, radius: int, listas_nodos) -> List[Dict]:
+    """Filtra los nodos [id, lat, lon] de varias teselas a los que están dentro del radio."""
+    nodos = {}
+    for nodos_tesela in listas_nodos:
+        if not nodos_tesela:
+            continue
+        datos = np.asarray(nodos_tesela, dtype=np.float64)
+        distancias = haversine_vectorizado(lat, lon, datos[:, 1], datos[:, 2])
+        for indice in np.flatnonzero(distancias <= radius):
+            id_nodo, lat_nodo, lon_nodo = nodos_tesela[indice]
+            nodos[id_nodo] = {'type': 'node', 'id': id_nodo, 'lat': lat_nodo, 'lon': lon_nodo}
+
+    return list(nodos.values())
+
+def _descargar_nodos_tesela(tesela: str) -> Optional[List[List]]:
+    """
+    Descarga desde Overpass todos los nodos viales de una tesela geohash
+    con una única consulta combinada way→node.
+
+    Returns:
+        List[List]: Nodos como [id, lat, lon], o None si la consulta falló
     """
     try:
-        # Consulta para obtener ways cercanos
-        query = f"""
-        [out:json];
-        way(around:{radius},{lat},{lon})["highway"];
-        out body;
-        """
-        
-        url = API_URLS["overpass"]
-        response = requests.post(url, data={'data': query}, timeout=MAPA_CONFIG["timeout_requests"])
+        response = cliente_mapas.post('overpass', API_URLS["overpass"], data={'data': _consulta_tesela(tesela)})
         response.raise_for_status()
-        
         data = response.json()
-        
-        if not data.get('elements'):
-            return []
-        
-        # Extraer IDs de nodos de los ways
-        node_ids = []
-        for way in data['elements']:
-            if 'nodes' in way:
-                node_ids.extend(way['nodes'])
-        
-        if not node_ids:
+    except (requests.RequestException, ValueError, CircuitoAbierto) as e:
+        print(f"Error al obtener nodos de la tesela {tesela}: {e}")
+        return None
+
+    return _nodos_respuesta_overpass(data)
+
+def _consulta_tesela(tesela: str) -> str:
+    """Consulta Overpass QL con los nodos de las vías de una tesela geohash."""
+    sur, oeste, norte, este = geohash.limites(tesela)
+    return f"""
+    [out:json];
+    way({sur},{oeste},{norte},{este})["highway"];
+    node(w);
+    out skel;
+    """
+
+def _nodos_respuesta_overpass(data: Dict) -> List[List]:
+    """Extrae los nodos de una respuesta de Overpass como [id, lat, lon]."""
+    return [
+        [elemento['id'], elemento['lat'], elemento['lon']]
+        for elemento in data.get('elements', [])
+        if elemento.get('type') == 'node'
+    ]
+
+# Calles cercanas a un punto, por punto redondeado y radio (solo memoria)
+_cache_calles = CacheLRU(MAPA_CONFIG["cache_calles_memoria"], MAPA_CONFIG["ttl_teselas"])
+
+def obtener_calles_cercanas(lat: float, lon: float, radius: int = 500) -> List[Dict]:
+    """
+    Obtiene las vías (con nombre y geometría) cercanas a un punto usando Overpass API.
+
+    El punto se redondea a MAPA_CONFIG["decimales_clave_calles"] decimales
+    para que las consultas cercanas compartan la entrada de caché, y las
+    llamadas concurrentes iguales comparten una única consulta. Las
+    consultas fallidas no se cachean.
+
+    Args:
+        lat, lon: Coordenadas del punto
+        radius: Radio de búsqueda en metros
+
+    Returns:
+        List[Dict]: Vías como {'id', 'nombre', 'geometria': [[lat, lon], ...]}
+    """
+    decimales = MAPA_CONFIG["decimales_clave_calles"]
+    clave = (round(lat, decimales), round(lon, decimales), radius)
+    calles = _cache_calles.obtener(clave)
+    if calles is AUSENTE:
+        calles = coalescedor_calles.ejecutar(clave, _descargar_calles, *clave)
+        if calles is None:
             return []
-        
-        # Consulta para obtener las coordenadas de los nodos
-        nodes_query = f"""
-        [out:json];
-        node(id:{','.join(map(str, node_ids))});
-        out body;
-        """
-        
-        nodes_response = requests.post(url, data={'data': nodes_query}, timeout=MAPA_CONFIG["timeout_requests"])
-        nodes_response.raise_for_status()
-        
-        nodes_data = nodes_response.json()
-        
-        return nodes_data.get('elements', [])
-        
-    except requests.RequestException as e:
-        print(f"Error al obtener nodos cercanos: {e}")
-        return []
+        _cache_calles.guardar(clave, calles)
+    return calles
+
+def _descargar_calles(lat: float, lon: float, radius: int) -> Optional[List[Dict]]:
+    """Consulta a Overpass las vías alrededor del punto (None si la consulta falló)."""
+    consulta = f"""
+    [out:json];
+    way["highway"](around:{radius},{lat},{lon});
+    out geom;
+    """
+    try:
+        response = cliente_mapas.post('overpass', API_URLS["overpass"], data={'data': consulta})
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError, CircuitoAbierto) as e:
+        print(f"Error al obtener las calles cercanas a ({lat}, {lon}): {e}")
+        return None
+
+    return [
+        {
+            'id': elemento['id'],
+            'nombre': elemento.get('tags', {}).get('name'),
+            'geometria': [[punto['lat'], punto['lon']] for punto in elemento.get('geometry', [])],
+        }
+        for elemento in data.get('elements', [])
+        if elemento.get('type') == 'way'
+    ]
+
+def nombre_calle_cercana(lat: float, lon: float, radius: int = 15) -> Optional[str]:
+    """Retorna el nombre de la vía con nombre más cercana al punto, o None."""
+    calles = [calle for calle in obtener_calles_cercanas(lat, lon, radius) if calle['nombre']]
+    if not calles:
+        return None
+
+    # Distancia de cada vía: la de su punto más cercano al punto consultado
+    def distancia(calle):
+        if not calle['geometria']:
+            return math.inf
+        puntos = np.asarray(calle['geometria'], dtype=np.float64)
+        return float(haversine_vectorizado(lat, lon, puntos[:, 0], puntos[:, 1]).min())
+
+    return min(calles, key=distancia)['nombre']
+
+def ajustar_nodo_a_calle(nodo: Dict, radius: int = None) -> Dict:
+    """
+    Reemplaza un punto por el nodo de calle más cercano.
+
+    Usa el índice vial local si está cargado y cubre el punto; en caso
+    contrario consulta Overpass. Si no hay ningún nodo dentro del radio,
+    retorna el punto original.
+
+    Args:
+        nodo: Punto con keys 'lat' y 'lon'
+        radius: Radio de búsqueda en metros (por defecto MAPA_CONFIG["radio_busqueda_nodos"])
+
+    Returns:
+        Dict: Nodo de calle más cercano o el punto original
+    """
+    radius = radius or MAPA_CONFIG["radio_busqueda_nodos"]
+
+    indice = obtener_indice_vial()
+    if indice is not None and indice.cubre(nodo['lat'], nodo['lon']):
+        return indice.nodo_mas_cercano(nodo['lat'], nodo['lon'], radius) or nodo
+
+    nodos_cercanos = obtener_nodos_cercanos(nodo['lat'], nodo['lon'], radius)
+    if nodos_cercanos:
+        nodo_cercano = encontrar_nodo_mas_cercano(nodo['lat'], nodo['lon'], nodos_cercanos)
+        if nodo_cercano:
+            return nodo_cercano
+    return nodo
 
 def calcular_ruta_entre_nodos(nodos: List[Dict], roundtrip: bool = True) -> Optional[Dict]:
     """
-    Calcula la ruta entre nodos usando OSRM y obtiene información detallada.
+    Calcula la ruta entre nodos y obtiene información detallada.
     Adaptación de la función JavaScript calcularRutaEntreNodos.
+
+    La ruta la calcula el backend configurado en MAPA_CONFIG["backend_ruteo"]
+    (OSRM por defecto, ver maps/ruteo.py). Las respuestas de OSRM se cachean
+    usando como clave las coordenadas ya ajustadas a calles y el perfil.
+    Las llamadas concurrentes con los mismos nodos comparten un único cálculo.
     
     Args:
         nodos: Lista de nodos con keys 'lat' y 'lon'
@@ -182,6 +411,14 @@ def calcular_ruta_entre_nodos(nodos: List[Dict], roundtrip: bool = True) -> Opti
     Returns:
         Dict: Información de la ruta con distancia, duración y pasos, o None si hay error
     """
+    return coalescedor_rutas.ejecutar(clave_ruta(nodos, roundtrip), _calcular_ruta_entre_nodos, nodos, roundtrip)
+
+def clave_ruta(nodos: List[Dict], roundtrip: bool) -> Tuple:
+    """Clave que identifica un cálculo de ruta para coalescer llamadas idénticas."""
+    return (tuple((nodo.get('lat'), nodo.get('lon')) for nodo in nodos), roundtrip)
+
+def _calcular_ruta_entre_nodos(nodos: List[Dict], roundtrip: bool) -> Optional[Dict]:
+    """Implementación de calcular_ruta_entre_nodos, sin coalescencia."""
     try:
         if len(nodos) < 2:
             print("Se necesitan al menos 2 nodos para calcular una ruta.")
@@ -192,63 +429,26 @@ def calcular_ruta_entre_nodos(nodos: List[Dict], roundtrip: bool = True) -> Opti
         if roundtrip:
             nodos_ruta.append(nodos[0])
         
-        # Encontrar nodos más cercanos a las calles para cada punto
-        nodos_optimizados = []
-        for nodo in nodos_ruta:
-            nodos_cercanos = obtener_nodos_cercanos(nodo['lat'], nodo['lon'], MAPA_CONFIG["radio_busqueda_nodos"])
-            if nodos_cercanos:
-                nodo_cercano = encontrar_nodo_mas_cercano(nodo['lat'], nodo['lon'], nodos_cercanos)
-                if nodo_cercano:
-                    nodos_optimizados.append(nodo_cercano)
-                else:
-                    nodos_optimizados.append(nodo)
-            else:
-                nodos_optimizados.append(nodo)
-        
-        # Crear string de coordenadas para OSRM (lon,lat)
-        coordenadas = ";".join([f"{nodo['lon']},{nodo['lat']}" for nodo in nodos_optimizados])
-        
-        # URL para OSRM Route API
-        route_url = f"{API_URLS['osrm_route']}/{coordenadas}?overview=full&steps=true"
-        
-        response = requests.get(route_url, timeout=MAPA_CONFIG["timeout_requests"])
-        response.raise_for_status()
+        backend = _backend_disponible()
         
-        route_data = response.json()
-        
-        if not route_data.get('routes') or len(route_data['routes']) == 0:
-            print("No se encontró una ruta con detalles.")
+        # Encontrar nodos más cercanos a las calles para cada punto
+        # (en paralelo, cada punto puede requerir una consulta a Overpass).
+        # Con el circuito de Overpass abierto se usan los puntos sin ajustar.
+        if backend.ajusta_nodos and not cliente_mapas.circuito_abierto('overpass'):
+            nodos_optimizados = list(_pool_ajuste_nodos.map(_en_hilo(ajustar_nodo_a_calle), nodos_ruta))
+        else:
+            nodos_optimizados = nodos_ruta
+        
+        try:
+            resultado = backend.calcular(nodos_optimizados)
+        except CircuitoAbierto as e:
+            print(f"{e}, se estima la ruta en línea recta.")
+            backend = obtener_backend_ruteo('linea_recta')
+            resultado = backend.calcular(nodos_optimizados)
+        if resultado is None:
             return None
         
-        # Obtener la primera ruta
-        route = route_data['routes'][0]
-        
-        # Extraer información básica
-        distancia_metros = route['distance']
-        duracion_segundos = route['duration']
-        
-        # Extraer pasos detallados
-        pasos = []
-        for leg in route['legs']:
-            for step in leg['steps']:
-                paso = {
-                    'nombre': step.get('name', 'Sin nombre'),
-                    'distancia': step.get('distance', 0),
-                    'duracion': step.get('duration', 0),
-                    'geometria': step.get('geometry', ''),
-                    'instruccion': step.get('maneuver', {}).get('instruction', '')
-                }
-                pasos.append(paso)
-        
-        resultado = {
-            'distancia_km': distancia_metros / 1000,
-            'duracion_minutos': duracion_segundos / 60,
-            'distancia_metros': distancia_metros,
-            'duracion_segundos': duracion_segundos,
-            'pasos': pasos,
-            'geometria_completa': route.get('geometry', ''),
-            'nodos_optimizados': nodos_optimizados
-        }
+        resultado = dict(resultado, nodos_optimizados=nodos_optimizados, backend=backend.nombre)
         
         print(f"Ruta calculada: {resultado['distancia_km']:.2f} km en {resultado['duracion_minutos']:.1f} minutos.")
         
@@ -261,100 +461,93 @@ def calcular_ruta_entre_nodos(nodos: List[Dict], roundtrip: bool = True) -> Opti
         print(f"Error inesperado al calcular la ruta: {e}")
         return None
 
-def decodificar_polyline(encoded):
+def _backend_disponible():
     """
-    Decodifica una cadena de polyline codificada de Google/OSRM a una lista de coordenadas.
-    Usa la librería polyline oficial para garantizar decodificación correcta.
-    
+    Retorna el backend de ruteo configurado o, si el circuito del servicio
+    del que depende está abierto, la estimación en línea recta.
+    """
+    backend = obtener_backend_ruteo()
+    if backend.servicio and cliente_mapas.circuito_abierto(backend.servicio):
+        print(f"Servicio '{backend.servicio}' no disponible, se estima la ruta en línea recta.")
+        backend = obtener_backend_ruteo('linea_recta')
+    return backend
+
+def invalidar_cache_rutas(nodos: List[Dict] = None):
+    """
+    Invalida rutas cacheadas de OSRM.
+
     Args:
-        encoded (str): Cadena polyline codificada
-    
-    Returns:
-        List[Tuple[float, float]]: Lista de tuplas (latitud, longitud)
+        nodos: Nodos ya ajustados a calles de la ruta a invalidar; si se
+            omite se vacía toda la caché de rutas
     """
-    if not encoded:
-        return []
-    
-    try:
-        # Usar la librería polyline oficial para decodificar
-        coordinates = polyline.decode(encoded)
-        
-        # Debug: mostrar las primeras coordenadas decodificadas
-        if coordinates and len(coordinates) > 0:
-            print(f"Debug decodificar_polyline: Primera coordenada (lat, lng): {coordinates[0]}")
-            print(f"Debug decodificar_polyline: Total de coordenadas: {len(coordinates)}")
-            
-            # Verificar si las coordenadas están en rango correcto para Chile
-            lat_test, lng_test = coordinates[0]
-            if -56 <= lat_test <= -17 and -109 <= lng_test <= -66:
-                print(f"✅ Coordenadas decodificadas correctamente en rango de Chile")
-            else:
-                print(f"⚠️ Advertencia: Coordenadas decodificadas fuera del rango de Chile")
-                print(f"Coordenada: Lat {lat_test}, Lng {lng_test}")
-        
-        return coordinates
-        
-    except Exception as e:
-        print(f"Error decodificando polyline con librería oficial: {e}")
-        print(f"Intentando decodificación manual...")
-        
-        # Fallback a decodificación manual
-        return decodificar_polyline_manual(encoded)
+    if nodos is None:
+        cache_rutas_osrm.limpiar()
+    else:
+        cache_rutas_osrm.invalidar(nodos, PERFIL_OSRM)
 
-def decodificar_polyline_manual(encoded):
+def _en_hilo(funcion):
     """
-    Implementación manual de decodificación de polyline como fallback.
+    Envuelve una función para ejecutarla en un hilo del pool, cerrando al
+    terminar la conexión a la BD que Django abre por hilo.
     """
-    if not encoded:
-        return []
+    def envoltura(*args, **kwargs):
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return envoltura
+
+def calcular_rutas_ida_y_regreso(origen: Tuple[float, float], destino: Tuple[float, float]) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Calcula en paralelo la ruta de ida (origen → destino) y la de regreso
+    (destino → origen).
+
+    Cada tramo se calcula de forma independiente: si uno falla, el otro se
+    retorna igualmente.
     
-    index = 0
-    lat = 0
-    lng = 0
-    coordinates = []
+    Args:
+        origen: Tupla (latitud, longitud) del punto de origen
+        destino: Tupla (latitud, longitud) del punto de destino
     
-    while index < len(encoded):
-        # Decodificar latitud
-        result = 1
-        shift = 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result += (b & 0x1f) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        
-        # Aplicar correctamente el signo para latitud
-        delta_lat = ~(result >> 1) if result & 1 else result >> 1
-        lat += delta_lat
-        
-        # Decodificar longitud
-        result = 1
-        shift = 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result += (b & 0x1f) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        
-        # Aplicar correctamente el signo para longitud
-        delta_lng = ~(result >> 1) if result & 1 else result >> 1
-        lng += delta_lng
-        
-        # Convertir a coordenadas decimales
-        final_lat = lat / 1e5
-        final_lng = lng / 1e5
-        
-        coordinates.append((final_lat, final_lng))
+    Returns:
+        tuple: (ruta_ida, ruta_regreso), cada una con el formato de
+        calcular_ruta_entre_nodos o None si no se pudo calcular
+    """
+    nodo_origen = {'lat': origen[0], 'lon': origen[1]}
+    nodo_destino = {'lat': destino[0], 'lon': destino[1]}
+
+    tramos = {
+        'ida': _pool_rutas.submit(_en_hilo(calcular_ruta_entre_nodos), [nodo_origen, nodo_destino], roundtrip=False),
+        'regreso': _pool_rutas.submit(_en_hilo(calcular_ruta_entre_nodos), [nodo_destino, nodo_origen], roundtrip=False),
+    }
+
+    resultados = {}
+    for nombre, futuro in tramos.items():
+        try:
+            resultados[nombre] = futuro.result()
+        except Exception as e:
+            print(f"Error al calcular la ruta de {nombre}: {e}")
+            resultados[nombre] = None
+
+    return resultados['ida'], resultados['regreso']
+
+def decodificar_polyline(encoded, precision: int = 5):
+    """
+    Decodifica una cadena de polyline codificada de Google/OSRM a una lista de coordenadas.
     
-    print(f"Debug decodificar_polyline_manual: {len(coordinates)} coordenadas decodificadas")
-    if coordinates:
-        print(f"Primera coordenada manual: {coordinates[0]}")
+    Args:
+        encoded (str): Cadena polyline codificada
+        precision (int): Decimales de la codificación (5 para OSRM/Google, 6 para OSM)
     
-    return coordinates
+    Returns:
+        List[List[float]]: Lista de pares [latitud, longitud]; vacía si la
+        cadena está vacía o no es un polyline válido
+    """
+    try:
+        return polilineas.decodificar_lista(encoded, precision)
+    except ValueError as e:
+        logger.warning("Polyline inválido (%s): %.40s", e, encoded)
+        return []
 
 def calcular_y_guardar_ruta_paquete(paquete):
     """
@@ -380,37 +573,20 @@ def calcular_y_guardar_ruta_paquete(paquete):
         if not origen_coords or not destino_coords:
             return None, "No se pudieron obtener las coordenadas para las direcciones"
         
-        # Calcular ruta de ida
-        nodos_ida = [
-            {'lat': origen_coords[0], 'lon': origen_coords[1]},
-            {'lat': destino_coords[0], 'lon': destino_coords[1]}
-        ]
-        
-        ruta_ida = calcular_ruta_entre_nodos(nodos_ida, roundtrip=False)
-        
-        # Calcular ruta de regreso
-        nodos_regreso = [
-            {'lat': destino_coords[0], 'lon': destino_coords[1]},
-            {'lat': origen_coords[0], 'lon': origen_coords[1]}
-        ]
-        
-        ruta_regreso = calcular_ruta_entre_nodos(nodos_regreso, roundtrip=False)
+        # Calcular rutas de ida y de regreso en paralelo
+        ruta_ida, ruta_regreso = calcular_rutas_ida_y_regreso(origen_coords, destino_coords)
         
         if not ruta_ida or not ruta_regreso:
             return None, "No se pudieron calcular las rutas usando OSRM"
         
-        # Procesar coordenadas para el frontend
-        coordenadas_ida = []
-        coordenadas_regreso = []
-        
-        if ruta_ida.get('geometria_completa'):
-            coordenadas_ida = decodificar_polyline(ruta_ida['geometria_completa'])
-            coordenadas_ida = [[lat, lng] for lat, lng in coordenadas_ida]
-        
-        if ruta_regreso.get('geometria_completa'):
-            coordenadas_regreso = decodificar_polyline(ruta_regreso['geometria_completa'])
-            coordenadas_regreso = [[lat, lng] for lat, lng in coordenadas_regreso]
+        # La estimación en línea recta (servicio de ruteo caído) sirve para
+        # mostrar un mapa, pero no se guarda como si fuera la ruta real
+        if obtener_backend_ruteo().nombre != 'linea_recta' and 'linea_recta' in (
+            ruta_ida.get('backend'), ruta_regreso.get('backend')
+        ):
+            return None, "Servicio de ruteo no disponible; se reintentará más tarde"
         
+        # Las coordenadas no se guardan: Ruta las decodifica de los polylines
         # Crear o actualizar ruta en la base de datos
         ruta, created = Ruta.objects.update_or_create(
             paquete=paquete,
@@ -418,13 +594,11 @@ def calcular_y_guardar_ruta_paquete(paquete):
                 'tipo_ruta': 'completa',
                 
                 # Datos de ida
-                'ruta_ida_coordenadas': coordenadas_ida,
                 'ruta_ida_polyline': ruta_ida.get('geometria_completa', ''),
                 'distancia_ida_km': ruta_ida.get('distancia_km', 0),
                 'duracion_ida_minutos': int(ruta_ida.get('duracion_minutos', 0)),
                 
                 # Datos de regreso
-                'ruta_regreso_coordenadas': coordenadas_regreso,
                 'ruta_regreso_polyline': ruta_regreso.get('geometria_completa', ''),
                 'distancia_regreso_km': ruta_regreso.get('distancia_km', 0),
                 'duracion_regreso_minutos': int(ruta_regreso.get('duracion_minutos', 0)),
@@ -436,6 +610,8 @@ def calcular_y_guardar_ruta_paquete(paquete):
                 'origen_lng': origen_coords[1],
                 'destino_lat': destino_coords[0],
                 'destino_lng': destino_coords[1],
+                # auto_now_add solo la fija al crear la ruta
+                'fecha_calculo': timezone.now(),
             }
         )
         
@@ -0,0 +1,184 @@
+"""
+Versiones asíncronas de la geocodificación y el cálculo de rutas de
+maps/utilities.py, usadas por las vistas async.
+
+Las consultas a Nominatim, Overpass y OSRM se hacen con httpx a través de
+cliente_mapas_async, por lo que las de una misma solicitud (geocodificar
+inicio y destino, ajustar los puntos a calles, los tramos de ida y regreso)
+pueden estar en curso a la vez sin ocupar un hilo cada una. Las cachés, los
+circuit breakers y las alternativas ante fallos son los de la versión
+síncrona.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from asgiref.sync import sync_to_async
+from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
+
+from .cache import cache_geocodificacion, cache_teselas_nodos, normalizar_direccion
+from .clientes import cliente_mapas
+from .clientes_async import cliente_mapas_async
+from .coalescencia import coalescedor_geocodificacion, coalescedor_rutas
+from .constants import API_URLS, MAPA_CONFIG
+from .indice_vial import obtener_indice_vial
+from .resiliencia import CircuitoAbierto, PlazoAgotado
+from .ruteo import obtener_backend_ruteo
+from .utilities import (
+    _backend_disponible, _consulta_tesela, _nodos_en_radio, _nodos_respuesta_overpass,
+    _teselas_alrededor, clave_ruta, encontrar_nodo_mas_cercano,
+)
+
+
+async def obtener_coordenadas_async(direccion: str) -> Optional[Tuple[float, float]]:
+    """
+    Igual que obtener_coordenadas (con caché y coalescencia), consultando
+    Nominatim con el cliente asíncrono.
+
+    Returns:
+        tuple: (latitud, longitud), o None si la dirección no se encuentra
+
+    Raises:
+        GeocoderTimedOut: Si Nominatim no respondió a tiempo o su circuito está abierto
+    """
+    return await coalescedor_geocodificacion.ejecutar_async(
+        normalizar_direccion(direccion), cache_geocodificacion.obtener_async, direccion, _geocodificar_nominatim_async
+    )
+
+
+async def _geocodificar_nominatim_async(direccion: str) -> Optional[Tuple[float, float]]:
+    """Consulta la API de búsqueda de Nominatim directamente, sin pasar por la caché."""
+    try:
+        response = await cliente_mapas_async.get(
+            'nominatim', API_URLS["nominatim"], params={'q': direccion, 'format': 'json', 'limit': 1}
+        )
+        response.raise_for_status()
+        resultados = response.json()
+    except (CircuitoAbierto, PlazoAgotado, httpx.TimeoutException, asyncio.TimeoutError) as e:
+        # Los llamadores ya manejan GeocoderTimedOut como "servicio no disponible"
+        raise GeocoderTimedOut(str(e))
+    except httpx.HTTPError as e:
+        raise GeocoderUnavailable(str(e))
+
+    if resultados:
+        return (float(resultados[0]['lat']), float(resultados[0]['lon']))
+    return None  # Dirección no encontrada o mal escrita
+
+
+async def obtener_nodos_cercanos_async(lat: float, lon: float, radius: int = 50) -> List[Dict]:
+    """Igual que obtener_nodos_cercanos, descargando las teselas que falten en paralelo."""
+    listas_nodos = await asyncio.gather(*(
+        cache_teselas_nodos.obtener_async(tesela, _descargar_nodos_tesela_async)
+        for tesela in _teselas_alrededor(lat, lon, radius)
+    ))
+    return _nodos_en_radio(lat, lon, radius, listas_nodos)
+
+
+async def _descargar_nodos_tesela_async(tesela: str) -> Optional[List[List]]:
+    """Versión asíncrona de _descargar_nodos_tesela (None si la consulta falló)."""
+    try:
+        response = await cliente_mapas_async.post(
+            'overpass', API_URLS["overpass"], data={'data': _consulta_tesela(tesela)}
+        )
+        response.raise_for_status()
+        data = response.json()
+    except (httpx.HTTPError, ValueError, CircuitoAbierto, PlazoAgotado, asyncio.TimeoutError) as e:
+        print(f"Error al obtener nodos de la tesela {tesela}: {e}")
+        return None
+
+    return _nodos_respuesta_overpass(data)
+
+
+async def ajustar_nodo_a_calle_async(nodo: Dict, radius: int = None) -> Dict:
+    """Igual que ajustar_nodo_a_calle, consultando Overpass con el cliente asíncrono."""
+    radius = radius or MAPA_CONFIG["radio_busqueda_nodos"]
+
+    # La primera llamada puede cargar el extracto OSM: se hace fuera del event loop
+    indice = await sync_to_async(obtener_indice_vial, thread_sensitive=False)()
+    if indice is not None and indice.cubre(nodo['lat'], nodo['lon']):
+        return indice.nodo_mas_cercano(nodo['lat'], nodo['lon'], radius) or nodo
+
+    nodos_cercanos = await obtener_nodos_cercanos_async(nodo['lat'], nodo['lon'], radius)
+    return encontrar_nodo_mas_cercano(nodo['lat'], nodo['lon'], nodos_cercanos) or nodo
+
+
+async def calcular_ruta_entre_nodos_async(nodos: List[Dict], roundtrip: bool = True) -> Optional[Dict]:
+    """
+    Igual que calcular_ruta_entre_nodos. Los puntos se ajustan a calles en
+    paralelo, el backend se consulta con `calcular_async` y las llamadas
+    concurrentes con los mismos nodos comparten un único cálculo.
+
+    Returns:
+        Dict: Información de la ruta con distancia, duración y pasos, o None si hay error
+    """
+    return await coalescedor_rutas.ejecutar_async(
+        clave_ruta(nodos, roundtrip), _calcular_ruta_entre_nodos_async, nodos, roundtrip
+    )
+
+
+async def _calcular_ruta_entre_nodos_async(nodos: List[Dict], roundtrip: bool) -> Optional[Dict]:
+    try:
+        if len(nodos) < 2:
+            print("Se necesitan al menos 2 nodos para calcular una ruta.")
+            return None
+
+        nodos_ruta = nodos.copy()
+        if roundtrip:
+            nodos_ruta.append(nodos[0])
+
+        backend = _backend_disponible()
+
+        if backend.ajusta_nodos and not cliente_mapas.circuito_abierto('overpass'):
+            nodos_optimizados = list(await asyncio.gather(*(ajustar_nodo_a_calle_async(nodo) for nodo in nodos_ruta)))
+        else:
+            nodos_optimizados = nodos_ruta
+
+        try:
+            resultado = await backend.calcular_async(nodos_optimizados)
+        except CircuitoAbierto as e:
+            print(f"{e}, se estima la ruta en línea recta.")
+            backend = obtener_backend_ruteo('linea_recta')
+            resultado = backend.calcular(nodos_optimizados)
+        if resultado is None:
+            return None
+
+        resultado = dict(resultado, nodos_optimizados=nodos_optimizados, backend=backend.nombre)
+
+        print(f"Ruta calculada: {resultado['distancia_km']:.2f} km en {resultado['duracion_minutos']:.1f} minutos.")
+
+        return resultado
+
+    except httpx.HTTPError as e:
+        print(f"Error al calcular la ruta: {e}")
+        return None
+    except Exception as e:
+        print(f"Error inesperado al calcular la ruta: {e}")
+        return None
+
+
+async def calcular_rutas_ida_y_regreso_async(origen: Tuple[float, float], destino: Tuple[float, float]) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Igual que calcular_rutas_ida_y_regreso, con ambos tramos calculados
+    concurrentemente en el event loop.
+
+    Returns:
+        tuple: (ruta_ida, ruta_regreso), cada una None si no se pudo calcular
+    """
+    nodo_origen = {'lat': origen[0], 'lon': origen[1]}
+    nodo_destino = {'lat': destino[0], 'lon': destino[1]}
+
+    tramos = await asyncio.gather(
+        calcular_ruta_entre_nodos_async([nodo_origen, nodo_destino], roundtrip=False),
+        calcular_ruta_entre_nodos_async([nodo_destino, nodo_origen], roundtrip=False),
+        return_exceptions=True,
+    )
+
+    resultados = []
+    for nombre, tramo in zip(('ida', 'regreso'), tramos):
+        if isinstance(tramo, Exception):
+            print(f"Error al calcular la ruta de {nombre}: {tramo}")
+            tramo = None
+        resultados.append(tramo)
+
+    return resultados[0], resultados[1]
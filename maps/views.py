@@ -1,9 +1,33 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .utilities import obtener_coordenadas, calcular_ruta_entre_nodos, calcular_datos_ruta, decodificar_polyline
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.utils.text import compress_string
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
+from .utilities import (
+    obtener_coordenadas, calcular_rutas_ida_y_regreso, calcular_datos_ruta, decodificar_polyline,
+    ajustar_nodo_a_calle, calcular_ruta_entre_nodos, obtener_calles_cercanas, nombre_calle_cercana,
+)
+from .utilities_async import obtener_coordenadas_async, calcular_rutas_ida_y_regreso_async
+from . import polilineas
+from .constants import MAPA_CONFIG
 from geopy.exc import GeocoderTimedOut
+import asyncio
+import hashlib
 import json
+import logging
+import re
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli las respuestas se comprimen solo con gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
 
 @login_required(login_url='/accounts/login/')
 def map(request):
@@ -23,158 +47,12 @@ def map(request):
             messages.error(request, "No se pudo geolocalizar las direcciones.")
             return redirect(request.META.get('HTTP_REFERER', '/'))
         
-        # Preparar nodos para la ruta de ida
-        nodos_ida = [
-            {'lat': inicio_coordenada[0], 'lon': inicio_coordenada[1]},
-            {'lat': destino_coordenada[0], 'lon': destino_coordenada[1]}
-        ]
-        
-        # Preparar nodos para la ruta de regreso
-        nodos_regreso = [
-            {'lat': destino_coordenada[0], 'lon': destino_coordenada[1]},
-            {'lat': inicio_coordenada[0], 'lon': inicio_coordenada[1]}
-        ]
-        
-        # Calcular ruta de ida y de regreso
-        ruta_ida = calcular_ruta_entre_nodos(nodos_ida, roundtrip=False)
-        ruta_regreso = calcular_ruta_entre_nodos(nodos_regreso, roundtrip=False)
+        # Calcular ruta de ida y de regreso (en paralelo)
+        ruta_ida, ruta_regreso = calcular_rutas_ida_y_regreso(inicio_coordenada, destino_coordenada)
         
         # Preparar datos para el template
-        def procesar_ruta(ruta_detallada, nombre_ruta, color_ruta):
-            """Función auxiliar para procesar una ruta y extraer sus coordenadas"""
-            if not ruta_detallada:
-                return None
-                
-            coordenadas_ruta = []
-            
-            # Si hay geometría completa, decodificarla
-            if ruta_detallada.get('geometria_completa'):
-                try:
-                    # Decodificar la geometría polyline de OSRM usando la librería oficial
-                    coordenadas_decodificadas = decodificar_polyline(ruta_detallada['geometria_completa'])
-                    
-                    print(f"Polyline {nombre_ruta} decodificado, primeras 3 coordenadas: {coordenadas_decodificadas[:3]}")
-                    
-                    # Convertir a formato [lat, lng] para Leaflet
-                    coordenadas_ruta = [[lat, lng] for lat, lng in coordenadas_decodificadas]
-                    
-                    # Verificar si las coordenadas están en el rango correcto para Chile
-                    if coordenadas_ruta and len(coordenadas_ruta) > 0:
-                        primera_lat, primera_lng = coordenadas_ruta[0]
-                        print(f"Primera coordenada {nombre_ruta}: [{primera_lat}, {primera_lng}]")
-                        
-                        # Verificar rango válido para Chile: Lat -56 a -17, Lng -109 a -66
-                        if -56 <= primera_lat <= -17 and -109 <= primera_lng <= -66:
-                            print(f"✅ Coordenadas {nombre_ruta} en rango válido para Chile")
-                        else:
-                            print(f"⚠️ Coordenadas {nombre_ruta} fuera del rango de Chile")
-                            print(f"Lat: {primera_lat}, Lng: {primera_lng}")
-                            print(f"Usando línea recta como fallback para {nombre_ruta}")
-                            # En caso de coordenadas fuera de rango, usar línea recta
-                            if "Ida" in nombre_ruta:
-                                coordenadas_ruta = [[inicio_coordenada[0], inicio_coordenada[1]], 
-                                                  [destino_coordenada[0], destino_coordenada[1]]]
-                            else:  # regreso
-                                coordenadas_ruta = [[destino_coordenada[0], destino_coordenada[1]], 
-                                                  [inicio_coordenada[0], inicio_coordenada[1]]]
-                    
-                except Exception as e:
-                    print(f"Error decodificando polyline {nombre_ruta}: {e}")
-                    # En caso de error, usar coordenadas básicas
-                    if "Ida" in nombre_ruta:
-                        coordenadas_ruta = [[inicio_coordenada[0], inicio_coordenada[1]], 
-                                          [destino_coordenada[0], destino_coordenada[1]]]
-                    else:  # regreso
-                        coordenadas_ruta = [[destino_coordenada[0], destino_coordenada[1]], 
-                                          [inicio_coordenada[0], inicio_coordenada[1]]]
-            else:
-                # Si no hay geometría, usar coordenadas básicas
-                if "Ida" in nombre_ruta:
-                    coordenadas_ruta = [[inicio_coordenada[0], inicio_coordenada[1]], 
-                                      [destino_coordenada[0], destino_coordenada[1]]]
-                else:  # regreso
-                    coordenadas_ruta = [[destino_coordenada[0], destino_coordenada[1]], 
-                                      [inicio_coordenada[0], inicio_coordenada[1]]]
-            
-            # Procesar pasos para obtener coordenadas detalladas
-            pasos_coordenadas = []
-            for paso in ruta_detallada.get('pasos', []):
-                paso_coords = []
-                if paso.get('geometria'):
-                    try:
-                        # Decodificar geometría del paso individual usando la librería oficial
-                        coords_paso = decodificar_polyline(paso['geometria'])
-                        paso_coords = [[lat, lng] for lat, lng in coords_paso]
-                        
-                    except Exception as e:
-                        print(f"Error decodificando polyline del paso {nombre_ruta}: {e}")
-                        # Si falla, usar coordenadas básicas
-                        if "Ida" in nombre_ruta:
-                            paso_coords = [[inicio_coordenada[0], inicio_coordenada[1]], 
-                                         [destino_coordenada[0], destino_coordenada[1]]]
-                        else:  # regreso
-                            paso_coords = [[destino_coordenada[0], destino_coordenada[1]], 
-                                         [inicio_coordenada[0], inicio_coordenada[1]]]
-                
-                pasos_coordenadas.append({
-                    'nombre': paso['nombre'],
-                    'instruccion': paso.get('instruccion', ''),
-                    'distancia': paso.get('distancia', 0),
-                    'coordenadas': paso_coords
-                })
-            
-            return {
-                'coordenadas': coordenadas_ruta,
-                'distancia_km': ruta_detallada.get('distancia_km', 0),
-                'duracion_minutos': round(ruta_detallada.get('duracion_minutos', 0), 1),
-                'color': color_ruta,
-                'nombre': nombre_ruta,
-                'pasos': pasos_coordenadas
-            }
-        
-        # Procesar ruta de ida
-        ruta_ida_procesada = procesar_ruta(ruta_ida, "Ruta de Ida", '#3388ff')
-        # Procesar ruta de regreso
-        ruta_regreso_procesada = procesar_ruta(ruta_regreso, "Ruta de Regreso", '#ff8833')
-        
-        # Preparar datos combinados para el template
-        rutas_data = []
-        distancia_total = 0
-        duracion_total = 0
-        
-        if ruta_ida_procesada:
-            rutas_data.append(ruta_ida_procesada)
-            distancia_total += ruta_ida_procesada['distancia_km']
-            duracion_total += ruta_ida_procesada['duracion_minutos']
-            
-        if ruta_regreso_procesada:
-            rutas_data.append(ruta_regreso_procesada)
-            distancia_total += ruta_regreso_procesada['distancia_km']
-            duracion_total += ruta_regreso_procesada['duracion_minutos']
-        
-        # Si no hay rutas válidas, usar datos básicos
-        if not rutas_data:
-            datos_basicos = calcular_datos_ruta(inicio_coordenada, destino_coordenada)
-            rutas_data = [{
-                'coordenadas': [[inicio_coordenada[0], inicio_coordenada[1]], 
-                              [destino_coordenada[0], destino_coordenada[1]]],
-                'distancia_km': datos_basicos.get('distancia_km', 0),
-                'duracion_minutos': datos_basicos.get('duracion_estimada_minutos', 0),
-                'color': '#ff3388',
-                'nombre': 'Ruta Básica',
-                'pasos': []
-            }]
-            distancia_total = datos_basicos.get('distancia_km', 0)
-            duracion_total = datos_basicos.get('duracion_estimada_minutos', 0)
-        
-        contexto = {
-            'rutas_data': json.dumps(rutas_data),  # Lista de rutas (ida y regreso)
-            'inicio_direccion': inicio,
-            'destino_direccion': destino,
-            'distancia_total': distancia_total,
-            'duracion_total': duracion_total,
-            'pagina_anterior': request.META.get('HTTP_REFERER', '/'),  # URL de la página anterior
-        }
+        contexto = _contexto_mapa(request, inicio, destino, inicio_coordenada, destino_coordenada,
+                                  ruta_ida, ruta_regreso)
         
         return render(request, 'map.html', contexto)
 
@@ -185,13 +63,204 @@ def map(request):
         messages.error(request, f"Error al calcular la ruta: {str(e)}")
         return redirect(request.META.get('HTTP_REFERER', '/'))
 
+
+def _procesar_ruta(ruta_detallada, nombre_ruta, color_ruta, inicio_coordenada, destino_coordenada,
+                   formato='coordenadas', precision=None):
+    """
+    Función auxiliar para procesar una ruta y extraer sus coordenadas.
+
+    Con formato 'polyline' la geometría completa y la de cada paso se
+    entregan codificadas (las decodifica polyline.js en el navegador), y con
+    `precision` se cuantizan a esa cantidad de decimales.
+    """
+    if not ruta_detallada:
+        return None
+
+    # Línea recta entre los extremos, usada cuando la geometría no sirve
+    if "Ida" in nombre_ruta:
+        linea_recta = [[inicio_coordenada[0], inicio_coordenada[1]],
+                       [destino_coordenada[0], destino_coordenada[1]]]
+    else:  # regreso
+        linea_recta = [[destino_coordenada[0], destino_coordenada[1]],
+                       [inicio_coordenada[0], inicio_coordenada[1]]]
+
+    if formato == 'polyline':
+        return _procesar_ruta_polyline(ruta_detallada, nombre_ruta, color_ruta, linea_recta, precision)
+
+    # Decodificar la geometría completa (pares [lat, lng] para Leaflet)
+    coordenadas_ruta = decodificar_polyline(ruta_detallada.get('geometria_completa'))
+
+    if coordenadas_ruta:
+        # Verificar rango válido para Chile: Lat -56 a -17, Lng -109 a -66
+        primera_lat, primera_lng = coordenadas_ruta[0]
+        if not _en_rango_chile(primera_lat, primera_lng):
+            logger.warning("Coordenadas de %s fuera del rango de Chile (%s, %s), se usa línea recta",
+                           nombre_ruta, primera_lat, primera_lng)
+            coordenadas_ruta = linea_recta
+    else:
+        # Sin geometría (o inválida), usar coordenadas básicas
+        coordenadas_ruta = linea_recta
+    logger.debug("%s: %d coordenadas", nombre_ruta, len(coordenadas_ruta))
+
+    # Procesar pasos para obtener coordenadas detalladas
+    pasos_coordenadas = []
+    for paso in ruta_detallada.get('pasos', []):
+        paso_coords = []
+        if paso.get('geometria'):
+            paso_coords = decodificar_polyline(paso['geometria']) or linea_recta
+
+        pasos_coordenadas.append({
+            'nombre': paso['nombre'],
+            'instruccion': paso.get('instruccion', ''),
+            'distancia': paso.get('distancia', 0),
+            'coordenadas': paso_coords
+        })
+
+    return {
+        'coordenadas': coordenadas_ruta,
+        'distancia_km': ruta_detallada.get('distancia_km', 0),
+        'duracion_minutos': round(ruta_detallada.get('duracion_minutos', 0), 1),
+        'color': color_ruta,
+        'nombre': nombre_ruta,
+        'pasos': pasos_coordenadas
+    }
+
+
+def _en_rango_chile(lat, lng):
+    """Rango válido para Chile: Lat -56 a -17, Lng -109 a -66."""
+    return -56 <= lat <= -17 and -109 <= lng <= -66
+
+
+def _procesar_ruta_polyline(ruta_detallada, nombre_ruta, color_ruta, linea_recta, precision):
+    """Igual que _procesar_ruta, sin decodificar: geometrías como polylines."""
+    precision_salida = precision or 5
+    linea_recta_codificada = polilineas.codificar(linea_recta, precision_salida)
+
+    def recodificar(codificado):
+        # Cuantizar solo si se pidió; un polyline inválido se reemplaza por la línea recta
+        if not codificado:
+            return ''
+        try:
+            return polilineas.cuantizar(codificado, precision) if precision else codificado
+        except ValueError as e:
+            logger.warning("Polyline inválido en %s: %s", nombre_ruta, e)
+            return linea_recta_codificada
+
+    geometria = recodificar(ruta_detallada.get('geometria_completa'))
+    primer_punto = polilineas.primer_punto(geometria, precision_salida)
+    if primer_punto is None:
+        geometria = linea_recta_codificada
+    elif not _en_rango_chile(*primer_punto):
+        logger.warning("Coordenadas de %s fuera del rango de Chile %s, se usa línea recta",
+                       nombre_ruta, primer_punto)
+        geometria = linea_recta_codificada
+
+    pasos = [
+        {
+            'nombre': paso['nombre'],
+            'instruccion': paso.get('instruccion', ''),
+            'distancia': paso.get('distancia', 0),
+            'polyline': recodificar(paso.get('geometria')),
+        }
+        for paso in ruta_detallada.get('pasos', [])
+    ]
+
+    return {
+        'polyline': geometria,
+        'precision': precision_salida,
+        'distancia_km': ruta_detallada.get('distancia_km', 0),
+        'duracion_minutos': round(ruta_detallada.get('duracion_minutos', 0), 1),
+        'color': color_ruta,
+        'nombre': nombre_ruta,
+        'pasos': pasos
+    }
+
+
+def _formato_rutas(request):
+    """
+    Lee el formato de las geometrías del mapa desde los parámetros GET.
+
+    Parámetros GET:
+    - formato: 'polyline' o 'coordenadas' (por defecto MAPA_CONFIG["formato_rutas_mapa"])
+    - precision: Decimales a los que se cuantizan los polylines (1 a 5)
+
+    Returns:
+        tuple: (formato, precision o None)
+    """
+    formato = request.GET.get('formato', MAPA_CONFIG["formato_rutas_mapa"])
+    if formato not in ('polyline', 'coordenadas'):
+        formato = MAPA_CONFIG["formato_rutas_mapa"]
+    try:
+        precision = int(request.GET.get('precision', ''))
+    except ValueError:
+        precision = None
+    if precision is not None and not 1 <= precision <= 5:
+        precision = None
+    return formato, precision
+
+
+def _contexto_mapa(request, inicio, destino, inicio_coordenada, destino_coordenada, ruta_ida, ruta_regreso):
+    """
+    Arma el contexto del template map.html a partir de las rutas de ida y
+    regreso ya calculadas (compartido por las vistas map y map_async).
+    """
+    formato, precision = _formato_rutas(request)
+    # Procesar ruta de ida
+    ruta_ida_procesada = _procesar_ruta(ruta_ida, "Ruta de Ida", '#3388ff', inicio_coordenada, destino_coordenada,
+                                        formato, precision)
+    # Procesar ruta de regreso
+    ruta_regreso_procesada = _procesar_ruta(ruta_regreso, "Ruta de Regreso", '#ff8833', inicio_coordenada, destino_coordenada,
+                                            formato, precision)
+
+    # Preparar datos combinados para el template
+    rutas_data = []
+    distancia_total = 0
+    duracion_total = 0
+
+    if ruta_ida_procesada:
+        rutas_data.append(ruta_ida_procesada)
+        distancia_total += ruta_ida_procesada['distancia_km']
+        duracion_total += ruta_ida_procesada['duracion_minutos']
+
+    if ruta_regreso_procesada:
+        rutas_data.append(ruta_regreso_procesada)
+        distancia_total += ruta_regreso_procesada['distancia_km']
+        duracion_total += ruta_regreso_procesada['duracion_minutos']
+
+    # Si no hay rutas válidas, usar datos básicos
+    if not rutas_data:
+        datos_basicos = calcular_datos_ruta(inicio_coordenada, destino_coordenada)
+        rutas_data = [{
+            'coordenadas': [[inicio_coordenada[0], inicio_coordenada[1]], 
+                          [destino_coordenada[0], destino_coordenada[1]]],
+            'distancia_km': datos_basicos.get('distancia_km', 0),
+            'duracion_minutos': datos_basicos.get('duracion_estimada_minutos', 0),
+            'color': '#ff3388',
+            'nombre': 'Ruta Básica',
+            'pasos': []
+        }]
+        distancia_total = datos_basicos.get('distancia_km', 0)
+        duracion_total = datos_basicos.get('duracion_estimada_minutos', 0)
+
+    contexto = {
+        'rutas_data': json.dumps(rutas_data, separators=(',', ':')),  # Lista de rutas (ida y regreso)
+        'inicio_direccion': inicio,
+        'destino_direccion': destino,
+        'distancia_total': distancia_total,
+        'duracion_total': duracion_total,
+        'pagina_anterior': request.META.get('HTTP_REFERER', '/'),  # URL de la página anterior
+    }
+
+    return contexto
+
+
 @login_required(login_url='/accounts/login/')
 def map_paquete(request, paquete_id):
     """
     Vista para mostrar la ruta de un paquete específico desde la base de datos
     """
     try:
-        from api.models import Paquete, Ruta
+        from api.models import CAMPOS_GEOMETRIA_RUTA, Paquete, Ruta
         
         # Obtener el paquete
         try:
@@ -200,37 +269,17 @@ def map_paquete(request, paquete_id):
             messages.error(request, f"Paquete con ID {paquete_id} no encontrado.")
             return redirect(request.META.get('HTTP_REFERER', '/'))
         
-        # Verificar si existe una ruta calculada
+        # Verificar si existe una ruta calculada (la geometría la carga el mapa desde api_ruta_paquete)
         try:
-            ruta = paquete.ruta
+            ruta = Ruta.objects.defer(*CAMPOS_GEOMETRIA_RUTA).get(paquete=paquete)
         except Ruta.DoesNotExist:
-            messages.warning(request, "Ruta no calculada para este paquete. Calculando...")
-            # Intentar calcular la ruta
-            from .utilities import calcular_y_guardar_ruta_paquete
-            ruta, error = calcular_y_guardar_ruta_paquete(paquete)
-            
-            if error:
-                messages.error(request, f"No se pudo calcular la ruta: {error}")
-                return redirect(request.META.get('HTTP_REFERER', '/'))
-        
-        # Preparar datos de rutas usando polylines si están disponibles
-        from api.serializers import RutaSerializer
-        serializer = RutaSerializer(ruta)
+            # Encolar el cálculo con la máxima prioridad en vez de calcularlo aquí
+            from .cola_rutas import encolar_calculo_ruta, PRIORIDAD_VISUALIZACION
+            encolar_calculo_ruta(paquete, prioridad=PRIORIDAD_VISUALIZACION)
+            messages.info(request, "La ruta de este paquete se está calculando. Intente nuevamente en unos segundos.")
+            return redirect(request.META.get('HTTP_REFERER', '/'))
         
-        if ruta.ruta_ida_polyline and ruta.ruta_regreso_polyline:
-            rutas_data = serializer.get_rutas_data_polyline(ruta)
-        else:
-            rutas_data = serializer.get_rutas_data(ruta)
-        
-        contexto = {
-            'rutas_data': json.dumps(rutas_data),
-            'inicio_direccion': ruta.origen_direccion,
-            'destino_direccion': ruta.destino_direccion,
-            'distancia_total': ruta.distancia_total_km,
-            'duracion_total': ruta.duracion_total_minutos,
-            'paquete': paquete,
-            'pagina_anterior': request.META.get('HTTP_REFERER', '/'),
-        }
+        contexto = _contexto_ruta_paquete(request, paquete, ruta)
         
         return render(request, 'map.html', contexto)
         
@@ -239,6 +288,287 @@ def map_paquete(request, paquete_id):
         return redirect(request.META.get('HTTP_REFERER', '/'))
 
 
+def _contexto_ruta_paquete(request, paquete, ruta):
+    """
+    Arma el contexto de map.html para la ruta guardada de un paquete.
+
+    La geometría no se incrusta en la página: el mapa la pide a
+    api_ruta_paquete, cuya respuesta el navegador puede cachear.
+    """
+    contexto = {
+        'rutas_url': reverse('maps:api_ruta_paquete', args=[paquete.id]),
+        'inicio_direccion': ruta.origen_direccion,
+        'destino_direccion': ruta.destino_direccion,
+        'distancia_total': ruta.distancia_total_km,
+        'duracion_total': ruta.duracion_total_minutos,
+        'paquete': paquete,
+        'pagina_anterior': request.META.get('HTTP_REFERER', '/'),
+    }
+
+    return contexto
+
+
+# Tamaño mínimo para que comprimir valga la pena (el mismo de GZipMiddleware)
+_TAMANO_MINIMO_COMPRESION = 200
+
+
+@require_GET
+def api_ruta_paquete(request, paquete_id):
+    """
+    Geometría de la ruta de un paquete como polylines codificados, en JSON.
+
+    Parámetros GET:
+    - zoom: Nivel de zoom de Leaflet; entrega solo el polyline simplificado
+      para ese zoom (ver Ruta.polyline_para_zoom)
+
+    La respuesta lleva un ETag fuerte derivado de los campos que entrega
+    (fecha_calculo cambia cada vez que cambia la geometría, y las distancias,
+    duraciones y extremos se incluyen tal cual) y Cache-Control privado, por
+    lo que las visitas repetidas se responden con 304 sin leer la geometría
+    de la BD.
+    Se comprime con brotli o gzip según Accept-Encoding; cada codificación
+    tiene su propio ETag para que siga siendo fuerte.
+
+    Respuestas:
+    - 200: {paquete, fecha_calculo, distancia_total_km, duracion_total_minutos,
+      origen, destino, rutas}
+    - 202: La ruta no existe y se encoló su cálculo
+    - 304: El ETag enviado en If-None-Match sigue vigente
+    - 401 / 404: Sin sesión iniciada / paquete inexistente
+    """
+    from api.models import Paquete, Ruta
+    from api.serializers import RutaSerializer
+
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Se requiere iniciar sesión.'}, status=401)
+
+    # Solo los campos escalares para validar el ETag; la geometría se lee después
+    version = Ruta.objects.filter(paquete_id=paquete_id).values_list(*CAMPOS_VERSION_RUTA).first()
+    if version is None:
+        paquete = Paquete.objects.filter(id=paquete_id).first()
+        if paquete is None:
+            return JsonResponse({'error': f'Paquete con ID {paquete_id} no encontrado.'}, status=404)
+        from .cola_rutas import encolar_calculo_ruta, PRIORIDAD_VISUALIZACION
+        encolar_calculo_ruta(paquete, prioridad=PRIORIDAD_VISUALIZACION)
+        return JsonResponse({'estado': 'calculando'}, status=202)
+
+    codificacion = _codificacion_aceptada(request)
+    etag = _etag_ruta(paquete_id, version, request.GET.get('zoom', ''), codificacion)
+
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+    else:
+        ruta = Ruta.objects.get(id=version[0])
+        datos = {
+            'paquete': paquete_id,
+            'fecha_calculo': ruta.fecha_calculo.isoformat(),
+            'distancia_total_km': ruta.distancia_total_km,
+            'duracion_total_minutos': ruta.duracion_total_minutos,
+            'origen': {'direccion': ruta.origen_direccion, 'lat': ruta.origen_lat, 'lng': ruta.origen_lng},
+            'destino': {'direccion': ruta.destino_direccion, 'lat': ruta.destino_lat, 'lng': ruta.destino_lng},
+            'rutas': RutaSerializer(ruta, context={'request': request}).get_rutas_data_polyline(ruta),
+        }
+        response = _respuesta_json_comprimida(datos, codificacion)
+        response['ETag'] = etag
+
+    patch_cache_control(response, private=True, max_age=MAPA_CONFIG["max_age_api_rutas"], must_revalidate=True)
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    return response
+
+
+def _codificacion_aceptada(request):
+    """Retorna 'br', 'gzip' o '' según el Accept-Encoding de la solicitud."""
+    aceptadas = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if brotli is not None and re.search(r'\bbr\b', aceptadas):
+        return 'br'
+    if re.search(r'\bgzip\b', aceptadas):
+        return 'gzip'
+    return ''
+
+
+# Campos de Ruta que determinan la respuesta de api_ruta_paquete, salvo la
+# geometría: cualquier cambio en ella actualiza fecha_calculo (ver Ruta.save)
+CAMPOS_VERSION_RUTA = (
+    'id', 'fecha_calculo',
+    'distancia_ida_km', 'duracion_ida_minutos', 'distancia_regreso_km', 'duracion_regreso_minutos',
+    'distancia_total_km', 'duracion_total_minutos',
+    'origen_direccion', 'origen_lat', 'origen_lng', 'destino_direccion', 'destino_lat', 'destino_lng',
+)
+
+
+def _etag_ruta(paquete_id, version, zoom, codificacion):
+    """ETag fuerte de la respuesta de api_ruta_paquete (`version`: valores de CAMPOS_VERSION_RUTA)."""
+    version = ':'.join(str(valor) for valor in (paquete_id, *version, zoom))
+    resumen = hashlib.sha1(version.encode()).hexdigest()[:20]
+    return quote_etag(f'{resumen}-{codificacion}' if codificacion else resumen)
+
+
+def _respuesta_json_comprimida(datos, codificacion):
+    """JsonResponse comprimido con la codificación indicada, si el contenido lo justifica."""
+    contenido = json.dumps(datos, separators=(',', ':')).encode()
+    response = HttpResponse(content_type='application/json')
+
+    if codificacion and len(contenido) >= _TAMANO_MINIMO_COMPRESION:
+        contenido = brotli.compress(contenido) if codificacion == 'br' else compress_string(contenido)
+        response['Content-Encoding'] = codificacion
+
+    response.content = contenido
+    response['Content-Length'] = str(len(contenido))
+    return response
+
+
+# Endpoints usados por maps/static/js/map.js en lugar de consultar Overpass y
+# OSRM desde el navegador: pasan por las cachés, la coalescencia y el cliente
+# HTTP compartido del servidor, por lo que las consultas repetidas (de
+# cualquier usuario) se responden sin acceder a la red.
+
+# Límites de los parámetros de los endpoints proxy
+_RADIO_MAXIMO_CALLES = 1000
+_RADIO_MAXIMO_NODOS = 200
+_PUNTOS_MAXIMOS_RUTA = 25
+
+
+def _parametro_numero(request, nombre, minimo, maximo, default=None, tipo=float):
+    """
+    Lee un parámetro numérico GET dentro de [minimo, maximo].
+
+    Raises:
+        ValueError: Si falta (sin default), no es numérico o está fuera de rango
+    """
+    valor = request.GET.get(nombre)
+    if valor in (None, ''):
+        if default is None:
+            raise ValueError(f"Falta el parámetro '{nombre}'.")
+        return default
+    try:
+        numero = tipo(valor)
+    except ValueError:
+        raise ValueError(f"El parámetro '{nombre}' debe ser numérico.")
+    if not minimo <= numero <= maximo:
+        raise ValueError(f"El parámetro '{nombre}' debe estar entre {minimo} y {maximo}.")
+    return numero
+
+
+def _parametro_puntos(request, nombre):
+    """
+    Lee un parámetro GET 'lat,lon;lat,lon;...' como lista de {'lat', 'lon'}.
+
+    Raises:
+        ValueError: Si algún par no tiene el formato esperado o queda fuera
+            de [-90, 90] x [-180, 180]
+    """
+    puntos = []
+    for numero, par in enumerate((par for par in request.GET.get(nombre, '').split(';') if par), start=1):
+        try:
+            lat, lon = (float(valor) for valor in par.split(','))
+        except ValueError:
+            raise ValueError(f"El parámetro '{nombre}' debe tener el formato 'lat,lon;lat,lon'.")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"El punto {numero} de '{nombre}' debe tener latitud entre -90 y 90 "
+                             f"y longitud entre -180 y 180.")
+        puntos.append({'lat': lat, 'lon': lon})
+    return puntos
+
+
+def _respuesta_proxy(request, obtener_datos, mensaje_sin_datos='No se encontraron datos.'):
+    """
+    Ejecuta un endpoint proxy: exige sesión, convierte los ValueError de los
+    parámetros en 400 y un resultado None en 404, y marca la respuesta como
+    cacheable por el navegador.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Se requiere iniciar sesión.'}, status=401)
+    try:
+        datos = obtener_datos()
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if datos is None:
+        return JsonResponse({'error': mensaje_sin_datos}, status=404)
+
+    response = JsonResponse(datos, safe=False)
+    patch_cache_control(response, private=True, max_age=MAPA_CONFIG["max_age_api_rutas"])
+    return response
+
+
+@require_GET
+def api_nodo_cercano(request):
+    """
+    Nodo de calle más cercano a un punto (reemplaza las dos consultas a
+    Overpass de mostrarNodoCercanoConMarcador).
+
+    Parámetros GET: lat, lon, radio (metros, opcional)
+
+    Respuesta: {'nodo': {'id', 'lat', 'lon'} o null, 'calle': nombre o null}
+    """
+    def obtener():
+        lat = _parametro_numero(request, 'lat', -90, 90)
+        lon = _parametro_numero(request, 'lon', -180, 180)
+        radio = _parametro_numero(request, 'radio', 1, _RADIO_MAXIMO_NODOS,
+                                  default=MAPA_CONFIG["radio_busqueda_nodos"], tipo=int)
+        nodo = ajustar_nodo_a_calle({'lat': lat, 'lon': lon}, radio)
+        if 'id' not in nodo:  # Sin nodos en el radio: se retornó el punto original
+            return {'nodo': None, 'calle': None}
+        return {
+            'nodo': {'id': nodo['id'], 'lat': nodo['lat'], 'lon': nodo['lon']},
+            'calle': nombre_calle_cercana(nodo['lat'], nodo['lon']),
+        }
+
+    return _respuesta_proxy(request, obtener)
+
+
+@require_GET
+def api_calles_cercanas(request):
+    """
+    Vías alrededor de un punto con su geometría (reemplaza las consultas a
+    Overpass de mostrarCallesCercanas y encontrarNombreCalle).
+
+    Parámetros GET: lat, lon, radio (metros, opcional)
+
+    Respuesta: [{'id', 'nombre', 'geometria': [[lat, lon], ...]}, ...]
+    """
+    def obtener():
+        lat = _parametro_numero(request, 'lat', -90, 90)
+        lon = _parametro_numero(request, 'lon', -180, 180)
+        radio = _parametro_numero(request, 'radio', 1, _RADIO_MAXIMO_CALLES, default=500, tipo=int)
+        return obtener_calles_cercanas(lat, lon, radio)
+
+    return _respuesta_proxy(request, obtener)
+
+
+@require_GET
+def api_ruta_nodos(request):
+    """
+    Ruta entre varios puntos (reemplaza la consulta a OSRM de
+    calcularRutaEntreNodos). Los puntos se ajustan a calles en el servidor.
+
+    Parámetros GET:
+    - puntos: 'lat,lon;lat,lon;...' (entre 2 y 25 puntos)
+    - roundtrip: '1' para regresar al primer punto (por defecto '0')
+
+    Respuesta: {distancia_km, duracion_minutos, geometria (polyline),
+    pasos: [{nombre, instruccion, distancia, duracion, geometria}],
+    nodos: [{lat, lon}, ...] ajustados a calles}, o 404 si no hay ruta
+    """
+    def obtener():
+        puntos = _parametro_puntos(request, 'puntos')
+        if not 2 <= len(puntos) <= _PUNTOS_MAXIMOS_RUTA:
+            raise ValueError(f"Se necesitan entre 2 y {_PUNTOS_MAXIMOS_RUTA} puntos.")
+
+        ruta = calcular_ruta_entre_nodos(puntos, roundtrip=request.GET.get('roundtrip') == '1')
+        if ruta is None:
+            return None
+        return {
+            'distancia_km': ruta['distancia_km'],
+            'duracion_minutos': ruta['duracion_minutos'],
+            'geometria': ruta.get('geometria_completa', ''),
+            'pasos': ruta.get('pasos', []),
+            'nodos': [{'lat': nodo['lat'], 'lon': nodo['lon']} for nodo in ruta.get('nodos_optimizados', [])],
+        }
+
+    return _respuesta_proxy(request, obtener, 'No se pudo calcular la ruta.')
+
+
 @login_required(login_url='/accounts/login/')
 def map_direccion(request):
     """
@@ -291,4 +621,103 @@ def map_direccion(request):
         return redirect(request.META.get('HTTP_REFERER', '/'))
     except Exception as e:
         messages.error(request, f"Error al obtener la ubicación: {str(e)}")
-        return redirect(request.META.get('HTTP_REFERER', '/'))
\ No newline at end of file
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+
+
+# Versiones async de las vistas (ASGI). Las consultas a los servicios
+# externos de una misma solicitud se hacen concurrentemente en el event loop
+# en vez de ocupar un hilo cada una; la BD y el armado del contexto, que son
+# síncronos, se ejecutan con sync_to_async.
+
+@login_required(login_url='/accounts/login/')
+async def map_async(request):
+    """Versión async de `map`: geocodifica ambas direcciones y calcula ambos tramos a la vez."""
+    inicio = request.GET.get('inicio', '')
+    destino = request.GET.get('destino', '')
+
+    if not inicio or not destino:
+        messages.error(request, "Faltan parámetros en la solicitud.")
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+
+    try:
+        inicio_coordenada, destino_coordenada = await asyncio.gather(
+            obtener_coordenadas_async(inicio),
+            obtener_coordenadas_async(destino),
+        )
+
+        if not inicio_coordenada or not destino_coordenada:
+            messages.error(request, "No se pudo geolocalizar las direcciones.")
+            return redirect(request.META.get('HTTP_REFERER', '/'))
+
+        ruta_ida, ruta_regreso = await calcular_rutas_ida_y_regreso_async(inicio_coordenada, destino_coordenada)
+
+        contexto = await sync_to_async(_contexto_mapa)(
+            request, inicio, destino, inicio_coordenada, destino_coordenada, ruta_ida, ruta_regreso
+        )
+        return await sync_to_async(render)(request, 'map.html', contexto)
+
+    except GeocoderTimedOut:
+        messages.error(request, "Tiempo de espera agotado al intentar geolocalizar la dirección.")
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+    except Exception as e:
+        messages.error(request, f"Error al calcular la ruta: {str(e)}")
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+
+
+@login_required(login_url='/accounts/login/')
+async def map_paquete_async(request, paquete_id):
+    """Versión async de `map_paquete`."""
+    try:
+        from api.models import CAMPOS_GEOMETRIA_RUTA, Paquete, Ruta
+        from .cola_rutas import encolar_calculo_ruta, PRIORIDAD_VISUALIZACION
+
+        try:
+            paquete = await Paquete.objects.aget(id=paquete_id)
+        except Paquete.DoesNotExist:
+            messages.error(request, f"Paquete con ID {paquete_id} no encontrado.")
+            return redirect(request.META.get('HTTP_REFERER', '/'))
+
+        ruta = await Ruta.objects.filter(paquete=paquete).defer(*CAMPOS_GEOMETRIA_RUTA).afirst()
+        if ruta is None:
+            await sync_to_async(encolar_calculo_ruta)(paquete, prioridad=PRIORIDAD_VISUALIZACION)
+            messages.info(request, "La ruta de este paquete se está calculando. Intente nuevamente en unos segundos.")
+            return redirect(request.META.get('HTTP_REFERER', '/'))
+
+        contexto = await sync_to_async(_contexto_ruta_paquete)(request, paquete, ruta)
+        return await sync_to_async(render)(request, 'map.html', contexto)
+
+    except Exception as e:
+        messages.error(request, f"Error al cargar la ruta: {str(e)}")
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+
+
+@login_required(login_url='/accounts/login/')
+async def map_direccion_async(request):
+    """Versión async de `map_direccion`."""
+    direccion = request.GET.get('direccion', '')
+
+    if not direccion:
+        messages.error(request, "No se proporcionó una dirección.")
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+
+    try:
+        coordenadas = await obtener_coordenadas_async(direccion)
+
+        if not coordenadas:
+            messages.error(request, "No se pudo geolocalizar la dirección.")
+            return redirect(request.META.get('HTTP_REFERER', '/'))
+
+        contexto = {
+            'coordenadas': [coordenadas[0], coordenadas[1]],
+            'direccion': direccion,
+            'pagina_anterior': request.META.get('HTTP_REFERER', '/'),
+        }
+
+        return await sync_to_async(render)(request, 'ubicacion_direccion.html', context=contexto)
+
+    except GeocoderTimedOut:
+        messages.error(request, "Tiempo de espera agotado al intentar geolocalizar la dirección.")
+        return redirect(request.META.get('HTTP_REFERER', '/'))
+    except Exception as e:
+        messages.error(request, f"Error al obtener la ubicación: {str(e)}")
+        return redirect(request.META.get('HTTP_REFERER', '/'))